@@ -0,0 +1,211 @@
+import json
+import time
+import asyncio
+import hashlib
+import datetime
+import threading
+import collections
+import concurrent.futures
+
+import psycopg2
+
+from app import db
+
+
+def make_key(value) -> str:
+    """
+    Stable key for any JSON-able value: dict key order doesn't matter
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class TtlCache:
+    """
+    Key/value cache whose entries expire ttl seconds after being set. The most recently used max_entries live in
+    memory (least recently used evicted first); with persist=True entries are also kept in the lookup_cache
+    table so they survive restarts and are shared between processes. Values must be JSON-able.
+    The DB side is best effort: if it is unreachable the cache carries on in memory only.
+    Concurrent misses on the same key through get_or_set / get_or_set_async share one computation
+    """
+
+    def __init__(self, namespace: str, ttl: float, max_entries=1024, persist=True):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = collections.OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        self._in_flight = {}  # key -> concurrent.futures.Future of the computation filling it
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._counts['hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._counts['expired'] += 1
+
+        entry = self._load(key) if self.persist else None
+        if entry is not None and entry[0] > now:
+            self._remember(key, entry)
+            self._counts['db_hits'] += 1
+            return entry[1]
+
+        self._counts['misses'] += 1
+        return default
+
+    def set(self, key: str, value):
+        entry = (time.time() + self.ttl, value)
+        self._remember(key, entry)
+        if self.persist:
+            self._store(key, entry)
+
+    def get_or_set(self, key: str, compute):
+        """
+        Cached value for key, calling compute() to fill it on a miss. Callers missing on a key that is already
+        being computed, in any thread, wait for that result instead. None results are not cached
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return flight.result()
+        try:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            self._land(key)
+
+    async def get_or_set_async(self, key: str, compute):
+        """
+        get_or_set for coroutines: compute() returns an awaitable and the DB side runs off the event loop.
+        Shares in-flight computations with get_or_set and with other event loops
+        """
+        loop = asyncio.get_running_loop()
+        missing = object()
+        value = await loop.run_in_executor(None, self.get, key, missing) if self.persist else self.get(key, missing)
+        if value is not missing:
+            return value
+
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return await asyncio.wrap_future(flight)
+        try:
+            value = await compute()
+            if value is not None:
+                await loop.run_in_executor(None, self.set, key, value) if self.persist else self.set(key, value)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            self._land(key)
+
+    def invalidate(self, key: str = None):
+        """
+        Drops key, or every entry in this namespace if no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._counts['invalidations'] += 1
+        if self.persist:
+            self._delete(key)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, entries=len(self._entries))
+
+    def _join_flight(self, key: str):
+        """
+        (future for key's value, whether the caller is the one who has to compute it)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                # filled by a computation that finished since the caller missed
+                flight = concurrent.futures.Future()
+                flight.set_result(entry[1])
+                return flight, False
+            if key in self._in_flight:
+                self._counts['coalesced'] += 1
+                return self._in_flight[key], False
+            flight = self._in_flight[key] = concurrent.futures.Future()
+            return flight, True
+
+    def _land(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _remember(self, key: str, entry: tuple):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+
+    def _load(self, key: str):
+        get_entry_query = """
+        SELECT expires_at, value FROM lookup_cache WHERE namespace = %s AND cache_key = %s
+        """
+
+        try:
+            with db.connection() as conn:
+                with conn.cursor() as curs:
+                    curs.execute(get_entry_query, (self.namespace, key))
+                    row = curs.fetchone()
+        except psycopg2.Error as e:
+            print("Could not read {} cache from DB: {}".format(self.namespace, e))
+            return None
+
+        return (row[0].timestamp(), row[1]) if row is not None else None
+
+    def _store(self, key: str, entry: tuple):
+        upsert_entry_query = """
+        INSERT INTO lookup_cache (namespace, cache_key, value, expires_at) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (namespace, cache_key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+        """
+
+        # expired rows of the namespace are cleared out whenever something new is written
+        delete_expired_query = """
+        DELETE FROM lookup_cache WHERE namespace = %s AND expires_at < %s
+        """
+
+        try:
+            with db.connection() as conn:
+                with conn.cursor() as curs:
+                    curs.execute(upsert_entry_query, (self.namespace, key, json.dumps(entry[1]),
+                                                      datetime.datetime.fromtimestamp(entry[0])))
+                    curs.execute(delete_expired_query, (self.namespace, datetime.datetime.now()))
+        except psycopg2.Error as e:
+            print("Could not write {} cache to DB: {}".format(self.namespace, e))
+
+    def _delete(self, key: str = None):
+        delete_entries_query = """
+        DELETE FROM lookup_cache WHERE namespace = %s AND (%s IS NULL OR cache_key = %s)
+        """
+
+        try:
+            with db.connection() as conn:
+                with conn.cursor() as curs:
+                    curs.execute(delete_entries_query, (self.namespace, key, key))
+        except psycopg2.Error as e:
+            print("Could not invalidate {} cache in DB: {}".format(self.namespace, e))
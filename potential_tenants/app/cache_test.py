@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import cache
+
+
+def test_key_ignores_dict_order():
+    assert cache.make_key({'a': 1, 'b': [1, 2]}) == cache.make_key({'b': [1, 2], 'a': 1})
+    assert cache.make_key({'a': 1}) != cache.make_key({'a': 2})
+
+
+def test_entries_expire_after_ttl():
+    lookups = cache.TtlCache('test', ttl=0.05, persist=False)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert lookups.get_or_set('k', compute) == 1
+    assert lookups.get_or_set('k', compute) == 1
+    time.sleep(0.1)
+    assert lookups.get_or_set('k', compute) == 2
+    assert lookups.stats()['hits'] == 1 and lookups.stats()['misses'] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    lookups = cache.TtlCache('test', ttl=60, max_entries=2, persist=False)
+    lookups.set('a', 1)
+    lookups.set('b', 2)
+    lookups.get('a')
+    lookups.set('c', 3)
+
+    assert lookups.get('b') is None
+    assert lookups.get('a') == 1 and lookups.get('c') == 3
+    assert lookups.stats()['evictions'] == 1
+
+
+def test_invalidate():
+    lookups = cache.TtlCache('test', ttl=60, persist=False)
+    lookups.set('a', 1)
+    lookups.set('b', 2)
+    lookups.invalidate('a')
+    assert lookups.get('a') is None and lookups.get('b') == 2
+    lookups.invalidate()
+    assert lookups.stats()['entries'] == 0
+
+
+def test_concurrent_misses_share_one_computation():
+    lookups = cache.TtlCache('test', ttl=60, persist=False)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: lookups.get_or_set('k', compute), range(4)))
+
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+    assert lookups.stats()['coalesced'] == 3
+
+
+def test_failed_computation_is_not_cached():
+    lookups = cache.TtlCache('test', ttl=60, persist=False)
+
+    def compute():
+        raise ValueError("no luck")
+
+    with pytest.raises(ValueError):
+        lookups.get_or_set('k', compute)
+    assert lookups.get_or_set('k', lambda: 'value') == 'value'
@@ -0,0 +1,193 @@
+import uuid
+import json
+import datetime
+import threading
+
+import psycopg2
+import psycopg2.extras
+
+from app import db, rmv_constants
+
+
+class SearchCheckpoint:
+    """
+    Durable progress of one search run in search_runs / search_run_pages: the outcodes being searched and every
+    summary page already parsed. Listings already fetched are the property_listings rows carrying the run_id.
+    A run that dies can be carried on by starting again with the same run ID (or the same config within
+    RESUME_WINDOW_HOURS), skipping the area search, the pages and the detail pages it already has.
+    While a run is going a heartbeat thread keeps its date_updated current, so that a search with the same config
+    in another process leaves it alone. results_per_page is how far apart the run's summary pages are, which
+    depends on its summary source
+    """
+
+    def __init__(self, run_id: uuid.UUID, outcode_list: list = None, pages: dict = None,
+                 results_per_page=rmv_constants.MAX_RESULTS_PER_PAGE):
+        self.run_id = run_id
+        self.outcode_list = outcode_list
+        self.results_per_page = results_per_page
+        self._pages = pages or {}
+        self._heartbeat_stopped = None
+
+    @property
+    def resumed(self):
+        return self.outcode_list is not None
+
+    @classmethod
+    def start(cls, config_hash: str, run_id: str = None, results_per_page=rmv_constants.MAX_RESULTS_PER_PAGE):
+        """
+        Picks up run_id if given, otherwise the latest unfinished run of the same config started within
+        RESUME_WINDOW_HOURS that has had no heartbeat for RUN_STALE_AFTER_SECONDS, otherwise registers a new run.
+        Either way the run's heartbeat is started, stop it with stop_heartbeat
+        """
+        find_run_query = """
+        UPDATE search_runs SET date_updated = %s WHERE run_id = %s
+        RETURNING run_id, outcode_list
+        """
+
+        # claimed by bumping its heartbeat in the same statement, so two searches can't both pick the same run
+        claim_run_query = """
+        UPDATE search_runs SET date_updated = %s
+        WHERE run_id = (
+            SELECT run_id FROM search_runs
+            WHERE config_hash = %s AND date_finished IS NULL AND date_started >= %s
+            AND (date_updated IS NULL OR date_updated < %s)
+            ORDER BY date_started DESC
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING run_id, outcode_list
+        """
+
+        get_pages_query = """
+        SELECT outcode, page_index, total_results, summaries FROM search_run_pages WHERE run_id = %s
+        """
+
+        insert_run_query = """
+        INSERT INTO search_runs (run_id, config_hash, date_started, date_updated) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (run_id) DO NOTHING
+        """
+
+        run_id = uuid.UUID(run_id) if run_id else None
+        now = datetime.datetime.now()
+        oldest_allowed = now - datetime.timedelta(hours=rmv_constants.RESUME_WINDOW_HOURS)
+        last_heartbeat_allowed = now - datetime.timedelta(seconds=rmv_constants.RUN_STALE_AFTER_SECONDS)
+
+        psycopg2.extras.register_uuid()
+        with db.connection() as conn:
+            with conn.cursor() as curs:
+                if run_id is not None:
+                    curs.execute(find_run_query, (now, run_id))
+                else:
+                    curs.execute(claim_run_query, (now, config_hash, oldest_allowed, last_heartbeat_allowed))
+                run = curs.fetchone()
+                if run is None or run[1] is None:
+                    # nothing to carry on from (or it died before the area search finished)
+                    run_id = run[0] if run is not None else run_id or uuid.uuid4()
+                    curs.execute(insert_run_query, (run_id, config_hash, now, now))
+                    print("Starting search run {}".format(run_id))
+                    started = cls(run_id, results_per_page=results_per_page)
+                    started.start_heartbeat()
+                    return started
+
+                curs.execute(get_pages_query, (run[0],))
+                pages = {(outcode, page_index): (total, [rmv_constants.PropertySummary(*x) for x in summaries])
+                         for outcode, page_index, total, summaries in curs.fetchall()}
+
+        resumed = cls(run[0], run[1], pages, results_per_page)
+        print("Resuming search run {}: {} of {} outcodes fully paged, {} summary pages already done".format(
+            resumed.run_id, len(resumed.outcodes_done()), len(resumed.outcode_list), len(pages)))
+        resumed.start_heartbeat()
+        return resumed
+
+    def start_heartbeat(self):
+        self._heartbeat_stopped = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(self._heartbeat_stopped,), name='search-run-heartbeat',
+                         daemon=True).start()
+
+    def stop_heartbeat(self):
+        """
+        From here on the run counts as abandoned once RUN_STALE_AFTER_SECONDS have passed, unless it is finished
+        """
+        if self._heartbeat_stopped is not None:
+            self._heartbeat_stopped.set()
+            self._heartbeat_stopped = None
+
+    def _heartbeat(self, stopped: threading.Event):
+        while not stopped.wait(rmv_constants.RUN_HEARTBEAT_SECONDS):
+            self.beat()
+
+    def beat(self):
+        heartbeat_query = """
+        UPDATE search_runs SET date_updated = %s WHERE run_id = %s
+        """
+
+        # best effort, a few missed heartbeats only matter once they add up to RUN_STALE_AFTER_SECONDS
+        try:
+            psycopg2.extras.register_uuid()
+            with db.connection() as conn:
+                with conn.cursor() as curs:
+                    curs.execute(heartbeat_query, (datetime.datetime.now(), self.run_id))
+        except psycopg2.Error as e:
+            print("Could not update heartbeat of search run {}: {}".format(self.run_id, e))
+
+    def save_outcodes(self, outcode_list: list):
+        save_outcodes_query = """
+        UPDATE search_runs SET outcode_list = %s WHERE run_id = %s
+        """
+
+        with db.connection() as conn:
+            with conn.cursor() as curs:
+                curs.execute(save_outcodes_query, (json.dumps(outcode_list), self.run_id))
+        self.outcode_list = outcode_list
+
+    def page(self, outcode: str, index: int):
+        """
+        (total results, summaries) of a page parsed by an earlier attempt of this run, or None
+        """
+        return self._pages.get((outcode, index))
+
+    def for_outcode(self, outcode: str):
+        """
+        The same run holding only outcode's pages, for a worker that is only paging through that outcode
+        """
+        return SearchCheckpoint(self.run_id, self.outcode_list,
+                                {k: v for k, v in self._pages.items() if k[0] == outcode}, self.results_per_page)
+
+    def save_page(self, outcode: str, index: int, total_results: int, summaries: [rmv_constants.PropertySummary]):
+        save_page_query = """
+        INSERT INTO search_run_pages (run_id, outcode, page_index, total_results, summaries)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (run_id, outcode, page_index) DO NOTHING
+        """
+
+        # best effort, losing a checkpoint only means the page is fetched again on resume
+        try:
+            psycopg2.extras.register_uuid()
+            with db.connection() as conn:
+                with conn.cursor() as curs:
+                    curs.execute(save_page_query, (self.run_id, outcode, index, total_results, json.dumps(summaries)))
+        except psycopg2.Error as e:
+            print("Could not checkpoint page {} of {}: {}".format(index, outcode, e))
+
+    def outcodes_done(self):
+        """
+        Outcodes whose every summary page has been checkpointed
+        """
+        done = []
+        for outcode in self.outcode_list or []:
+            first_page = self._pages.get((outcode, 0))
+            if first_page is not None and all(
+                    (outcode, x) in self._pages
+                    for x in range(self.results_per_page, first_page[0], self.results_per_page)):
+                done.append(outcode)
+        return done
+
+    def finish(self):
+        finish_run_query = """
+        UPDATE search_runs SET date_finished = %s WHERE run_id = %s
+        """
+
+        with db.connection() as conn:
+            with conn.cursor() as curs:
+                curs.execute(finish_run_query, (datetime.datetime.now(), self.run_id))
+        self.stop_heartbeat()
@@ -0,0 +1,73 @@
+import time
+import uuid
+import threading
+
+from app import checkpoint, rmv_constants
+
+
+def _page(total):
+    return total, [rmv_constants.PropertySummary('property-1', 1000, None)]
+
+
+def test_outcodes_done_needs_every_page_of_the_outcode():
+    pages = {
+        # 50 results: pages at index 0, 24 and 48, all done
+        ('OUTCODE^1', 0): _page(50), ('OUTCODE^1', 24): _page(50), ('OUTCODE^1', 48): _page(50),
+        # missing index 24
+        ('OUTCODE^2', 0): _page(30),
+        # single page
+        ('OUTCODE^3', 0): _page(10),
+    }
+    search = checkpoint.SearchCheckpoint(uuid.uuid4(), ['OUTCODE^1', 'OUTCODE^2', 'OUTCODE^3', 'OUTCODE^4'], pages)
+
+    assert search.resumed
+    assert search.outcodes_done() == ['OUTCODE^1', 'OUTCODE^3']
+    assert search.page('OUTCODE^2', 0) == _page(30)
+    assert search.page('OUTCODE^2', 24) is None
+
+
+def test_new_run_has_nothing_to_resume():
+    search = checkpoint.SearchCheckpoint(uuid.uuid4())
+
+    assert not search.resumed
+    assert search.outcodes_done() == []
+
+
+def test_outcodes_done_steps_by_the_runs_page_size():
+    pages = {
+        # map search pages, 499 results apart
+        ('OUTCODE^1', 0): _page(600), ('OUTCODE^1', 499): _page(600),
+        ('OUTCODE^2', 0): _page(600),
+    }
+    search = checkpoint.SearchCheckpoint(uuid.uuid4(), ['OUTCODE^1', 'OUTCODE^2'], pages,
+                                         rmv_constants.MAP_RESULTS_PER_PAGE)
+
+    assert search.outcodes_done() == ['OUTCODE^1']
+
+
+def test_for_outcode_keeps_only_that_outcodes_pages():
+    pages = {('OUTCODE^1', 0): _page(30), ('OUTCODE^1', 24): _page(30), ('OUTCODE^2', 0): _page(10)}
+    search = checkpoint.SearchCheckpoint(uuid.uuid4(), ['OUTCODE^1', 'OUTCODE^2'], pages,
+                                         rmv_constants.MAX_RESULTS_PER_PAGE)
+
+    outcode = search.for_outcode('OUTCODE^1')
+
+    assert outcode.run_id == search.run_id
+    assert outcode.page('OUTCODE^1', 24) == _page(30) and outcode.page('OUTCODE^2', 0) is None
+    assert outcode.outcodes_done() == ['OUTCODE^1']
+
+
+def test_heartbeat_beats_until_stopped(monkeypatch):
+    monkeypatch.setattr(rmv_constants, 'RUN_HEARTBEAT_SECONDS', 0.01)
+    beats = threading.Semaphore(0)
+    search = checkpoint.SearchCheckpoint(uuid.uuid4())
+    monkeypatch.setattr(search, 'beat', beats.release)
+
+    search.start_heartbeat()
+    assert beats.acquire(timeout=5) and beats.acquire(timeout=5)
+    search.stop_heartbeat()
+    time.sleep(0.05)
+    while beats.acquire(blocking=False):
+        pass
+    time.sleep(0.05)
+    assert not beats.acquire(blocking=False)
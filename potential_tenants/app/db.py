@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+import contextlib
+import collections
+
+import psycopg2
+import psycopg2.pool
+
+from app import general_constants
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of Postgres connections shared by everything in the process. At most max_connections are
+    open at once; past that callers wait for one to come back, for up to timeout seconds before PoolError.
+    min_connections are kept open when idle, extra ones are closed once idle for max_idle seconds. A connection
+    idle for longer than health_check_after seconds is checked with SELECT 1 before being handed out and replaced
+    if that fails. A forked child starts with an empty pool of its own
+    """
+
+    def __init__(self, dsn: str, min_connections: int, max_connections: int, timeout: float,
+                 health_check_after: float, max_idle: float):
+        self.dsn = dsn
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self._reset()
+
+    def _reset(self):
+        self._idle = collections.deque()  # (connection, returned at), most recently returned on the right
+        self._open = 0
+        self._cond = threading.Condition()
+        self._counts = collections.Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        with pool.connection() as conn: behaves as with psycopg2.connect(...) as conn: did, committing on success
+        and rolling back on error, except the connection then goes back to the pool instead of being left open
+        """
+        conn = self.getconn()
+        close = False
+        try:
+            with conn:
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # most likely the connection itself, don't hand it out again
+            close = True
+            raise
+        finally:
+            self.putconn(conn, close=close)
+
+    def getconn(self):
+        """
+        A connection for the caller alone until it is given back with putconn, with no transaction open
+        """
+        start = time.perf_counter()
+        with self._cond:
+            while not self._idle and self._open >= self.max_connections:
+                remaining = start + self.timeout - time.perf_counter()
+                if remaining <= 0:
+                    self._counts['timeouts'] += 1
+                    raise psycopg2.pool.PoolError("No DB connection free after {} seconds".format(self.timeout))
+                self._cond.wait(remaining)
+
+            waited = time.perf_counter() - start
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._counts['checkouts'] += 1
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._open += 1
+
+        # connecting and health checks happen outside the lock, only the slot is held meanwhile
+        if conn is not None and (conn.closed or (time.time() - returned_at > self.health_check_after
+                                                 and not self._healthy(conn))):
+            self._counts['replaced'] += 1
+            self._close(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = psycopg2.connect(self.dsn, sslmode='allow')
+                self._counts['connects'] += 1
+            except BaseException:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def putconn(self, conn, close=False):
+        """
+        Gives back a connection from getconn, closing it if close is set or it has already been closed
+        """
+        now = time.time()
+        to_close = []
+        with self._cond:
+            if close or conn.closed:
+                to_close.append(conn)
+                self._open -= 1
+            else:
+                self._idle.append((conn, now))
+            # the longest idle connections are at the left
+            while len(self._idle) > self.min_connections and now - self._idle[0][1] > self.max_idle:
+                to_close.append(self._idle.popleft()[0])
+                self._open -= 1
+            self._cond.notify(len(to_close) + 1)
+        for x in to_close:
+            self._close(x)
+
+    def close_all(self):
+        with self._cond:
+            idle = [x[0] for x in self._idle]
+            self._open -= len(idle)
+            self._idle.clear()
+        for x in idle:
+            self._close(x)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._counts['checkouts']
+            return dict(self._counts, open=self._open, idle=len(self._idle), in_use=self._open - len(self._idle),
+                        wait_total=round(self._wait_total, 3), wait_max=round(self._wait_max, 3),
+                        wait_avg=round(self._wait_total / checkouts, 4) if checkouts else 0)
+
+    def _healthy(self, conn):
+        self._counts['health_checks'] += 1
+        try:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            print("Dropping DB connection that failed its health check: {}".format(e))
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+if general_constants.DB_POOL_MAX_CONNECTIONS < general_constants.DB_POOL_REQUIRED_CONNECTIONS:
+    raise ValueError("DB_POOL_MAX_CONNECTIONS is {}, a search needs at least {}".format(
+        general_constants.DB_POOL_MAX_CONNECTIONS, general_constants.DB_POOL_REQUIRED_CONNECTIONS))
+
+pool = ConnectionPool(general_constants.DB_URL, min_connections=general_constants.DB_POOL_MIN_CONNECTIONS,
+                      max_connections=general_constants.DB_POOL_MAX_CONNECTIONS,
+                      timeout=general_constants.DB_POOL_TIMEOUT_SECONDS,
+                      health_check_after=general_constants.DB_POOL_HEALTH_CHECK_SECONDS,
+                      max_idle=general_constants.DB_POOL_MAX_IDLE_SECONDS)
+
+# the parent's connections (and the lock, possibly held at the time) are no use to a forked child
+os.register_at_fork(after_in_child=pool._reset)
+
+
+def connection():
+    """
+    with db.connection() as conn: on the process-wide pool
+    """
+    return pool.connection()
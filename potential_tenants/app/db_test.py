@@ -0,0 +1,110 @@
+import time
+import threading
+
+import psycopg2
+import psycopg2.pool
+import pytest
+
+from app import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        if self._conn.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(monkeypatch, max_connections=2, timeout=5, health_check_after=60):
+    opened = []
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return db.ConnectionPool('fake', min_connections=1, max_connections=max_connections, timeout=timeout,
+                             health_check_after=health_check_after, max_idle=60), opened
+
+
+def test_connections_are_reused(monkeypatch):
+    pool, opened = _pool(monkeypatch)
+    for _ in range(5):
+        with pool.connection() as conn:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+
+    assert len(opened) == 1
+    assert pool.stats()['checkouts'] == 5 and pool.stats()['idle'] == 1
+
+
+def test_callers_wait_for_a_free_connection(monkeypatch):
+    pool, opened = _pool(monkeypatch, max_connections=2)
+
+    def query():
+        with pool.connection():
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=query) for _ in range(6)]
+    [x.start() for x in threads]
+    [x.join() for x in threads]
+
+    assert len(opened) == 2
+    assert pool.stats()['wait_max'] >= 0.1
+
+
+def test_timeout_when_no_connection_comes_back(monkeypatch):
+    pool, _ = _pool(monkeypatch, max_connections=1, timeout=0.1)
+    held = pool.getconn()
+
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
+    pool.putconn(held)
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_broken_connections_are_replaced(monkeypatch):
+    pool, opened = _pool(monkeypatch, health_check_after=0)
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            conn.broken = True
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+    assert opened[0].closed
+
+    with pool.connection() as conn:
+        conn.broken = True
+    with pool.connection() as conn:
+        # went stale while idle, caught by the health check
+        assert conn is opened[2]
+    assert pool.stats()['replaced'] == 1 and pool.stats()['open'] == 1
@@ -1,7 +1,58 @@
 import re
 import datetime
+import operator
+import collections
+
+import numpy as np
+
+from app import general_constants, rmv_constants, listing
+
+# what a scraper worker sends back instead of a listing that failed the filter chain
+Rejected = collections.namedtuple('Rejected', ['property_id', 'step'])
+
+# one array per field the threshold filters read, row i being listing i. Missing rent, available date and beds
+# are NaN and missing images -1, which every mask rejects
+ListingColumns = collections.namedtuple('ListingColumns', ['rent', 'images', 'available', 'beds'])
+
+# what batch_filter returns: indices of the listings passing every step, and how many each step removed, in order
+BatchResult = collections.namedtuple('BatchResult', ['indices', 'removed'])
+
+
+class FilterChain:
+    """
+    Named listing filters applied in order as each listing is parsed, so listings failing any of them never leave
+    the scraper worker. Steps are (name, filter) pairs with filter(listing) -> bool, picklable as they travel to the
+    worker processes with the scraper. Rejections are counted per step in the process that records them
+    """
+
+    def __init__(self, steps: [tuple]):
+        self.steps = steps
+        self.passed = 0
+        self.rejected = collections.Counter()
+
+    def apply(self, property_listing):
+        """
+        The listing itself if it passes every step, otherwise Rejected naming the first step it failed
+        """
+        for name, f in self.steps:
+            if not f(property_listing):
+                return Rejected(property_listing[rmv_constants.RmvPropDetails.rmv_unique_link.name], name)
+        return property_listing
+
+    def record(self, result) -> bool:
+        """
+        Counts what apply returned, True if it is a listing to keep
+        """
+        if isinstance(result, Rejected):
+            self.rejected[result.step] += 1
+            return False
+        if result is not None:
+            self.passed += 1
+            return True
+        return False
 
-from app import general_constants, rmv_constants
+    def stats(self):
+        return dict(passed=self.passed, rejected=dict(self.rejected))
 
 
 def keyword_filter(keyword: general_constants.CheckboxFeatures, description: str) -> bool:
@@ -26,13 +77,15 @@ def keyword_filter(keyword: general_constants.CheckboxFeatures, description: str
         return False
 
 
-def date_available_filter(property_listing, lower_threshold, upper_threshold):
-    available_date = datetime.datetime.strptime(property_listing[rmv_constants.RmvPropDetails.date_available.name],
-                                                "%Y-%m-%d %H:%M:%S")
-    lower_date_threshold = datetime.datetime.strptime(lower_threshold, "%Y-%m-%d %H:%M:%S")
-    upper_date_threshold = datetime.datetime.strptime(upper_threshold, "%Y-%m-%d %H:%M:%S")
+def date_available_filter(property_listing, lower_threshold: datetime.datetime,
+                          upper_threshold: datetime.datetime):
+    try:
+        available_date = property_listing[rmv_constants.RmvPropDetails.date_available.name]
+        return lower_threshold <= available_date <= upper_threshold
 
-    return lower_date_threshold <= available_date <= upper_date_threshold
+    except TypeError as e:
+        print("Date filter: An error occurred filtering property: {}. CULPRIT: {} ".format(e, property_listing))
+        return False
 
 
 def enough_images_filter(property_listing, threshold):
@@ -55,11 +108,60 @@ def floorplan_filter(property_listing):
 
 def min_rent_filter(property_listing, threshold):
     try:
-        return float(property_listing[rmv_constants.RmvPropDetails.rent_pcm.name]) > threshold
+        return property_listing[rmv_constants.RmvPropDetails.rent_pcm.name] > threshold
 
-    # TODO: ValueError caught and returned as False for properties where rent is 'null' for unknown reasons.
-    #  For now, we ignore these properties during filtering. Once we debug the 'null' rent issue,
-    #  ValueError no longer needs to be caught
-    except (TypeError, ValueError) as e:
+    # TODO: TypeError caught and returned as False for properties where rent is 'null' (None once parsed) for
+    #  unknown reasons. For now, we ignore these properties during filtering. Once we debug the 'null' rent issue,
+    #  TypeError no longer needs to be caught
+    except TypeError as e:
         print("Min rent filter: An error occurred filtering property: {}. CULPRIT: {} ".format(e, property_listing))
         return False
+
+
+_column_fields = operator.attrgetter(rmv_constants.RmvPropDetails.rent_pcm.name,
+                                     rmv_constants.RmvPropDetails.image_links.name,
+                                     rmv_constants.RmvPropDetails.date_available.name,
+                                     rmv_constants.RmvPropDetails.beds.name)
+
+
+def to_columns(properties: [listing.Listing]) -> ListingColumns:
+    """
+    Columnar view of listings for the batch filters, the available date as a POSIX timestamp
+    """
+    rent, images, available, beds = zip(*map(_column_fields, properties)) if properties else ([], [], [], [])
+    return ListingColumns(
+        rent=np.array(rent, dtype=float),
+        images=np.array([len(x) if x is not None else -1 for x in images], dtype=int),
+        available=np.array([x.timestamp() if x is not None else None for x in available], dtype=float),
+        beds=np.array(beds, dtype=float))
+
+
+def date_available_mask(columns: ListingColumns, lower_threshold: datetime.datetime,
+                        upper_threshold: datetime.datetime):
+    return (columns.available >= lower_threshold.timestamp()) & (columns.available <= upper_threshold.timestamp())
+
+
+def enough_images_mask(columns: ListingColumns, threshold):
+    return columns.images > threshold
+
+
+def min_rent_mask(columns: ListingColumns, threshold):
+    return columns.rent > threshold
+
+
+def min_beds_mask(columns: ListingColumns, threshold):
+    return columns.beds >= threshold
+
+
+def batch_filter(columns: ListingColumns, steps: [tuple]) -> BatchResult:
+    """
+    Applies (name, mask) steps to every row at once, mask(columns) -> boolean array, the *_mask functions above
+    with their thresholds bound. Same listings as applying the matching per-listing filters one after the other
+    """
+    keep = np.ones(len(columns.rent), dtype=bool)
+    removed = {}
+    for name, mask in steps:
+        kept = keep & mask(columns)
+        removed[name] = int(np.count_nonzero(keep)) - int(np.count_nonzero(kept))
+        keep = kept
+    return BatchResult(indices=np.flatnonzero(keep), removed=removed)
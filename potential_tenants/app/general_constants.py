@@ -3,6 +3,16 @@ from enum import Enum
 from collections import namedtuple
 
 DB_URL = os.environ['DATABASE_URL']
+# process-wide connection pool (app.db): connections kept open when idle / open at most, how long to wait for one
+# when all are in use, and after how long idle a connection is checked before reuse or closed if above the minimum
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", 1))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", 10))
+# the fewest DB_POOL_MAX_CONNECTIONS a search can run with: the listing writer keeps one for the whole scrape while
+# the checkpoint, caches and everything after the scrape take one at a time (nothing holds two at once)
+DB_POOL_REQUIRED_CONNECTIONS = 2
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", 30))
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", 300))
 NEIGHBOURHOODS_URL = "https://en.wikipedia.org/wiki/List_of_areas_of_London"
 
 Coords = namedtuple("Coords", ["lat", "lon"])
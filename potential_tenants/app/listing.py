@@ -0,0 +1,166 @@
+import sys
+import uuid
+import datetime
+from operator import attrgetter
+from collections.abc import MutableMapping
+
+from app import rmv_constants
+
+FIELDS = tuple(x.name for x in rmv_constants.RmvPropDetails)
+_FIELD_SET = frozenset(FIELDS)
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        # RMV sometimes has 'null' where a number should be
+        return None
+
+
+def _to_int(value):
+    value = _to_float(value)
+    return int(value) if value is not None else None
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def _to_uuid(value):
+    return uuid.UUID(value) if isinstance(value, str) else value
+
+
+def _intern(value):
+    # the same few hundred agents (and their addresses) turn up on thousands of listings
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+_PARSERS = {
+    rmv_constants.RmvPropDetails.prop_uuid.name: _to_uuid,
+    rmv_constants.RmvPropDetails.geo_lat.name: _to_float,
+    rmv_constants.RmvPropDetails.geo_long.name: _to_float,
+    rmv_constants.RmvPropDetails.rent_pcm.name: _to_float,
+    rmv_constants.RmvPropDetails.beds.name: _to_int,
+    rmv_constants.RmvPropDetails.zone_best_guess.name: _to_int,
+    rmv_constants.RmvPropDetails.date_available.name: _to_datetime,
+    rmv_constants.RmvPropDetails.postcode.name: _intern,
+    rmv_constants.RmvPropDetails.estate_agent.name: _intern,
+    rmv_constants.RmvPropDetails.estate_agent_address.name: _intern,
+}
+_INTERNED = [k for k, v in _PARSERS.items() if v is _intern]
+
+
+class Listing(MutableMapping):
+    """
+    One property listing, with a slot per RmvPropDetails field. Numbers and the available date are parsed once on
+    the way in (unparseable values become None) so filters and scoring use them as they are. Anything else put on
+    a listing along the way (score, augment, travel times...) lives in extras.
+    Reads and writes like the dict keyed by RmvPropDetails names that it replaces; every field is always present
+    """
+    __slots__ = FIELDS + ('extras',)
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, None)
+        self.extras = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, property_profile):
+        return cls(**property_profile)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self.extras is None:
+            raise KeyError(key)
+        return self.extras[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            parse = _PARSERS.get(key)
+            setattr(self, key, parse(value) if parse is not None else value)
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            setattr(self, key, None)
+        elif self.extras is not None:
+            del self.extras[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET or (self.extras is not None and key in self.extras)
+
+    def __iter__(self):
+        yield from FIELDS
+        if self.extras:
+            yield from self.extras
+
+    def __len__(self):
+        return len(FIELDS) + (len(self.extras) if self.extras else 0)
+
+    def __repr__(self):
+        return "Listing({})".format(dict(self))
+
+    def copy(self):
+        copied = _restore(_values(self), None)
+        if self.extras:
+            copied.extras = dict(self.extras)
+        return copied
+
+    def to_dict(self):
+        """
+        Plain dict with the available date formatted back to a string, for CSV and JSON output
+        """
+        property_profile = dict(self)
+        if self.date_available is not None:
+            property_profile[rmv_constants.RmvPropDetails.date_available.name] = \
+                datetime.datetime.strftime(self.date_available, DATE_FORMAT)
+        return property_profile
+
+    def __reduce__(self):
+        # a bare list of values, no field names, is what crosses from the worker processes. The UUID goes as its
+        # bytes and the date as an ISO string, both several times faster to pickle than the objects themselves
+        values = list(_values(self))
+        if self.prop_uuid is not None:
+            values[_UUID_INDEX] = self.prop_uuid.bytes
+        if self.date_available is not None:
+            values[_DATE_INDEX] = self.date_available.isoformat()
+        return _unpickle, (values, self.extras)
+
+
+_values = attrgetter(*FIELDS)
+_DATE_INDEX = FIELDS.index(rmv_constants.RmvPropDetails.date_available.name)
+_UUID_INDEX = FIELDS.index(rmv_constants.RmvPropDetails.prop_uuid.name)
+
+
+def _restore(values: tuple, extras: dict):
+    restored = Listing.__new__(Listing)
+    for name, value in zip(FIELDS, values):
+        setattr(restored, name, value)
+    for name in _INTERNED:
+        setattr(restored, name, _intern(getattr(restored, name)))
+    restored.extras = extras
+    return restored
+
+
+def _unpickle(values: list, extras: dict):
+    restored = _restore(values, extras)
+    if restored.prop_uuid is not None:
+        restored.prop_uuid = uuid.UUID(bytes=restored.prop_uuid)
+    if restored.date_available is not None:
+        restored.date_available = datetime.datetime.fromisoformat(restored.date_available)
+    return restored
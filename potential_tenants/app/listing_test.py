@@ -0,0 +1,62 @@
+import uuid
+import pickle
+import datetime
+
+from app import listing, rmv_constants
+
+
+def _scraped():
+    return {
+        rmv_constants.RmvPropDetails.prop_uuid.name: uuid.uuid4(),
+        rmv_constants.RmvPropDetails.rmv_unique_link.name: '67134849',
+        rmv_constants.RmvPropDetails.rent_pcm.name: '2296.6666666666665',
+        rmv_constants.RmvPropDetails.beds.name: '2',
+        rmv_constants.RmvPropDetails.geo_lat.name: '51.491705786609934',
+        rmv_constants.RmvPropDetails.date_available.name: '2020-03-13 12:57:10',
+        rmv_constants.RmvPropDetails.estate_agent.name: 'Gordon & Co',
+        rmv_constants.RmvPropDetails.image_links.name: ['a.jpg', 'b.jpg'],
+    }
+
+
+def test_fields_are_parsed_on_the_way_in():
+    property_listing = listing.Listing.from_dict(_scraped())
+
+    assert property_listing['rent_pcm'] == 2296.6666666666665
+    assert property_listing['beds'] == 2
+    assert property_listing['geo_lat'] == 51.491705786609934
+    assert property_listing['date_available'] == datetime.datetime(2020, 3, 13, 12, 57, 10)
+    assert property_listing['street_address'] is None
+    assert property_listing.to_dict()['date_available'] == '2020-03-13 12:57:10'
+
+    property_listing['rent_pcm'] = 'null'
+    assert property_listing['rent_pcm'] is None
+
+
+def test_reads_and_writes_like_a_dict():
+    property_listing = listing.Listing.from_dict(_scraped())
+    property_listing.update({'score': 11.5})
+    property_listing['augment'] = {}
+
+    assert 'score' in property_listing and 'description' in property_listing and 'other' not in property_listing
+    assert property_listing.get('other') is None
+    assert set(property_listing.keys()) == set(listing.FIELDS) | {'score', 'augment'}
+    assert dict(property_listing)['score'] == 11.5
+
+
+def test_pickles_smaller_than_the_dict_and_round_trips():
+    property_listing = listing.Listing.from_dict(_scraped())
+    property_listing['score'] = 3
+
+    restored = pickle.loads(pickle.dumps(property_listing))
+    assert restored == property_listing
+    assert restored.extras == {'score': 3}
+    assert len(pickle.dumps(property_listing)) < len(pickle.dumps(dict(_scraped(), score=3)))
+
+
+def test_copy_does_not_share_extras():
+    property_listing = listing.Listing.from_dict(_scraped())
+    property_listing['score'] = 1
+    copied = property_listing.copy()
+    copied['score'] = 2
+
+    assert property_listing['score'] == 1 and copied['prop_uuid'] == property_listing['prop_uuid']
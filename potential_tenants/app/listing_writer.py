@@ -0,0 +1,169 @@
+import json
+import queue
+import timeit
+import asyncio
+import datetime
+import threading
+
+import psycopg2
+import psycopg2.extras
+
+from app import db, rmv_constants
+
+insert_listings_query = """
+INSERT INTO property_listings
+(prop_uuid, geo_lat, geo_long, postcode, rent_pcm,
+beds, date_available, website_unique_id, image_links,
+floorplan_links, estate_agent, estate_agent_address, description, url, date_written_to_db,
+summary_fingerprint, run_id)
+VALUES %s
+"""
+
+
+class ListingWriter:
+    """
+    Write-behind sink for scraped listings. Listings put on the bounded queue are written to property_listings
+    by a background thread in batches of INSERT_BATCH_SIZE (or whatever has arrived after FLUSH_INTERVAL
+    seconds), so a run that dies part way keeps everything already flushed. When the DB falls behind the queue
+    fills up and put / put_async wait, slowing the scrape down instead of holding listings in memory.
+    Use as a context manager; leaving it flushes whatever is still queued. Rows are tagged with run_id
+    """
+
+    def __init__(self, run_id=None, batch_size=rmv_constants.INSERT_BATCH_SIZE,
+                 max_queued=rmv_constants.WRITE_QUEUE_SIZE, flush_interval=rmv_constants.FLUSH_INTERVAL):
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stored = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name='listing-writer', daemon=True)
+
+    def __enter__(self):
+        self._start_time = timeit.default_timer()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def put(self, property_profile: dict):
+        self._queue.put(property_profile)
+
+    async def put_async(self, property_profile: dict):
+        try:
+            self._queue.put_nowait(property_profile)
+        except queue.Full:
+            # wait for the writer off the event loop so other fetches carry on meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, property_profile)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._conn is not None:
+            db.pool.putconn(self._conn)
+            self._conn = None
+
+        elapsed = timeit.default_timer() - self._start_time
+        print("Stored {} listings in DB ({} failed) in {:.2f} seconds ({:.1f} rows/s)".format(
+            self.stored, self.failed, elapsed, self.stored / elapsed if elapsed else 0))
+
+    def _run(self):
+        batch = []
+        batch_started = None
+        done = False
+        while not done:
+            wait = self.flush_interval if batch_started is None else \
+                max(0, batch_started + self.flush_interval - timeit.default_timer())
+            try:
+                property_profile = self._queue.get(timeout=wait)
+                if property_profile is None:
+                    done = True
+                else:
+                    batch.append(property_profile)
+                    batch_started = batch_started or timeit.default_timer()
+            except queue.Empty:
+                pass
+
+            if batch and (done or len(batch) >= self.batch_size or
+                          timeit.default_timer() - batch_started >= self.flush_interval):
+                self._flush(batch)
+                batch = []
+                batch_started = None
+
+    def _flush(self, batch: [dict]):
+        try:
+            if self._conn is None:
+                psycopg2.extras.register_uuid()
+                self._conn = db.pool.getconn()
+            stored = store_batch(self._conn, batch, self.run_id)
+            self.stored += stored
+            self.failed += len(batch) - stored
+
+        except Exception as e:
+            # most likely the connection itself, drop it so the next batch reconnects
+            print("Could not store batch of {} listings in DB: {}. CULPRIT RMV IDs: {}".format(
+                len(batch), e, [x[rmv_constants.RmvPropDetails.rmv_unique_link.name] for x in batch]))
+            self.failed += len(batch)
+            if self._conn is not None:
+                db.pool.putconn(self._conn, close=True)
+                self._conn = None
+
+
+def store_batch(conn, properties_profiles: [dict], run_id=None):
+    """
+    Writes the listings in one multi-row INSERT and transaction. If that fails the batch is replayed row by row,
+    each behind a savepoint, so only the offending rows are lost. Returns how many rows were stored
+    """
+    rows = [_listing_row(x, run_id) for x in properties_profiles]
+    try:
+        with conn.cursor() as curs:
+            psycopg2.extras.execute_values(curs, insert_listings_query, rows, page_size=len(rows))
+        conn.commit()
+        return len(rows)
+    except (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.ProgrammingError) as e:
+        conn.rollback()
+        print("Batch of {} listings failed ({}), storing them one at a time".format(len(rows), e))
+        return _store_rows_individually(conn, rows, properties_profiles)
+
+
+def _store_rows_individually(conn, rows: [tuple], properties_profiles: [dict]):
+    stored = 0
+    with conn.cursor() as curs:
+        for row, property_profile in zip(rows, properties_profiles):
+            curs.execute("SAVEPOINT listing")
+            try:
+                psycopg2.extras.execute_values(curs, insert_listings_query, [row])
+                curs.execute("RELEASE SAVEPOINT listing")
+                stored += 1
+            except (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.ProgrammingError) as e:
+                curs.execute("ROLLBACK TO SAVEPOINT listing")
+                print("Error occurred storing property in DB: {}. CULPRIT OBJECT: {} ".
+                      format(e, property_profile))
+    conn.commit()
+    return stored
+
+
+def _listing_row(property_profile: dict, run_id=None):
+    return (property_profile[rmv_constants.RmvPropDetails.prop_uuid.name],
+            property_profile[rmv_constants.RmvPropDetails.geo_lat.name],
+            property_profile[rmv_constants.RmvPropDetails.geo_long.name],
+            property_profile[rmv_constants.RmvPropDetails.postcode.name],
+            property_profile[rmv_constants.RmvPropDetails.rent_pcm.name],
+            property_profile[rmv_constants.RmvPropDetails.beds.name],
+            property_profile[rmv_constants.RmvPropDetails.date_available.name],
+            property_profile[rmv_constants.RmvPropDetails.rmv_unique_link.name],
+            json.dumps(property_profile[rmv_constants.RmvPropDetails.image_links.name]),
+            json.dumps(property_profile[rmv_constants.RmvPropDetails.floorplan_links.name]),
+            property_profile[rmv_constants.RmvPropDetails.estate_agent.name],
+            property_profile[rmv_constants.RmvPropDetails.estate_agent_address.name],
+            property_profile[rmv_constants.RmvPropDetails.description.name],
+            property_profile[rmv_constants.RmvPropDetails.url.name],
+            datetime.datetime.strftime(datetime.datetime.now(), "%Y-%m-%d %H:%M:%S"),
+            property_profile[rmv_constants.RmvPropDetails.summary_fingerprint.name],
+            run_id)
@@ -0,0 +1,88 @@
+import time
+import threading
+
+import psycopg2
+
+from app import db, listing_writer, rmv_constants
+
+
+class FakeConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _listing(i):
+    listing = {x.name: None for x in rmv_constants.RmvPropDetails}
+    listing[rmv_constants.RmvPropDetails.rmv_unique_link.name] = str(i)
+    return listing
+
+
+def _record_batches(monkeypatch, delay=0.0):
+    batches = []
+
+    def store_batch(conn, properties_profiles, run_id=None):
+        time.sleep(delay)
+        batches.append([x[rmv_constants.RmvPropDetails.rmv_unique_link.name] for x in properties_profiles])
+        return len(properties_profiles)
+
+    monkeypatch.setattr(psycopg2, 'connect', lambda *args, **kwargs: FakeConnection())
+    # a pool of its own, so the fake connections don't end up in the process-wide one
+    monkeypatch.setattr(db, 'pool', db.ConnectionPool('fake', min_connections=1, max_connections=1, timeout=5,
+                                                      health_check_after=60, max_idle=60))
+    monkeypatch.setattr(listing_writer, 'store_batch', store_batch)
+    return batches
+
+
+def test_writes_in_batches_and_flushes_the_rest_on_close(monkeypatch):
+    batches = _record_batches(monkeypatch)
+
+    with listing_writer.ListingWriter(batch_size=4, flush_interval=60) as writer:
+        [writer.put(_listing(i)) for i in range(10)]
+
+    assert [len(x) for x in batches] == [4, 4, 2]
+    assert [x for batch in batches for x in batch] == [str(i) for i in range(10)]
+    assert writer.stored == 10 and writer.failed == 0
+
+
+def test_partial_batch_is_written_after_flush_interval(monkeypatch):
+    batches = _record_batches(monkeypatch)
+
+    with listing_writer.ListingWriter(batch_size=100, flush_interval=0.05) as writer:
+        writer.put(_listing(1))
+        time.sleep(0.3)
+        assert batches == [['1']]
+
+
+def test_put_blocks_while_the_db_is_behind(monkeypatch):
+    _record_batches(monkeypatch, delay=0.2)
+
+    with listing_writer.ListingWriter(batch_size=1, max_queued=1, flush_interval=60) as writer:
+        writer.put(_listing(1))  # taken by the writer, which is now busy storing it
+        writer.put(_listing(2))  # fills the queue
+        blocked = threading.Thread(target=writer.put, args=(_listing(3),))
+        blocked.start()
+        blocked.join(0.05)
+        assert blocked.is_alive()
+        blocked.join()
+
+    assert writer.stored == 3
+
+
+def test_failed_batch_is_counted_and_writer_carries_on(monkeypatch):
+    batches = _record_batches(monkeypatch)
+    original = listing_writer.store_batch
+
+    def store_batch(conn, properties_profiles, run_id=None):
+        if properties_profiles[0][rmv_constants.RmvPropDetails.rmv_unique_link.name] == '0':
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        return original(conn, properties_profiles, run_id)
+
+    monkeypatch.setattr(listing_writer, 'store_batch', store_batch)
+
+    with listing_writer.ListingWriter(batch_size=2, flush_interval=60) as writer:
+        [writer.put(_listing(i)) for i in range(4)]
+
+    assert batches == [['2', '3']]
+    assert writer.stored == 2 and writer.failed == 2
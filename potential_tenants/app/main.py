@@ -1,7 +1,6 @@
 import os
 import sys
 import json
-from time import sleep
 import uuid
 import errno
 import random
@@ -10,24 +9,31 @@ import datetime
 import traceback
 from functools import partial
 
-import requests
 import psycopg2
 import psycopg2.extras
 import psycopg2.errors
 
 from app.rmv_scraper import RmvScraper
 
-from app import util, filters, general_constants, ranking, rmv_constants
+from app import util, filters, db, ranking, rmv_constants, listing, thresholds, webflow
 from travel import travel_time
 
 DEBUG = os.environ.get("DEBUG").lower() == 'true' or False
 MAX_USER_RESULTS = int(os.environ.get("MAX_USER_RESULTS"))
+# 'parallel' (spawn Pool of NUM_PROCS workers), 'async' (coroutines on RMV_MAX_CONNECTIONS connections)
+# or 'pipelined' (async with detail fetches starting while summary pages are still being paged)
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "parallel").lower()
+# when true the first (loosest) round of filters is applied inside the scraper as each listing is parsed, so
+# listings failing it are never sent back, stored or held on to
+STREAMING_FILTERS = os.environ.get("STREAMING_FILTERS", "false").lower() == 'true'
+
+# filtering starts from these and tightens until few enough properties are left
+INITIAL_IMAGES_THRESHOLD = 4
+INITIAL_MIN_RENT_FACTOR = 0.55
 
 USER = 'test_user'
 NEW_RUN = True
 
-WEBFLOW_COLLECTION_ID = "5e62aadc51beef34cfbc64d8"
-
 # ------------------------- // -------------------------
 
 USER_CONFIG_PATH = './users/{}/input/user_config.json'.format(USER)
@@ -39,9 +45,16 @@ USER_FILTER_CACHE_FILE = USER_OUTPUT_DATA_PATH + '.lastrunfiltered'
 def new_search(config):
     print("This is a new run so going to the Internet to get deets ...")
     start = timeit.default_timer()
-    rmv = RmvScraper(config)
+    filter_chain = filters.FilterChain(listing_filters(config, INITIAL_IMAGES_THRESHOLD, INITIAL_MIN_RENT_FACTOR)) \
+        if STREAMING_FILTERS else None
+    rmv = RmvScraper(config, filter_chain=filter_chain)
     try:
-        rmv_properties = rmv.search_parallel()
+        if SEARCH_MODE == 'async':
+            rmv_properties = rmv.search_async()
+        elif SEARCH_MODE == 'pipelined':
+            rmv_properties = rmv.search_pipelined()
+        else:
+            rmv_properties = rmv.search_parallel()
 
     except KeyError as e:
         print("The config file is malformed: {} does not exist".format(e))
@@ -53,13 +66,46 @@ def new_search(config):
     return rmv_properties
 
 
+def available_date_window(config):
+    """
+    Earliest and latest available dates a listing can have, a few days either side of what the user asked for
+    """
+    lower_threshold = datetime.datetime.strptime(config['date_low'], "%Y-%m-%d %H:%M:%S") - datetime.timedelta(days=5)
+    upper_threshold = datetime.datetime.strptime(config['date_high'], "%Y-%m-%d %H:%M:%S") + datetime.timedelta(days=5)
+    return lower_threshold, upper_threshold
+
+
+def listing_filters(config, images_threshold: int, min_rent_factor: float):
+    """
+    (name, filter) steps for one round of filtering, cheapest first
+    """
+    lower_threshold, upper_threshold = available_date_window(config)
+
+    return [('images', partial(filters.enough_images_filter, threshold=images_threshold)),
+            ('date_available', partial(filters.date_available_filter, lower_threshold=lower_threshold,
+                                       upper_threshold=upper_threshold)),
+            ('min_rent', partial(filters.min_rent_filter, threshold=min_rent_factor * config['maxPrice']))]
+
+
+def listing_masks(config, images_threshold: int, min_rent_factor: float):
+    """
+    listing_filters as (name, mask) steps for filters.batch_filter
+    """
+    lower_threshold, upper_threshold = available_date_window(config)
+
+    return [('images', partial(filters.enough_images_mask, threshold=images_threshold)),
+            ('date_available', partial(filters.date_available_mask, lower_threshold=lower_threshold,
+                                       upper_threshold=upper_threshold)),
+            ('min_rent', partial(filters.min_rent_mask, threshold=min_rent_factor * config['maxPrice']))]
+
+
 def get_prev_filtered_props_id(user_uuid: uuid.UUID):
     get_prev_results_query = """
         SELECT website_unique_id, score FROM filtered_properties 
         WHERE user_uuid = %s
         """
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(get_prev_results_query, (user_uuid,))
             prev_filtered_properties = {x[0]: x[1] for x in curs.fetchall()}
@@ -67,60 +113,60 @@ def get_prev_filtered_props_id(user_uuid: uuid.UUID):
     return prev_filtered_properties
 
 
-def remove_duplicates(user_uuid: uuid.UUID, curr_properties_list: list):
-    print("Identifying any properties from previous runs that have the same scores so that these can be discarded ...")
+def get_new_props_id(user_uuid: uuid.UUID, curr_filtered_properties_id_score: dict):
+    """
+    IDs of the current properties not already sent to the user with the same score. The current IDs and scores go
+    to Postgres as arrays and are anti-joined there against the user's filtered_properties (indexed on user and ID),
+    so the user's history never comes back over the wire however long it gets
+    """
+    get_new_props_query = """
+        SELECT curr.website_unique_id FROM unnest(%s::varchar[], %s::float[]) AS curr(website_unique_id, score)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM filtered_properties prev
+            WHERE prev.user_uuid = %s AND prev.website_unique_id = curr.website_unique_id
+            AND prev.score IS NOT DISTINCT FROM curr.score)
+        """
 
-    try:
-        indexed_curr_properties = {x[rmv_constants.RmvPropDetails.rmv_unique_link.name]: x for x in
-                                   curr_properties_list}
+    with db.connection() as conn:
+        with conn.cursor() as curs:
+            curs.execute(get_new_props_query, (list(curr_filtered_properties_id_score.keys()),
+                                               list(curr_filtered_properties_id_score.values()), user_uuid))
+            return {x[0] for x in curs.fetchall()}
 
-        prev_filtered_properties_id_score = get_prev_filtered_props_id(user_uuid)
-        curr_filtered_properties_id_score = {x[rmv_constants.RmvPropDetails.rmv_unique_link.name]: x["score"]
-                                             for x in curr_properties_list}
-        duplicate_properties_id = []
 
-        for k, v in curr_filtered_properties_id_score.items():
-            if k in prev_filtered_properties_id_score and v == prev_filtered_properties_id_score[k]:
-                duplicate_properties_id.append(k)
+def get_new_props_id_in_memory(user_uuid: uuid.UUID, curr_filtered_properties_id_score: dict):
+    """
+    get_new_props_id done here instead, against every previous (ID, score) of the user
+    """
+    prev_filtered_properties_id_score = set(get_prev_filtered_props_id(user_uuid).items())
+    return {k for k, v in curr_filtered_properties_id_score.items() if (k, v) not in prev_filtered_properties_id_score}
 
-    except (ValueError, KeyError):
-        print(traceback.format_exc(), file=sys.stderr)
 
-    # This is because sometimes code goes through the same RMV ID twice possibly because RMV returns same property
-    # for different areas. This is guaranteed positive or 0 since indexed object will be unique
-    # through dict construction and set is unique
-    curr_properties_duplicates = len(curr_properties_list) - len(indexed_curr_properties)
+def remove_duplicates(user_uuid: uuid.UUID, curr_properties_list: list):
+    print("Identifying any properties from previous runs that have the same scores so that these can be discarded ...")
 
-    # duplicate_properties_id = curr_filtered_properties_id.intersection(prev_filtered_properties_id)
-    unique_properties = []
-    for x in indexed_curr_properties:
+    # This is because sometimes code goes through the same RMV ID twice possibly because RMV returns same property
+    # for different areas. The last listing of an ID is kept, along with its score
+    indexed_curr_properties = {}
+    curr_filtered_properties_id_score = {}
+    for x in curr_properties_list:
         try:
-            if x not in duplicate_properties_id:
-                unique_properties.append(indexed_curr_properties[x])
-        # unique_properties = [list(x.values())[0] for x in indexed_curr_properties_list
-        #                  if x not in duplicate_properties_id]
-        except Exception:
+            property_id = x[rmv_constants.RmvPropDetails.rmv_unique_link.name]
+            curr_filtered_properties_id_score[property_id] = x["score"]
+            indexed_curr_properties[property_id] = x
+        except KeyError:
             print(traceback.format_exc(), file=sys.stderr)
             print("Remove duplicates - CULPRIT: {}".format(x))
-        continue
-
-    # for each in indexed_curr_properties_list:
-    #     if list(each.keys())[0] not in duplicate_properties_id:
-    #         unique_properties.append(list(each.values())[0])
-    #
-    # for prop_id in duplicate_properties_id:
-    #     for each in indexed_curr_properties_list:
-    #         if prop_id in each.keys():
-    #             indexed_curr_properties_list.pop()
-
-    # for i, each in enumerate(curr_properties_list):
-    #     for k, v in each.items():
-    #         if k == rmv_constants.RmvPropDetails.rmv_unique_link.name:
-    #             if v in duplicate_properties_id:
-    #                 del curr_properties_list[i]
-    #             break
-
-    print("Removed {} duplicates from previous runs".format(len(duplicate_properties_id) + curr_properties_duplicates))
+
+    try:
+        new_properties_id = get_new_props_id(user_uuid, curr_filtered_properties_id_score)
+    except psycopg2.Error as e:
+        print("Could not remove duplicates in DB, doing it here instead: {}".format(e))
+        new_properties_id = get_new_props_id_in_memory(user_uuid, curr_filtered_properties_id_score)
+
+    unique_properties = [v for k, v in indexed_curr_properties.items() if k in new_properties_id]
+
+    print("Removed {} duplicates from previous runs".format(len(curr_properties_list) - len(unique_properties)))
 
     return unique_properties
 
@@ -168,7 +214,7 @@ def upsert_user_db(user_config):
         "webflow_form_number": user_config["webflow_form_number"]
     }
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(insert_user_query, tuple([*user.values()]))
             user_uuid = curs.fetchone()[0]
@@ -198,107 +244,41 @@ def standardise_filtered_listing(user_uuid: uuid.UUID, filtered_listing: dict):
     }
 
 
-def get_webflow_users():
-    url = "https://api.webflow.com/collections/5e9cb6cb572a494febd4efb3/items"
-
-    headers = {
-        "Authorization": "Bearer {}".format(os.environ['WEBFLOW_API_KEY']),
-        "accept-version": "1.0.0",
-        "Content-Type": "application/json"
-    }
-
-    user_mapping = {}
-    try:
-        r = requests.get(url, headers=headers)
-        r.raise_for_status()
-        data = r.json()
-
-        for each in data['items']:
-            user_mapping[int(each["name"])] = each["_id"]
-
-    except requests.exceptions.HTTPError as e:
-        raise e
-
-    return user_mapping
+def get_webflow_users(refresh=False):
+    return webflow.users(refresh=refresh)
 
 
 def get_tube_stops_cms_items():
-    url = "https://api.webflow.com/collections/5eaf0803a0d3e484ca69b0db/items"
-
-    headers = {
-        "Authorization": "Bearer {}".format(os.environ['WEBFLOW_API_KEY']),
-        "accept-version": "1.0.0",
-        "Content-Type": "application/json"
-    }
-
-    r = requests.get(url, headers=headers)
+    return webflow.tube_stops()
 
-    tube_stop_collection_id_mapping = {}
-
-    if r.status_code == 200:
-        data = r.json()
-        for each in data['items']:
-            tube_stop_collection_id_mapping[each['name']] = each['_id']
-        total_results = data['total']
-        if total_results > data["count"]:
-            iters = int(total_results / data["count"])
-            for i in range(1, iters + 1):
-                r = requests.get(url, headers=headers, params={"offset": i * 100})
-                if r.status_code == 200:
-                    data = r.json()
-                    for each in data['items']:
-                        tube_stop_collection_id_mapping[each['name']] = each['_id']
-
-    return tube_stop_collection_id_mapping
-
-
-def write_webflow_cms(final_properties_list, webflow_user_mapping, user_config):
-    tube_stop_collection_id_mapping = get_tube_stops_cms_items()
-
-    webflow_db_mapping_query = """
-    INSERT INTO properties_cms_mapping 
-    (prop_uuid, webflow_cms_id)
-    VALUES (%s, %s)
-    """
 
+def webflow_cms_fields(final_properties_list, tube_stop_collection_id_mapping, webflow_user_mapping, user_config):
     image_indices = random.sample(
         [x for x in range(0, len(final_properties_list[rmv_constants.RmvPropDetails.image_links.name]))], 4)
 
-    headers = {
-        "Authorization": "Bearer {}".format(os.environ['WEBFLOW_API_KEY']),
-        "accept-version": "1.0.0",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "fields": {
-            "_archived": False,
-            "_draft": False,
-            "name": final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name],
-            "slug": str(final_properties_list[rmv_constants.RmvPropDetails.prop_uuid.name]),
-            "full-address": final_properties_list[rmv_constants.RmvPropDetails.street_address.name],
-            "original-ad-link": final_properties_list[rmv_constants.RmvPropDetails.url.name],
-            "rent-pcm": round(float(final_properties_list[rmv_constants.RmvPropDetails.rent_pcm.name]), 2),
-            "bedrooms": int(final_properties_list[rmv_constants.RmvPropDetails.beds.name]),
-            "main-image": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[0]],
-            "image-2": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[1]],
-            "image-3": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[2]],
-            "image-4": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[3]],
-            "score": final_properties_list['score'],
-            "user-email": user_config['email'],
-            "user-email-2": webflow_user_mapping[user_config["webflow_form_number"]],
-            "tube-stop": []
-        }
+    fields = {
+        "_archived": False,
+        "_draft": False,
+        "name": final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name],
+        "slug": str(final_properties_list[rmv_constants.RmvPropDetails.prop_uuid.name]),
+        "full-address": final_properties_list[rmv_constants.RmvPropDetails.street_address.name],
+        "original-ad-link": final_properties_list[rmv_constants.RmvPropDetails.url.name],
+        "rent-pcm": round(float(final_properties_list[rmv_constants.RmvPropDetails.rent_pcm.name]), 2),
+        "bedrooms": int(final_properties_list[rmv_constants.RmvPropDetails.beds.name]),
+        "main-image": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[0]],
+        "image-2": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[1]],
+        "image-3": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[2]],
+        "image-4": final_properties_list[rmv_constants.RmvPropDetails.image_links.name][image_indices[3]],
+        "score": final_properties_list['score'],
+        "user-email": user_config['email'],
+        "user-email-2": webflow_user_mapping[user_config["webflow_form_number"]],
+        "tube-stop": []
     }
 
     for stop in final_properties_list["augment"]["nearby_station_zones"]:
         tube_stop = list(stop.keys())[0] + " " + "Underground Station"
-        try:
-            if tube_stop in tube_stop_collection_id_mapping:
-                payload["fields"]["tube-stop"].append(tube_stop_collection_id_mapping[tube_stop])
-
-        except KeyError:
-            pass
+        if tube_stop in tube_stop_collection_id_mapping:
+            fields["tube-stop"].append(tube_stop_collection_id_mapping[tube_stop])
 
     for i, each in enumerate(user_config['destinations']):
         dest = list(each.keys())[0]
@@ -310,33 +290,60 @@ def write_webflow_cms(final_properties_list, webflow_user_mapping, user_config):
 
         final_commute_string = ', '.join(commute_strings).replace('transit', 'public transport')
 
-        payload["fields"]["commute-{}".format(i + 1)] = "{}: {}".format(dest, final_commute_string).capitalize()
+        fields["commute-{}".format(i + 1)] = "{}: {}".format(dest, final_commute_string).capitalize()
 
-    url = "https://api.webflow.com/collections/{}/items?live=true".format(WEBFLOW_COLLECTION_ID)
+    return fields
 
-    r = requests.post(url, headers=headers, json=payload)
 
-    if r.status_code == 200:
-        print("Successfully added property ID {} in CMS".
-              format(final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name]))
-        content = json.loads(r.content)
+def write_webflow_cms(final_properties, webflow_user_mapping, user_config):
+    """
+    Publishes the properties to the CMS a few at a time, as fast as the Webflow rate limit allows, then records
+    the CMS item of each one published in a single write
+    """
+    webflow_db_mapping_query = """
+    INSERT INTO properties_cms_mapping 
+    (prop_uuid, webflow_cms_id)
+    VALUES %s
+    """
 
-        with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
-            with conn.cursor() as curs:
-                curs.execute(webflow_db_mapping_query,
-                             (final_properties_list[rmv_constants.RmvPropDetails.prop_uuid.name], content['_id']))
+    tube_stop_collection_id_mapping = get_tube_stops_cms_items()
+
+    to_publish = []
+    for x in final_properties:
         try:
-            if int(r.headers['X-RateLimit-Remaining']) <= 1:  # 1 instead of 0 because of bug in Webflow API
-                print("Going to sleep for 70s to reset Webflow rate limit ...")
-                sleep(70)  # Sleep for 60s before making new requests to Webflow
-        except KeyError:
-            pass
+            to_publish.append((x, webflow_cms_fields(x, tube_stop_collection_id_mapping, webflow_user_mapping,
+                                                     user_config)))
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            print("Could not prepare property ID {} for CMS: {}".format(
+                x[rmv_constants.RmvPropDetails.rmv_unique_link.name], e))
 
-    else:
-        # TODO: the error occurs when rent-pcm = inf. Need to fix this so these props don't make it through the pipeline
-        print("An error occurred for property ID {} writing to CMS: {}".format(
-            final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name], r.content))
-        print("CULPRIT: {}".format(payload))
+    client = webflow.WebflowClient()
+    start = timeit.default_timer()
+    responses = client.create_items(webflow.PROPERTIES_COLLECTION_ID, [x[1] for x in to_publish])
+
+    cms_mapping = []
+    for (final_properties_list, fields), r in zip(to_publish, responses):
+        if r is not None and r.status_code == 200:
+            print("Successfully added property ID {} in CMS".
+                  format(final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name]))
+            cms_mapping.append((final_properties_list[rmv_constants.RmvPropDetails.prop_uuid.name], r.json()['_id']))
+        elif r is not None:
+            # TODO: the error occurs when rent-pcm = inf. Need to fix this so these props don't make it through the
+            #  pipeline
+            print("An error occurred for property ID {} writing to CMS: {}".format(
+                final_properties_list[rmv_constants.RmvPropDetails.rmv_unique_link.name], r.content))
+            print("CULPRIT: {}".format({"fields": fields}))
+
+    print("Published {} of {} properties to CMS in {:.2f} seconds ({} requests, {:.2f}s waiting on rate limit)".format(
+        len(cms_mapping), len(final_properties), timeit.default_timer() - start, client.requests_made,
+        client.bucket.waited))
+    print("Webflow users cache: {}. Tube stops cache: {}".format(webflow.users_cache.stats(),
+                                                                   webflow.tube_stops_cache.stats()))
+
+    if cms_mapping:
+        with db.connection() as conn:
+            with conn.cursor() as curs:
+                psycopg2.extras.execute_values(curs, webflow_db_mapping_query, cms_mapping)
 
 
 def update_prop_status(prop_id, status):
@@ -352,7 +359,7 @@ def update_prop_status(prop_id, status):
     RETURNING website_unique_id
     """
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(get_cms_item_id_query, (prop_id,))
             cms_item_id = curs.fetchone()
@@ -360,20 +367,7 @@ def update_prop_status(prop_id, status):
             website_id = curs.fetchone()[0]
             print("Updated status of property {} in DB to {}".format(website_id, status))
 
-    url = "https://api.webflow.com/collections/{}/items/{}?live=true".format(WEBFLOW_COLLECTION_ID, cms_item_id[0])
-
-    headers = {
-        "Authorization": "Bearer {}".format(os.environ['WEBFLOW_API_KEY']),
-        "accept-version": "1.0.0",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "fields": {
-            "user-rating": status
-        }
-    }
-    r = requests.patch(url, headers=headers, json=payload)
+    r = webflow.WebflowClient().update_item(webflow.PROPERTIES_COLLECTION_ID, cms_item_id[0], {"user-rating": status})
 
     if r.status_code == 200:
         print("Updated status of property {} in CMS to {}".format(website_id, status))
@@ -390,49 +384,24 @@ def main(config):
             with open(USER_ALL_CACHE_FILE, 'r') as f:
                 backup_file = f.read()
                 print("This is a re-run so reading deets from backup file: {}".format(backup_file))
-                rmv_properties = util.csv_reader(backup_file)
+                rmv_properties = [listing.Listing.from_dict(x) for x in util.csv_reader(backup_file)]
         except FileNotFoundError as e:
             print("{}. Quitting now ...".format(e))
             exit(errno.ENOENT)
 
-    # Filtering properties
-    lower_threshold = datetime.datetime.strptime(config['date_low'], "%Y-%m-%d %H:%M:%S") - datetime.timedelta(days=5)
-    upper_threshold = datetime.datetime.strptime(config['date_high'], "%Y-%m-%d %H:%M:%S") + datetime.timedelta(days=5)
-
-    images_threshold = 4
-    min_rent_factor = 0.55
-
-    properties_to_filter = rmv_properties
-    while True:
-        print("Filtering criteria: Images Threshold: {}. Min Rent Factor: {}".format(images_threshold, min_rent_factor))
-        filters_to_use = [partial(filters.enough_images_filter, threshold=images_threshold),
-                          partial(filters.date_available_filter,
-                                  lower_threshold=datetime.datetime.strftime(lower_threshold, "%Y-%m-%d %H:%M:%S"),
-                                  upper_threshold=datetime.datetime.strftime(upper_threshold, "%Y-%m-%d %H:%M:%S")),
-                          partial(filters.min_rent_filter, threshold=min_rent_factor * config['maxPrice'])]
-
-        print("Filtering properties now ...")
-        for i, f in enumerate(filters_to_use):
-            filtered_properties = [x for x in properties_to_filter if f(x)]
-            print("Step {} Filter: Removed {} properties".format(i, len(properties_to_filter) - len(filtered_properties)))
-            properties_to_filter = filtered_properties
-
-        # filtered_properties = list(filter(lambda x: all(f(x) for f in filters_to_use), rmv_properties))
-        print("Retained {} properties after filtering".format(len(filtered_properties)))
-
-        if len(filtered_properties) <= MAX_USER_RESULTS:
-            break
-
-        if images_threshold < 6:
-            images_threshold += 1
-
-        if min_rent_factor < 0.8:
-            min_rent_factor += 0.05
-
-        if images_threshold > 6 or min_rent_factor > 0.8:
-            break
-
-        print("Updating filtering criteria ...")
+    # Filtering properties: tighten the thresholds until few enough properties are left, or they can't get tighter
+    print("Filtering properties now ...")
+    columns = filters.to_columns(rmv_properties)
+    solver = thresholds.ThresholdSolver(columns, *available_date_window(config))
+    images_threshold, min_rent_factor = solver.solve(
+        thresholds.relaxation_schedule(INITIAL_IMAGES_THRESHOLD, INITIAL_MIN_RENT_FACTOR), MAX_USER_RESULTS,
+        config['maxPrice'])
+    print("Filtering criteria: Images Threshold: {}. Min Rent Factor: {}".format(images_threshold, min_rent_factor))
+    result = filters.batch_filter(columns, listing_masks(config, images_threshold, min_rent_factor))
+    for i, removed in enumerate(result.removed.values()):
+        print("Step {} Filter: Removed {} properties".format(i, removed))
+    filtered_properties = [rmv_properties[i] for i in result.indices]
+    print("Retained {} properties after filtering".format(len(filtered_properties)))
 
     insert_many_filtered_prop_query = """
     INSERT into filtered_properties 
@@ -472,7 +441,7 @@ def main(config):
         standardised_filtered_listing = [standardise_filtered_listing(user_uuid, x) for x in top_results]
 
         try:
-            with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+            with db.connection() as conn:
                 with conn.cursor() as curs:
                     # template = "%(user_uuid)s,%(prop_uuid)s,%(website_unique_id)s,%(url)s," \
                     #            "%(date_sent_to_user)s,%(avg_travel_time_transit)s," \
@@ -489,11 +458,16 @@ def main(config):
                                                      x[rmv_constants.RmvPropDetails.prop_uuid.name])
                                                     for x in top_results], template=template)
                     print("Stored {} new filtered properties in DB.".format(len(standardised_filtered_listing)))
-                    if not DEBUG:
-                        user_mapping = get_webflow_users()
-                        [write_webflow_cms(x, user_mapping, config) for x in top_results]
-                    else:
-                        print("Skipping writing to Webflow because DEBUG is {}".format(DEBUG))
+
+            # publishing takes a connection of its own, so the one above goes back to the pool first
+            if not DEBUG:
+                user_mapping = get_webflow_users()
+                if config["webflow_form_number"] not in user_mapping:
+                    # signed up since the users were last fetched
+                    user_mapping = get_webflow_users(refresh=True)
+                write_webflow_cms(top_results, user_mapping, config)
+            else:
+                print("Skipping writing to Webflow because DEBUG is {}".format(DEBUG))
 
         except Exception as e:
             print("Could not store some properties in DB: {}".format(e))
@@ -504,6 +478,8 @@ def main(config):
     else:
         print("FINAL RESULT: No new properties so not writing to DB. Thanks for running!")
 
+    print("DB connection pool: {}".format(db.pool.stats()))
+
 
 if __name__ == '__main__':
     psycopg2.extras.register_uuid()
@@ -0,0 +1,85 @@
+import os
+import sys
+import gzip
+import hashlib
+import datetime
+import timeit
+from urllib.parse import urlencode
+
+SUMMARY = 'summary'
+MAP_SEARCH = 'map_search'  # JSON rather than HTML, but kept the same way
+DETAIL = 'detail'
+
+URL_FILE = 'url'
+PAGE_SUFFIX = '.html.gz'
+FETCH_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+class PageCache:
+    """
+    Keeps every fetched Rightmove page gzipped on disk as <root>/<kind>/<ab>/<sha256 of url>/<fetch time>.html.gz
+    (with the url itself alongside) so that extraction can be re-run offline and benchmarks get real inputs
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def cache_url(url: str, params: dict = None):
+        # params sorted so the same search always maps to the same key whichever client built the request
+        return url + '?' + urlencode(sorted(params.items())) if params else url
+
+    def store(self, kind: str, url: str, html: str, fetched_at: datetime.datetime = None):
+        fetched_at = fetched_at or datetime.datetime.now()
+        page_dir = self._page_dir(kind, url)
+        os.makedirs(page_dir, exist_ok=True)
+
+        url_file = os.path.join(page_dir, URL_FILE)
+        if not os.path.exists(url_file):
+            self._write_atomic(url_file, url.encode('utf-8'))
+
+        page_file = os.path.join(page_dir, fetched_at.strftime(FETCH_TIME_FORMAT) + PAGE_SUFFIX)
+        self._write_atomic(page_file, gzip.compress(html.encode('utf-8')))
+        return page_file
+
+    def latest(self, kind: str):
+        """
+        Yields (url, fetched_at, html) for the most recent fetch of every cached url of this kind
+        """
+        for dir_path, _, file_names in os.walk(os.path.join(self.root, kind)):
+            pages = sorted(x for x in file_names if x.endswith(PAGE_SUFFIX))
+            if not pages or URL_FILE not in file_names:
+                continue
+
+            with open(os.path.join(dir_path, URL_FILE), 'r') as f:
+                url = f.read()
+            with gzip.open(os.path.join(dir_path, pages[-1]), 'rt', encoding='utf-8') as f:
+                html = f.read()
+
+            yield url, datetime.datetime.strptime(pages[-1][:-len(PAGE_SUFFIX)], FETCH_TIME_FORMAT), html
+
+    def _page_dir(self, kind: str, url: str):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, kind, digest[:2], digest)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        # several worker processes can fetch the same page so never leave a half-written file behind
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    # Offline re-parse: python -m app.page_cache <cache dir> [--store]
+    from app.rmv_scraper import RmvScraper
+
+    os.environ['PAGE_CACHE_DIR'] = sys.argv[1]
+    # no price cap so every cached card is kept
+    rmv = RmvScraper({"destinations": [], "maxPrice": sys.maxsize, "minBedrooms": 0, "radius": 0})
+
+    start = timeit.default_timer()
+    listings = rmv.reparse(store='--store' in sys.argv)
+    end = timeit.default_timer()
+    print("Re-parsed {} listings from {} in {} seconds".format(len(listings), sys.argv[1], end - start))
@@ -0,0 +1,26 @@
+import datetime
+
+from app import page_cache
+
+
+def test_latest_is_the_newest_fetch_of_each_url(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    first = datetime.datetime(2020, 3, 12, 9, 0)
+    cache.store(page_cache.DETAIL, 'https://rmv/property-1.html', "old", first)
+    cache.store(page_cache.DETAIL, 'https://rmv/property-1.html', "new", first + datetime.timedelta(minutes=5))
+    cache.store(page_cache.DETAIL, 'https://rmv/property-2.html', "only", first)
+    cache.store(page_cache.SUMMARY, 'https://rmv/find.html?index=0', "summary", first)
+
+    assert sorted(cache.latest(page_cache.DETAIL)) == [
+        ('https://rmv/property-1.html', first + datetime.timedelta(minutes=5), "new"),
+        ('https://rmv/property-2.html', first, "only"),
+    ]
+    assert list(cache.latest(page_cache.SUMMARY)) == [('https://rmv/find.html?index=0', first, "summary")]
+    assert list(cache.latest(page_cache.MAP_SEARCH)) == []
+
+
+def test_same_search_maps_to_the_same_url_whatever_the_param_order():
+    assert page_cache.PageCache.cache_url('https://rmv/find.html', {"radius": 0, "index": 24}) == \
+        page_cache.PageCache.cache_url('https://rmv/find.html', {"index": 24, "radius": 0}) == \
+        'https://rmv/find.html?index=24&radius=0'
+    assert page_cache.PageCache.cache_url('https://rmv/property-1.html') == 'https://rmv/property-1.html'
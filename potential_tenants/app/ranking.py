@@ -1,27 +1,18 @@
 import uuid
-import psycopg2
 import polyline
 import traceback
 from shapely import geometry
 from collections import namedtuple
 from functools import reduce
 
-from app import filters, general_constants, rmv_constants
+from app import db, filters, general_constants, rmv_constants
 
 
 class PropertyScorer:
     def __init__(self):
-        self._db_url = general_constants.DB_URL
-        self._db_conn = self._connect_db()
         self._london_areas_ids_names, self._london_polylines = self._get_london_areas_boundaries()
         self._london_cats = self._get_london_nhoods_cats()
 
-    def __del__(self):
-        self._db_conn.close()
-
-    def _connect_db(self):
-        return psycopg2.connect(self._db_url, sslmode='allow')
-
     def score(self, listing: dict, user_desired_areas: [str],
               user_desired_cats: [general_constants.NhoodCategorisation],
               user_keywords: [general_constants.CheckboxFeatures]):
@@ -92,7 +83,7 @@ class PropertyScorer:
 
         Boundary_Result = namedtuple("Boundary_Result", ["nhood_id", "nhood_name", "polyline"])
 
-        with self._db_conn as conn:
+        with db.connection() as conn:
             with conn.cursor() as curs:
                 # print(curs.mogrify(get_polyline_query, (tuple(areas_ids),)))
                 curs.execute(get_polyline_query, (tuple(areas_ids),))
@@ -107,7 +98,7 @@ class PropertyScorer:
         WHERE in_london is TRUE
         """
 
-        with self._db_conn as conn:
+        with db.connection() as conn:
             with conn.cursor() as curs:
                 curs.execute(get_london_areas_query, )
                 data = curs.fetchall()
@@ -126,7 +117,7 @@ class PropertyScorer:
 
         Cat_Result = namedtuple('Cat_Result', field_names)
 
-        with self._db_conn as conn:
+        with db.connection() as conn:
             with conn.cursor() as curs:
                 curs.execute(get_london_nhoods_cats_query, )
                 data = [Cat_Result(*x) for x in curs.fetchall()]
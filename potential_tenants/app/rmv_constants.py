@@ -8,11 +8,59 @@ BASE_URL = "https://www.rightmove.co.uk/property-to-rent"
 FIND_URI = '/find.html'
 SEARCH_URL = 'https://where.rightmove.co.uk/search'
 MAX_RESULTS_PER_PAGE = 24
+# JSON endpoint behind the map view, which gives up to MAP_RESULTS_PER_PAGE structured results per request
+MAP_SEARCH_URI = '/api/_mapSearch'
+MAP_RESULTS_PER_PAGE = 499
+# map search prices come in the listing's own rent period, converted to per calendar month with these
+MONTHLY_RENT_FACTORS = {'daily': 365 / 12, 'weekly': 52 / 12, 'monthly': 1, 'quarterly': 4 / 12, 'yearly': 1 / 12}
+# where summaries come from (overridden by RMV_SUMMARY_SOURCE env var): 'html' result pages or the 'map' JSON
+SUMMARY_SOURCE_HTML = 'html'
+SUMMARY_SOURCE_MAP = 'map'
+SUMMARY_SOURCE = SUMMARY_SOURCE_HTML
+
+# connection pool size for the asyncio scraping engine and ceiling for the adaptive throttle
+# (overridden by RMV_MAX_CONNECTIONS env var)
+MAX_CONCURRENT_REQUESTS = 16
+# concurrent requests the throttle starts from before it has seen how the site is coping
+INITIAL_CONCURRENT_REQUESTS = 4
+# responses slower than this (seconds) stop the throttle from raising concurrency any further
+TARGET_LATENCY = 2.0
+# pause for every request in the process when RMV serves a page we can't parse (usually a block page)
+BLOCKED_PAUSE = 3 * 60
+# detail pages handed to each worker process at once in search_parallel, more are only handed out as results
+# are taken so a scrape waiting on the DB writer holds the workers back instead of piling up results
+PARALLEL_TASKS_PER_PROCESS = 4
+# summary pages of a single outcode fetched at once (overridden by RMV_PAGES_PER_OUTCODE env var)
+MAX_PAGES_PER_OUTCODE = 4
+REQUEST_TIMEOUT = 60  # seconds
+# same retry policy as util.requests_retry_session, retried statuses are throttle.BACKOFF_STATUSES
+MAX_RETRIES = 6
+RETRY_BACKOFF_FACTOR = 0.6
+# listings written per multi-row INSERT (and per transaction) when storing a run's results
+INSERT_BATCH_SIZE = 500
+# listings waiting to be written before scraping is held back for the DB to catch up
+WRITE_QUEUE_SIZE = 2 * INSERT_BATCH_SIZE
+FLUSH_INTERVAL = 5  # seconds a partial batch waits before being written anyway
+# an unfinished search run with the same config started within this many hours is carried on rather than restarted
+RESUME_WINDOW_HOURS = 24
+# a run still going says so every RUN_HEARTBEAT_SECONDS, one silent for RUN_STALE_AFTER_SECONDS is taken as abandoned
+# and can be carried on by another search
+RUN_HEARTBEAT_SECONDS = 60
+RUN_STALE_AFTER_SECONDS = 5 * RUN_HEARTBEAT_SECONDS
+# how long destination geocodes and where.rightmove search areas are reused for
+GEOCODE_CACHE_TTL_HOURS = 30 * 24
+SEARCH_AREAS_CACHE_TTL_HOURS = 24
+# summary IDs of an outcode and parsed listings are shared between searches for this long (0 disables it).
+# Searches are grouped by max price rounded up to the band so that similar budgets share pages
+OUTCODE_CACHE_TTL_MINUTES = 30
+OUTCODE_CACHE_PRICE_BAND = 250
+LISTING_CACHE_MAX_ENTRIES = 20000
 
 PROPERTY_ID_FILTER = {"class": "l-searchResult is-list"}
 TOTAL_COUNT_FILTER = {"class": "searchHeader-resultCount"}
 
 PROPERTY_RENT_SPAN_ID = "propertyCard-priceValue"
+PROPERTY_ADDED_REDUCED_FILTER = {"class": "propertyCard-branchSummary-addedOrReduced"}
 
 PROPERTY_DESCRIPTION_FILTER = {"class": "left overflow-hidden agent-content"}
 PROPERTY_DETAILS_FILTER = 'RIGHTMOVE.ANALYTICS.DataLayer.pushKV(k,v)'
@@ -74,6 +122,13 @@ class RmvPropDetails(AutoEnum):
     image_links: [str] = Semantic('"masterUrl"')
     floorplan_links: [str] = Semantic('zoomUrls')
     description: str = Semantic(auto())  # description does not have an identifier in JS scripts
+    summary_fingerprint: str = Semantic(auto())  # derived from the search results card, not the details page
+
+
+# What a search results card tells us about a property before its details page is fetched.
+# Beds and coordinates are only known when summaries come from the map search
+PropertySummary = namedtuple('PropertySummary', ['property_id', 'rent_pcm', 'added_or_reduced', 'beds', 'geo_lat',
+                                                 'geo_long'], defaults=(None, None, None))
 
 
 class RmvTransportModes(Enum):
@@ -0,0 +1,204 @@
+import re
+import datetime
+
+from calmjs.parse import es5
+from calmjs.parse.asttypes import Assign, UnaryExpr
+from calmjs.parse.walkers import Walker
+from bs4 import BeautifulSoup, SoupStrainer
+
+from app import rmv_constants
+
+# fields whose rmv_field is a real JS identifier (the others are auto() placeholders not found in the scripts)
+RMV_FIELDS = {field.value.rmv_field: field for field in rmv_constants.RmvPropDetails
+              if isinstance(field.value.rmv_field, str)}
+
+_STRING = r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+
+# Quoted keys only count when used as an object key ("key": ...), bare identifiers (zoomUrls) as a key or as the
+# left-hand side of an assignment, matching how they appear as Assign nodes in the ES5 AST. Any other string literal
+# is consumed whole so that nothing inside it is mistaken for a key.
+_KEY_RE = re.compile(
+    r'(?P<quoted>{quoted})\s*:'
+    r'|(?<![\w$."\'])(?P<identifier>{identifiers})\s*(?P<op>[:=])(?!=)'
+    r'|{string}'.format(
+        quoted='|'.join(re.escape(x) for x in RMV_FIELDS if x.startswith('"')),
+        identifiers='|'.join(re.escape(x) for x in RMV_FIELDS if not x.startswith('"')),
+        string=_STRING))
+
+_VALUE_RE = re.compile(
+    r'\s*(?:(?P<string>{string})'
+    r'|(?P<sign>[-+]?)\s*(?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)(?![\w$])'
+    r'|(?P<literal>true|false|null)(?![\w$])'
+    r'|(?P<array>\[\s*(?:(?:{string})\s*,?\s*)*\]))'.format(string=_STRING))
+
+_ARRAY_ITEM_RE = re.compile(_STRING)
+_VAR_DECLARATION_RE = re.compile(r'\b(?:var|let|const)\s*$')
+
+# scripts are flattened onto one line before matching, as the page's own line breaks are irrelevant
+_SCRIPT_WHITESPACE = str.maketrans('', '', '\r\n\t')
+
+
+class _DetailsStrainer(SoupStrainer):
+    """
+    A SoupStrainer that also lets every script tag through. A plain strainer applies its attribute rules to
+    all names, so it cannot ask for "any script, or the description div" on its own
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return name == 'script' or super().allow_tag_creation(nsprefix, name, attrs)
+
+
+# only the elements the scraper reads are turned into Tags, the rest of the page is discarded while parsing
+_SUMMARY_STRAINER = SoupStrainer(['div', 'span'], attrs={'class': [rmv_constants.PROPERTY_ID_FILTER['class'],
+                                                                   rmv_constants.TOTAL_COUNT_FILTER['class']]})
+_DETAILS_STRAINER = _DetailsStrainer('div', attrs=rmv_constants.PROPERTY_DESCRIPTION_FILTER)
+
+
+def summary_soup(html: str) -> BeautifulSoup:
+    """
+    Search results page parsed with lxml, keeping only the result cards and the result count
+    """
+    return BeautifulSoup(html, 'lxml', parse_only=_SUMMARY_STRAINER)
+
+
+def details_soup(html: str) -> BeautifulSoup:
+    """
+    Property page parsed with lxml, keeping only the script tags and the description div
+    """
+    return BeautifulSoup(html, 'lxml', parse_only=_DETAILS_STRAINER)
+
+
+def scripts_to_extract(scripts_soup: list):
+    """
+    Picks out the (newline-stripped) scripts, or pieces of scripts, that hold the listing's fields.
+    Every script is normalised once and routed in a single pass; only the ones we need are kept
+    """
+    scripts_with_details = []
+    # only the first script carrying each of these markers is used
+    first_scripts = {
+        rmv_constants.PROPERTY_AVAILABILITY_FILTER: None,
+        rmv_constants.PROPERTY_IMAGES_FILTER: None,
+        rmv_constants.PROPERTY_FLOORPLAN_FILTER: None
+    }
+
+    for script_tag in scripts_soup:
+        script = str(script_tag.next).strip().translate(_SCRIPT_WHITESPACE)
+        if rmv_constants.PROPERTY_DETAILS_FILTER in script:
+            scripts_with_details.append(script)
+        for marker, first_script in first_scripts.items():
+            if first_script is None and marker in script:
+                first_scripts[marker] = script
+
+    # the field we want is repeated many times in this script so we just pick one
+    # (use 6th element because it's first occurrence of clean JS code that doesn't cause the parser to break)
+    if first_scripts[rmv_constants.PROPERTY_AVAILABILITY_FILTER] is None:
+        raise IndexError("No availability script found")
+    scripts_with_availability = first_scripts[rmv_constants.PROPERTY_AVAILABILITY_FILTER].split('(jQuery);')[6]
+
+    # hacks because there is a JS error in the images script (missing semicolon) further down (around char 10710)
+    # that causes parser to break, so only keep the pieces that carry what we want
+    scripts_with_images = _pieces_with(first_scripts[rmv_constants.PROPERTY_IMAGES_FILTER],
+                                       rmv_constants.PROPERTY_IMAGES_FILTER)
+    scripts_with_floorplans = _pieces_with(first_scripts[rmv_constants.PROPERTY_FLOORPLAN_FILTER],
+                                           rmv_constants.PROPERTY_FLOORPLAN_FILTER)
+
+    return scripts_with_details + [scripts_with_availability] + scripts_with_images + scripts_with_floorplans
+
+
+def _pieces_with(script: str, marker: str):
+    if script is None:
+        return []
+    return [x for x in script.split('(jQuery);') if marker in x]
+
+
+def extract_fields(scripts: [str]) -> dict:
+    """
+    Single linear regex scan per script for the RmvPropDetails keys, giving the same values as extract_fields_ast
+    without building an ES5 AST. Values the AST path cannot represent either (objects, expressions) are skipped
+    """
+    property_listing = {}
+
+    for script in scripts:
+        for key_match in _KEY_RE.finditer(script):
+            key = key_match.group('quoted') or key_match.group('identifier')
+            if key is None:
+                continue  # some other string literal
+            if key_match.group('op') == '=' and _VAR_DECLARATION_RE.search(script, 0, key_match.start()):
+                continue  # declarations are not assignments in the AST either
+
+            value_match = _VALUE_RE.match(script, key_match.end())
+            if value_match is None:
+                continue
+
+            _set_field(property_listing, RMV_FIELDS[key], value_match)
+
+    return property_listing
+
+
+def _set_field(property_listing: dict, field: rmv_constants.RmvPropDetails, value_match):
+    array = value_match.group('array')
+    sign = value_match.group('sign')
+
+    if field is rmv_constants.RmvPropDetails.floorplan_links:
+        if array is not None:
+            property_listing[field.name] = [link.replace('"', '') for link in _ARRAY_ITEM_RE.findall(array)]
+        return
+
+    if array is not None:
+        return
+
+    if sign:
+        if field is rmv_constants.RmvPropDetails.image_links or \
+                field is rmv_constants.RmvPropDetails.date_available:
+            return
+        number = value_match.group('number')
+        property_listing[field.name] = str(float(number) * -1) if sign == '-' else number
+        return
+
+    raw_value = value_match.group('string') or value_match.group('number') or value_match.group('literal')
+
+    if field is rmv_constants.RmvPropDetails.image_links:
+        property_listing.setdefault(field.name, []).append(raw_value.replace('"', ''))
+    elif field is rmv_constants.RmvPropDetails.date_available:
+        property_listing[field.name] = datetime.datetime.strftime(
+            datetime.datetime.strptime(raw_value.replace('"', ''), "%Y-%m-%d-%H-%M-%S"), "%Y-%m-%d %H:%M:%S")
+    else:
+        property_listing[field.name] = raw_value.replace('"', '')
+
+
+def extract_fields_ast(scripts: [str]) -> dict:
+    """
+    Original extraction: parses each script to a full ES5 AST and walks every Assign node.
+    Kept as the reference implementation for extract_fields
+    """
+    property_listing = {}
+    walker = Walker()
+    tree = [es5(script) for script in scripts]
+
+    for tree_node in tree:
+        for node in walker.filter(tree_node, lambda x: isinstance(x, Assign)):
+            for field in rmv_constants.RmvPropDetails:
+                if field.value.rmv_field == node.left.value:
+                    if field.name == rmv_constants.RmvPropDetails.image_links.name:
+                        if field.name in property_listing:
+                            (property_listing[field.name]).append(node.right.value.replace('"', ''))
+                        else:
+                            property_listing[field.name] = [node.right.value.replace('"', '')]
+                    elif field.name == rmv_constants.RmvPropDetails.floorplan_links.name:
+                        property_listing[field.name] = [link.value.replace('"', '') for link in
+                                                        node.right.items]
+                    elif field.name == rmv_constants.RmvPropDetails.date_available.name:
+                        property_listing[field.name] = datetime.datetime.strftime(
+                            datetime.datetime.strptime(str(node.right.value).replace('"', ''),
+                                                       "%Y-%m-%d-%H-%M-%S"), "%Y-%m-%d %H:%M:%S")
+                    else:
+                        if isinstance(node.right, UnaryExpr):
+                            # node.right.value.value because float() only takes str or number
+                            # but not type "Number" which is what UnaryExpr type contains for node.right.value
+                            property_listing[field.name] = str(float(node.right.value.value) * -1) \
+                                if node.right.op == '-' else str(node.right.value)
+                        else:
+                            property_listing[field.name] = str(node.right.value).replace('"', '')
+                    break
+
+    return property_listing
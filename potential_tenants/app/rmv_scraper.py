@@ -1,70 +1,455 @@
 import os
 import re
 import json
+import asyncio
+import hashlib
 import datetime
 import dateutil.parser as parser
-import multiprocessing as mp
 import math
 import urllib3
+import copy
+import itertools
+from functools import partial
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
+import aiohttp
 import requests
 import psycopg2
 import psycopg2.extras
 import psycopg2.errors
-from calmjs.parse import es5
-from calmjs.parse.asttypes import Assign, UnaryExpr
-from calmjs.parse.walkers import Walker
 from bs4 import BeautifulSoup, Tag
 
-from app import util, general_constants, rmv_constants
+from app import util, db, rmv_constants, rmv_extract, page_cache, throttle, listing_writer, \
+    checkpoint, worker_pool, cache, listing, filters
+
+search_areas_cache = cache.TtlCache('search_areas', ttl=rmv_constants.SEARCH_AREAS_CACHE_TTL_HOURS * 3600)
+# shared by every search in the process, outcode summaries also through lookup_cache between processes.
+# search_parallel looks them up in this process too, its workers only fetch, parse and filter what misses
+outcode_cache = cache.TtlCache('outcode_summaries', ttl=60 * float(
+    os.getenv("OUTCODE_CACHE_TTL_MINUTES", rmv_constants.OUTCODE_CACHE_TTL_MINUTES)))
+listing_cache = cache.TtlCache('listings', ttl=outcode_cache.ttl, max_entries=rmv_constants.LISTING_CACHE_MAX_ENTRIES,
+                               persist=False)
+
+# what a search_parallel worker needs to fetch, parse and filter a detail page, sent along with every page so kept
+# to the few things that path uses rather than the whole scraper
+DetailsJob = namedtuple('DetailsJob', ['base_url', 'rmv_throttle', 'page_cache', 'filter_chain'])
+
+
+def fetch_listing(job: DetailsJob, property_summary: rmv_constants.PropertySummary):
+    """
+    Worker process side of search_parallel: the parsed listing if it passes job's filter chain, otherwise the small
+    filters.Rejected so rejected listings never leave the worker (None if it couldn't be fetched or parsed)
+    """
+    rmv = RmvScraper.for_details_job(job)
+    return rmv._filtered(rmv._fetch_property_details(property_summary))
+
+
+def fetch_summaries(rmv: 'RmvScraper', search_postcode: str):
+    """
+    Worker process side of search_parallel's summary pages, rmv being the scraper as given by _for_outcode
+    """
+    return rmv._fetch_summaries(search_postcode)
 
 
 class RmvScraper:
 
-    def __init__(self, config):
+    def __init__(self, config, filter_chain: filters.FilterChain = None):
         self.base_url = rmv_constants.BASE_URL
         self.find_url = self.base_url + rmv_constants.FIND_URI
+        self.map_search_url = rmv_constants.ROOT_URL + rmv_constants.MAP_SEARCH_URI
         self.bounding_area_url = rmv_constants.SEARCH_URL
-        self.max_results_per_page = rmv_constants.MAX_RESULTS_PER_PAGE
         self.outcode_list = None
+        self._summary_source = os.getenv("RMV_SUMMARY_SOURCE", rmv_constants.SUMMARY_SOURCE)
+        if self._summary_source not in (rmv_constants.SUMMARY_SOURCE_HTML, rmv_constants.SUMMARY_SOURCE_MAP):
+            raise ValueError("Unknown RMV_SUMMARY_SOURCE {}".format(self._summary_source))
+        self.max_results_per_page = rmv_constants.MAP_RESULTS_PER_PAGE \
+            if self._summary_source == rmv_constants.SUMMARY_SOURCE_MAP else rmv_constants.MAX_RESULTS_PER_PAGE
         self._parse_config(config)
         self._num_procs = int(os.getenv("NUM_PROCS"))
-        with open('rmv_outcode_lookup.json') as f:
+        self._max_connections = int(os.getenv("RMV_MAX_CONNECTIONS", rmv_constants.MAX_CONCURRENT_REQUESTS))
+        self._pages_per_outcode = int(os.getenv("RMV_PAGES_PER_OUTCODE", rmv_constants.MAX_PAGES_PER_OUTCODE))
+        # hours a stored listing stays reusable in incremental mode, 0 disables it
+        self._incremental_ttl = float(os.getenv("INCREMENTAL_TTL_HOURS", 0))
+        # every fetched page is also kept on disk when PAGE_CACHE_DIR is set
+        self._page_cache = page_cache.PageCache(os.environ['PAGE_CACHE_DIR']) if os.getenv('PAGE_CACHE_DIR') else None
+        with open(os.path.join(os.path.dirname(__file__), 'rmv_outcode_lookup.json')) as f:
             self._outcode_lookup = json.load(f)
+        # set for the duration of a search, RUN_ID carries on a specific earlier run
+        self._checkpoint = None
+        self._resumed_listings = {}
+        # applied to each listing as soon as it is parsed, only listings passing it are sent back, stored and kept
+        self._filter_chain = filter_chain
+        # proxy for the RMV throttle shared with the worker processes, set by search_parallel
+        self._shared_throttle = None
+
+    def __getstate__(self):
+        # worker processes only fetch and parse pages, they don't need listings carried over from an earlier attempt
+        # nor the outcode lookup, which is only used before any work is handed out
+        state = self.__dict__.copy()
+        state['_resumed_listings'] = {}
+        state['_outcode_lookup'] = None
+        return state
+
+    @classmethod
+    def for_details_job(cls, job: DetailsJob):
+        """
+        A scraper set up for _fetch_property_details and _filtered only, without reading the environment or the
+        outcode lookup as __init__ does
+        """
+        rmv = cls.__new__(cls)
+        rmv.base_url = job.base_url
+        rmv._shared_throttle = job.rmv_throttle
+        rmv._page_cache = job.page_cache
+        rmv._filter_chain = job.filter_chain
+        return rmv
 
     def search_parallel(self):
-        self._get_search_areas()
+        """
+        Summary and detail pages are fetched by NUM_PROCS spawned worker processes. outcode_cache and listing_cache
+        are looked up in this process before any page is handed to a worker. The workers share one RMV throttle,
+        served to them by a throttle.ThrottleManager process, so the limit covers their requests all together
+        """
+        return self._search(self._scrape_parallel)
+
+    def search_async(self):
+        """
+        Same as search_parallel but fetches summary and detail pages as coroutines on a bounded pool of
+        connections (RMV_MAX_CONNECTIONS) in this process instead of spawning NUM_PROCS worker processes
+        """
+        return self._search(lambda writer: asyncio.run(self._scrape_async(writer)))
+
+    def search_pipelined(self):
+        """
+        Streaming variant of search_async: property IDs are queued as soon as each summary page is parsed and
+        detail workers start on them straight away, so wall-clock time tends to max(summary, details) rather than
+        summary + details and one slow outcode no longer holds up the whole detail phase
+        """
+        return self._search(lambda writer: asyncio.run(self._scrape_pipelined(writer)))
+
+    def reparse(self, store=False):
+        """
+        Re-runs extraction over the pages in PAGE_CACHE_DIR with no network access at all, using the latest
+        fetch of each page. Summary pages are parsed first so that listings get their card fingerprints back
+        """
+        if self._page_cache is None:
+            raise ValueError("PAGE_CACHE_DIR needs to be set to re-parse cached pages")
+
+        properties_summaries = {}
+        for url, fetched_at, html in self._page_cache.latest(page_cache.SUMMARY):
+            _, page_summaries = self._parse_properties_summary(html)
+            properties_summaries.update({x.property_id: x for x in page_summaries})
+        for url, fetched_at, text in self._page_cache.latest(page_cache.MAP_SEARCH):
+            _, page_summaries = self._parse_map_search(text)
+            properties_summaries.update({x.property_id: x for x in page_summaries})
+
         properties_profiles = []
-        with mp.get_context("spawn").Pool(processes=self._num_procs) as pool:
-            properties_ids = pool.map(self._search_summary, self.outcode_list)
-            properties_ids_flat = [item for sublist in properties_ids for item in sublist]
-            print("Got back {} properties".format(len(properties_ids_flat)))
-            chunksize, extra = divmod(len(properties_ids_flat), self._num_procs * 4)
-            if extra:
-                chunksize += 1
-            if len(properties_ids_flat) == 0:
-                return []
-            for profiles in pool.imap_unordered(self._get_property_details, properties_ids_flat, chunksize=chunksize):
-                properties_profiles.append(profiles)
-                print("Gone through {} properties ...".format(len(properties_profiles)))
-
-            # results = pool.starmap(self.search, search_postcodes, **kwargs)
-            # print("Got back {} results and getting their profiles now".format(len(properties_id_list_flat)))
-            # # print(properties_id_list_flat)
-            # property_profiles = pool.map(self._get_property_details, properties_id_list_flat)
-            properties_profiles = list(filter(lambda x: True if x is not None else False, properties_profiles))
+        for url, fetched_at, html in self._page_cache.latest(page_cache.DETAIL):
+            property_id = url.rsplit('/', 1)[-1].replace('.html', '')
+            profile = self._parse_property_details(html, url, properties_summaries.get(property_id))
+            if profile is not None:
+                properties_profiles.append(profile)
+
+        print("Re-parsed {} listings from cached pages".format(len(properties_profiles)))
+        if store:
+            with listing_writer.ListingWriter() as writer:
+                [writer.put(x) for x in properties_profiles]
+        return properties_profiles
 
+    def _search(self, scrape):
+        """
+        scrape(writer) hands each new listing to the write-behind writer as soon as it is parsed, so listings
+        are already in property_listings (up to the last unflushed batch) if the run dies part way
+        """
+        self._checkpoint = checkpoint.SearchCheckpoint.start(self._config_hash, os.getenv('RUN_ID'),
+                                                            self.max_results_per_page)
+        try:
+            if self._checkpoint.resumed:
+                self.outcode_list = self._checkpoint.outcode_list
+                self._resumed_listings = self._load_run_listings(self._checkpoint.run_id)
+                print("{} listings already stored by this run".format(len(self._resumed_listings)))
+            else:
+                self._get_search_areas()
+                self._checkpoint.save_outcodes(self.outcode_list)
+
+            with listing_writer.ListingWriter(run_id=self._checkpoint.run_id) as writer:
+                properties_profiles, reused_profiles = scrape(writer)
+            self._checkpoint.finish()
+        finally:
+            # a failed run goes quiet so the next search can resume it
+            self._checkpoint.stop_heartbeat()
+        reused_profiles = [x for x in reused_profiles if self._keep(self._filtered(x))]
         print("Got back profiles for {} properties".format(len(properties_profiles)))
+        if self._filter_chain is not None:
+            print("Filter chain: {}".format(self._filter_chain.stats()))
+        print("RMV throttle: {}".format(self._rmv_throttle().stats()))
+        print("Outcode cache: {}. Listing cache: {}".format(outcode_cache.stats(), listing_cache.stats()))
+        return properties_profiles + reused_profiles
+
+    def _rmv_throttle(self):
+        # looked up rather than kept on self as the scraper is pickled into spawned worker processes, which get the
+        # shared one's proxy instead
+        if self._shared_throttle is not None:
+            return self._shared_throttle
+        return throttle.for_host(self.base_url, **self._rmv_throttle_settings())
+
+    def _rmv_throttle_settings(self):
+        return dict(max_limit=self._max_connections,
+                    initial_limit=min(rmv_constants.INITIAL_CONCURRENT_REQUESTS, self._max_connections),
+                    target_latency=rmv_constants.TARGET_LATENCY)
+
+    def _scrape_parallel(self, writer: listing_writer.ListingWriter = None):
+        """
+        Returns (freshly scraped listings, listings reused from property_listings in incremental mode).
+        Each fresh listing is also put on writer, if given, as it arrives. Listings failing the filter chain are
+        only counted
+        """
+        properties_profiles = []
+        processed = 0
+        # long-lived pool shared with every other search in this process, so no spawn cost per search
+        pool = worker_pool.get_pool(self._num_procs)
+        self._shared_throttle = throttle.shared_for_host(self.base_url, **self._rmv_throttle_settings())
+        # the shared caches are looked up here, so that concurrent misses are coalesced with every other search in
+        # this process, and only the pages still to fetch go to the workers. One thread per page in the pool
+        window = self._num_procs * rmv_constants.PARALLEL_TASKS_PER_PROCESS
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            properties_summaries = executor.map(
+                partial(self._search_summary, fetch=lambda x: pool.apply(fetch_summaries, (self._for_outcode(x), x))),
+                self.outcode_list)
+            properties_summaries_flat = self._dedupe_properties(
+                [item for sublist in properties_summaries for item in sublist])
+            properties_summaries_flat, reused_profiles = self._split_reusable(properties_summaries_flat)
+            if len(properties_summaries_flat) == 0:
+                return [], reused_profiles
+
+            job = DetailsJob(self.base_url, self._shared_throttle, self._page_cache, self._filter_chain)
+            get_details = partial(self._get_property_details_in_pool, pool, job)
+            for profiles in self._bounded_as_completed(executor, get_details, properties_summaries_flat, window):
+                processed += 1
+                if self._keep(profiles):
+                    properties_profiles.append(profiles)
+                    if writer is not None:
+                        writer.put(profiles)
+                print("Gone through {} properties ...".format(processed))
+
+        # results = pool.starmap(self.search, search_postcodes, **kwargs)
+        # print("Got back {} results and getting their profiles now".format(len(properties_id_list_flat)))
+        # # print(properties_id_list_flat)
+        # property_profiles = pool.map(self._get_property_details, properties_id_list_flat)
+
+        return properties_profiles, reused_profiles
+
+    def _for_outcode(self, search_postcode: str):
+        """
+        Copy of the scraper to send to a worker for one outcode's summary pages, carrying only that outcode's
+        checkpointed pages rather than the whole run's
+        """
+        rmv = copy.copy(self)
+        if self._checkpoint is not None:
+            rmv._checkpoint = self._checkpoint.for_outcode(search_postcode)
+        return rmv
 
-        [self._insert_to_db(x) for x in properties_profiles]
-        print("Finished storing all listings in DB")
-        return properties_profiles
+    @staticmethod
+    def _bounded_as_completed(executor, fn, items, window: int):
+        """
+        fn(x) for each of items on executor, yielding results as they complete. At most window calls are submitted
+        at a time, the next ones only once earlier results have been taken
+        """
+        items = iter(items)
+        pending = {executor.submit(fn, x) for x in itertools.islice(items, window)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                for x in itertools.islice(items, 1):
+                    pending.add(executor.submit(fn, x))
+
+    async def _scrape_async(self, writer: listing_writer.ListingWriter = None):
+        connector = aiohttp.TCPConnector(limit=self._max_connections)
+        timeout = aiohttp.ClientTimeout(total=rmv_constants.REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            properties_summaries = await asyncio.gather(*[self._search_summary_async(session, x)
+                                                          for x in self.outcode_list])
+            properties_summaries_flat = self._dedupe_properties(
+                [item for sublist in properties_summaries for item in sublist])
+            properties_summaries_flat, reused_profiles = await asyncio.get_running_loop().run_in_executor(
+                None, self._split_reusable, properties_summaries_flat)
+            if len(properties_summaries_flat) == 0:
+                return [], reused_profiles
+
+            properties_profiles = []
+            processed = 0
+            for future in asyncio.as_completed([self._get_property_details_async(session, x)
+                                                for x in properties_summaries_flat]):
+                profile = await future
+                processed += 1
+                if self._keep(profile):
+                    properties_profiles.append(profile)
+                    if writer is not None:
+                        await writer.put_async(profile)
+                print("Gone through {} properties ...".format(processed))
+
+        return properties_profiles, reused_profiles
+
+    async def _scrape_pipelined(self, writer: listing_writer.ListingWriter = None):
+        properties_queue = asyncio.Queue()
+        properties_profiles = []
+        reused_profiles = []
+        seen_ids = set()
+        processed = 0
+
+        async def enqueue_new(page_summaries: [rmv_constants.PropertySummary]):
+            new_summaries = []
+            for summary in page_summaries:
+                if summary.property_id not in seen_ids:
+                    seen_ids.add(summary.property_id)
+                    new_summaries.append(summary)
+            # the DB lookup for reusable listings is blocking so keep it off the event loop
+            to_fetch, reused = await asyncio.get_running_loop().run_in_executor(
+                None, self._split_reusable, new_summaries)
+            reused_profiles.extend(reused)
+            [properties_queue.put_nowait(x) for x in to_fetch]
+
+        async def details_worker(session: aiohttp.ClientSession):
+            nonlocal processed
+            while True:
+                summary = await properties_queue.get()
+                if summary is None:
+                    break
+                profile = await self._get_property_details_async(session, summary)
+                processed += 1
+                if self._keep(profile):
+                    properties_profiles.append(profile)
+                    if writer is not None:
+                        await writer.put_async(profile)
+                print("Gone through {} properties ...".format(processed))
+
+        connector = aiohttp.TCPConnector(limit=self._max_connections)
+        timeout = aiohttp.ClientTimeout(total=rmv_constants.REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [asyncio.create_task(details_worker(session)) for _ in range(self._max_connections)]
+            properties_summaries = await asyncio.gather(*[self._search_summary_async(session, x, enqueue_new)
+                                                          for x in self.outcode_list])
+            total_ids = sum(len(x) for x in properties_summaries)
+            print("Got back {} properties".format(total_ids))
+            print("Removed {} duplicate properties listed under more than one outcode"
+                  .format(total_ids - len(seen_ids)))
+
+            # one sentinel per worker so each exits once the queue has drained
+            for _ in workers:
+                properties_queue.put_nowait(None)
+            await asyncio.gather(*workers)
+
+        return properties_profiles, reused_profiles
+
+    @staticmethod
+    def _dedupe_properties(properties_summaries: [rmv_constants.PropertySummary]):
+        """
+        The same property is often listed under several neighbouring outcodes so drop repeats (keeping
+        first-seen order) before any detail page is requested
+        """
+        unique_summaries = {}
+        for summary in properties_summaries:
+            unique_summaries.setdefault(summary.property_id, summary)
+        print("Got back {} properties".format(len(properties_summaries)))
+        print("Removed {} duplicate properties listed under more than one outcode"
+              .format(len(properties_summaries) - len(unique_summaries)))
+        return list(unique_summaries.values())
+
+    def _split_reusable(self, properties_summaries: [rmv_constants.PropertySummary]):
+        """
+        In incremental mode (INCREMENTAL_TTL_HOURS > 0) a property whose summary card fingerprint matches a row
+        written to property_listings within the TTL is loaded back from the DB instead of being re-scraped.
+        Listings already stored by an earlier attempt of a resumed run are never re-scraped either.
+        Returns (summaries still to fetch, reused listings)
+        """
+        resumed_profiles = []
+        if self._resumed_listings:
+            resumed_profiles = [self._resumed_listings[self._website_unique_id(x)] for x in properties_summaries
+                                if self._website_unique_id(x) in self._resumed_listings]
+            properties_summaries = [x for x in properties_summaries
+                                    if self._website_unique_id(x) not in self._resumed_listings]
+
+        if not self._incremental_ttl or not properties_summaries:
+            return properties_summaries, resumed_profiles
+
+        stored_listings = self._load_fresh_listings([self._website_unique_id(x) for x in properties_summaries])
+        to_fetch = []
+        reused_profiles = []
+        for summary in properties_summaries:
+            stored = stored_listings.get(self._website_unique_id(summary))
+            if stored is not None and \
+                    stored[rmv_constants.RmvPropDetails.summary_fingerprint.name] == self._fingerprint(summary):
+                reused_profiles.append(stored)
+            else:
+                to_fetch.append(summary)
+
+        print("Reusing {} unchanged listings from DB, {} still to fetch".format(len(reused_profiles), len(to_fetch)))
+        return to_fetch, reused_profiles + resumed_profiles
+
+    def _load_fresh_listings(self, website_unique_ids: [str]):
+        load_listings_query = """
+        SELECT DISTINCT ON (website_unique_id)
+        prop_uuid, geo_lat, geo_long, postcode, street_address, rent_pcm, beds, date_available,
+        website_unique_id, url, image_links, floorplan_links, estate_agent, estate_agent_address,
+        description, zone_best_guess, summary_fingerprint
+        FROM property_listings
+        WHERE website_unique_id = ANY(%s) AND date_written_to_db >= %s
+        ORDER BY website_unique_id, date_written_to_db DESC
+        """
+
+        oldest_allowed = datetime.datetime.now() - datetime.timedelta(hours=self._incremental_ttl)
+        return self._load_listings(load_listings_query, (website_unique_ids, oldest_allowed))
+
+    def _load_run_listings(self, run_id):
+        load_listings_query = """
+        SELECT DISTINCT ON (website_unique_id)
+        prop_uuid, geo_lat, geo_long, postcode, street_address, rent_pcm, beds, date_available,
+        website_unique_id, url, image_links, floorplan_links, estate_agent, estate_agent_address,
+        description, zone_best_guess, summary_fingerprint
+        FROM property_listings
+        WHERE run_id = %s
+        ORDER BY website_unique_id, date_written_to_db DESC
+        """
+
+        return self._load_listings(load_listings_query, (run_id,))
+
+    def _load_listings(self, load_listings_query: str, params: tuple):
+        """
+        Keyed by website_unique_id
+        """
+        psycopg2.extras.register_uuid()
+        with db.connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as curs:
+                curs.execute(load_listings_query, params)
+                rows = curs.fetchall()
+
+        return {x['website_unique_id']: self._listing_from_row(x) for x in rows}
+
+    @staticmethod
+    def _listing_from_row(row: dict):
+        """
+        Shapes a property_listings row like a freshly scraped listing
+        """
+        property_listing = dict(row)
+        property_listing[rmv_constants.RmvPropDetails.rmv_unique_link.name] = \
+            property_listing.pop('website_unique_id')
+        return listing.Listing.from_dict(property_listing)
+
+    @staticmethod
+    def _website_unique_id(summary: rmv_constants.PropertySummary):
+        # card IDs look like 'property-12345' whereas property_listings stores the bare RMV ID
+        return summary.property_id.replace('property-', '')
+
+    @staticmethod
+    def _fingerprint(summary: rmv_constants.PropertySummary):
+        return hashlib.md5("{}|{}".format(summary.rent_pcm, summary.added_or_reduced).encode('utf-8')).hexdigest()
 
     def rmv_worker(self, outcode: str) -> [{}]:
-        properties_ids = self._search_summary(outcode)
+        properties_summaries = self._search_summary(outcode)
         properties_profiles = []
-        for id in properties_ids:
-            properties_profiles.append(self._get_property_details(id))
+        for summary in properties_summaries:
+            properties_profiles.append(self._get_property_details(summary))
 
         return properties_profiles
 
@@ -76,10 +461,17 @@ class RmvScraper:
             # expected and sometimes removes entire areas even though there are properties within
             # that meet the price requirement
             self.max_price_search = int(self.max_rent * 1.5)
+            # summary pages are asked for up to the top of the price band, shared with similar budgets
+            band = rmv_constants.OUTCODE_CACHE_PRICE_BAND
+            self.max_price_band = int(math.ceil(self.max_price_search / band) * band)
             self.min_bedrooms = config['minBedrooms']
             self.radius = config['radius']
         except KeyError as e:
             raise e
+        # identifies "the same search" when looking for an unfinished run to carry on, pages differ by source
+        self._config_hash = hashlib.md5(json.dumps(
+            [self.destinations, self.max_rent, self.min_bedrooms, self.radius, self._summary_source],
+            sort_keys=True).encode('utf-8')).hexdigest()
 
     def _get_search_areas(self):
         print("Geocoding user's destinations ...")
@@ -104,23 +496,31 @@ class RmvScraper:
             payload['poiLocations'].append(each)
 
         print("Calculating which areas meet user's needs ...")
-        r = requests.post(self.bounding_area_url, headers=headers, json=payload)
-
-        if r.status_code == 200:
-            postcode_list = [x["outcode"] for x in json.loads(r.content)["outcodes"]]
-            print("Found {} areas that meet user's needs".format(len(postcode_list)))
-            print("Converting postcodes to outcodes ...")
-            with open('outcode_mappings_not_found.txt', 'a+') as f:
-                self.outcode_list = ["OUTCODE^" + str(self._outcode_lookup[postcode])
-                                     if postcode in self._outcode_lookup else json.dump(postcode + '\n', f)
-                                     for postcode in postcode_list]
-
-                # remove any None resulting from mappings not found
-                self.outcode_list = [x for x in self.outcode_list if x is not None]
-        else:
+        postcode_list = search_areas_cache.get_or_set(cache.make_key(payload),
+                                                      lambda: self._post_search_areas(headers, payload))
+        print("Found {} areas that meet user's needs".format(len(postcode_list)))
+        print("Converting postcodes to outcodes ...")
+        with open('outcode_mappings_not_found.txt', 'a+') as f:
+            self.outcode_list = ["OUTCODE^" + str(self._outcode_lookup[postcode])
+                                 if postcode in self._outcode_lookup else json.dump(postcode + '\n', f)
+                                 for postcode in postcode_list]
+
+            # remove any None resulting from mappings not found
+            self.outcode_list = [x for x in self.outcode_list if x is not None]
+        print("Geocode cache: {}. Search areas cache: {}".format(util.geocode_cache.stats(),
+                                                                 search_areas_cache.stats()))
+
+    def _post_search_areas(self, headers: dict, payload: dict):
+        with throttle.for_host(self.bounding_area_url).slot() as slot:
+            r = requests.post(self.bounding_area_url, headers=headers, json=payload,
+                              timeout=rmv_constants.REQUEST_TIMEOUT)
+            slot.status = r.status_code
+
+        if r.status_code != 200:
             raise requests.exceptions.HTTPError(
                 "An error occurred getting postcodes with error code {}. Error Message: {}"
                 .format(r.status_code, json.loads(r.content)))
+        return [x["outcode"] for x in json.loads(r.content)["outcodes"]]
 
     @staticmethod
     def _gen_pois(pois):
@@ -145,195 +545,416 @@ class RmvScraper:
                     print("No modes provided for this POI: {}".format(poi))
                 continue
 
-    def _search_summary(self, search_postcode: str):
+    def _search_summary(self, search_postcode: str, fetch=None):
+        """
+        Summaries of the outcode within the user's budget, shared through outcode_cache with every other search
+        of the same (outcode, bedrooms, price band, radius). A search missing on an outcode that another one is
+        already paging through waits for its result rather than fetching the same pages again.
+        fetch(search_postcode) gets the summaries on a miss, _fetch_summaries by default
+        """
+        fetch = fetch or self._fetch_summaries
+        if not outcode_cache.ttl:
+            return self._affordable(fetch(search_postcode))
+
+        summaries = outcode_cache.get_or_set(self._outcode_key(search_postcode), partial(fetch, search_postcode))
+        return self._affordable([rmv_constants.PropertySummary(*x) for x in summaries])
+
+    def _fetch_summaries(self, search_postcode: str):
+        """
+        Page 0 gives both the total count and the first page of IDs, remaining pages are then
+        fetched concurrently (at most RMV_PAGES_PER_OUTCODE at a time) and kept in page order
+        """
         print("Searching through postcode {}".format(search_postcode))
-        properties_id_list = []
-        total_results = self._get_total_results(search_postcode)
-        index_for_pages = [self.max_results_per_page * i for
-                           i in range(0, math.ceil(total_results / self.max_results_per_page))]
+        total_results, properties_id_list = self._get_properties_summary(search_postcode, index=0)
+        index_for_pages = self._remaining_page_indices(total_results)
+
+        if index_for_pages:
+            with ThreadPoolExecutor(max_workers=self._pages_per_outcode) as executor:
+                for _, page_ids in executor.map(partial(self._get_properties_summary, search_postcode),
+                                                index_for_pages):
+                    properties_id_list.extend(page_ids)
+        return properties_id_list
 
-        for index in index_for_pages:
-            properties_id_list.extend(self._get_properties_summary(search_postcode, index=index))
+    async def _search_summary_async(self, session: aiohttp.ClientSession, search_postcode: str, on_page=None):
+        """
+        Async _search_summary. If on_page is given it is awaited with each page's summaries within budget as soon
+        as that page is parsed, or with all of them at once when they come from outcode_cache
+        """
+        async def on_affordable_page(page_summaries: [rmv_constants.PropertySummary]):
+            if on_page is not None:
+                await on_page(self._affordable(page_summaries))
+
+        if not outcode_cache.ttl:
+            return self._affordable(await self._fetch_summaries_async(session, search_postcode, on_affordable_page))
+
+        fetched = []
+
+        async def fetch():
+            fetched.append(True)
+            return await self._fetch_summaries_async(session, search_postcode, on_affordable_page)
+
+        summaries = await outcode_cache.get_or_set_async(self._outcode_key(search_postcode), fetch)
+        summaries = [rmv_constants.PropertySummary(*x) for x in summaries]
+        if not fetched:
+            await on_affordable_page(summaries)
+        return self._affordable(summaries)
+
+    async def _fetch_summaries_async(self, session: aiohttp.ClientSession, search_postcode: str, on_page):
+        print("Searching through postcode {}".format(search_postcode))
+        pages_limit = asyncio.Semaphore(self._pages_per_outcode)
+
+        async def get_page(index: int):
+            async with pages_limit:
+                total, page_ids = await self._get_properties_summary_async(session, search_postcode, index=index)
+            await on_page(page_ids)
+            return total, page_ids
+
+        total_results, properties_id_list = await get_page(0)
+        pages = await asyncio.gather(*[get_page(x) for x in self._remaining_page_indices(total_results)])
+        for _, page_ids in pages:
+            properties_id_list.extend(page_ids)
         return properties_id_list
 
-    def _get_total_results(self, postcode_identifier: str):
-        headers = {
-            'User-Agent': util.gen_random_user_agent()
-        }
+    def _outcode_key(self, search_postcode: str):
+        return cache.make_key([search_postcode, self.min_bedrooms, self.max_price_band, self.radius,
+                               self._summary_source])
 
-        xpath_total_count = rmv_constants.TOTAL_COUNT_FILTER
+    def _affordable(self, properties_summaries: [rmv_constants.PropertySummary]):
+        # pages are shared across the whole price band so the user's own budget is applied afterwards
+        return [x for x in properties_summaries if x.rent_pcm <= self.max_rent]
+
+    def _remaining_page_indices(self, total_results: int):
+        # page 0 has already been fetched to get the total count
+        return [self.max_results_per_page * i for
+                i in range(1, math.ceil(total_results / self.max_results_per_page))]
+
+    def _summary_payload(self, postcode_identifier: str, index=None):
         payload = {
             "locationIdentifier": postcode_identifier.replace(' ', ''),
             "radius": self.radius,
+            "index": index,
             "minBedrooms": self.min_bedrooms,
-            "maxPrice": self.max_price_search
+            "maxPrice": self.max_price_band
         }
-        data = requests.get(self.find_url, headers=headers, params=payload)
+        # requests silently drops None params but aiohttp refuses them so strip them for both
+        return {k: v for k, v in payload.items() if v is not None}
 
-        if data.status_code == 200:
-            soup = BeautifulSoup(data.text, "html.parser")
-            try:
-                total_count = int((soup.find("span", xpath_total_count)).contents[0].replace(',', ''))
-            except AttributeError:
-                total_count = 0
+    def _map_search_payload(self, postcode_identifier: str, index=None):
+        return {
+            "locationIdentifier": postcode_identifier.replace(' ', ''),
+            "numberOfPropertiesPerPage": rmv_constants.MAP_RESULTS_PER_PAGE,
+            "radius": self.radius,
+            "index": index or 0,
+            "minBedrooms": self.min_bedrooms,
+            "maxPrice": self.max_price_band,
+            "viewType": "MAP",
+            "channel": "RENT",
+            "currencyCode": "GBP",
+            "isFetching": "false"
+        }
 
-            return total_count
+    def _summary_request(self, postcode_identifier: str, index=None):
+        """
+        (url, params, page cache kind, parser) of a summary page from the run's summary source
+        """
+        if self._summary_source == rmv_constants.SUMMARY_SOURCE_MAP:
+            return self.map_search_url, self._map_search_payload(postcode_identifier, index), \
+                page_cache.MAP_SEARCH, self._parse_map_search
+        return self.find_url, self._summary_payload(postcode_identifier, index), \
+            page_cache.SUMMARY, self._parse_properties_summary
 
     def _get_properties_summary(self, postcode_identifier: str, index=None):
         """
-        Gets the summary page from Rightmove and filters by xpath_property_card HTML div
-        to get to the Rightmove-specific unique IDs for each property
+        Gets the summary page from Rightmove and filters by xpath_property_card HTML div (or reads the map search
+        JSON) to get to the Rightmove-specific unique IDs for each property.
+        Returns (total results for the search, IDs on this page)
         """
+        checkpointed = self._checkpointed_page(postcode_identifier, index)
+        if checkpointed is not None:
+            return checkpointed
+
         headers = {
             'User-Agent': util.gen_random_user_agent()
         }
-        xpath_property_card = rmv_constants.PROPERTY_ID_FILTER
 
-        properties_id_list = []
-        payload = {
-            "locationIdentifier": postcode_identifier.replace(' ', ''),
-            "radius": self.radius,
-            "index": index,
-            "minBedrooms": self.min_bedrooms,
-            "maxPrice": self.max_price_search
-        }
+        summary = (0, [])
+        url, payload, kind, parse = self._summary_request(postcode_identifier, index=index)
 
         try:
-            data = util.requests_retry_session().get(self.find_url, headers=headers, params=payload)
+            data = throttle.get(self._rmv_throttle(), url, retries=rmv_constants.MAX_RETRIES,
+                                backoff_factor=rmv_constants.RETRY_BACKOFF_FACTOR,
+                                timeout=rmv_constants.REQUEST_TIMEOUT, headers=headers, params=payload)
             if data.status_code == 200:
-                soup = BeautifulSoup(data.text, "html.parser")
-                properties_soup = soup.find_all("div", xpath_property_card)
-                for prop in properties_soup:
-                    target_div = list(prop.children)[1].contents[3].contents[7]
-                    for descendant in target_div.descendants:
-                        if isinstance(descendant, Tag):
-                            try:
-                                if rmv_constants.PROPERTY_RENT_SPAN_ID in descendant.get("class"):
-                                    if int(str(descendant.next).strip('£').strip('pcm').replace(',', '')) <= \
-                                            self.max_rent:
-                                        properties_id_list.append(prop.get('id'))
-                            except (TypeError, ValueError):
-                                pass
-                        continue
-
-        except (TimeoutError, urllib3.exceptions.MaxRetryError, requests.exceptions.ConnectionError) as e:
-            print("An error occurred getting url {}: {}".format(data.url, e))
+                self._cache_page(kind, url, data.text, params=payload)
+                summary = parse(data.text)
+                self._checkpoint_page(postcode_identifier, index, summary)
+
+        except (TimeoutError, urllib3.exceptions.MaxRetryError, requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            print("An error occurred getting url {} for {}: {}".format(url, postcode_identifier, e))
             pass
 
-        return properties_id_list
+        return summary
+
+    async def _get_properties_summary_async(self, session: aiohttp.ClientSession, postcode_identifier: str,
+                                            index=None):
+        checkpointed = self._checkpointed_page(postcode_identifier, index)
+        if checkpointed is not None:
+            return checkpointed
+
+        summary = (0, [])
+        url, payload, kind, parse = self._summary_request(postcode_identifier, index=index)
+
+        try:
+            status, text = await self._fetch_async(session, url, params=payload)
+            if status == 200:
+                self._cache_page(kind, url, text, params=payload)
+                summary = parse(text)
+                # checkpoint write is blocking so keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._checkpoint_page, postcode_identifier, index, summary)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print("An error occurred getting url {} for {}: {}".format(url, postcode_identifier, e))
+            pass
+
+        return summary
+
+    def _checkpointed_page(self, postcode_identifier: str, index: int):
+        if self._checkpoint is None:
+            return None
+        page = self._checkpoint.page(postcode_identifier, index or 0)
+        # copied as callers extend the page's list with the ones that follow
+        return (page[0], list(page[1])) if page is not None else None
+
+    def _checkpoint_page(self, postcode_identifier: str, index: int, summary: tuple):
+        if self._checkpoint is not None:
+            self._checkpoint.save_page(postcode_identifier, index or 0, *summary)
+
+    @staticmethod
+    def _parse_total_results(soup: BeautifulSoup):
+        xpath_total_count = rmv_constants.TOTAL_COUNT_FILTER
+        try:
+            total_count = int((soup.find("span", xpath_total_count)).contents[0].replace(',', ''))
+        except AttributeError:
+            total_count = 0
+
+        return total_count
+
+    def _parse_properties_summary(self, html: str):
+        xpath_property_card = rmv_constants.PROPERTY_ID_FILTER
+        properties_summaries = []
+        soup = rmv_extract.summary_soup(html)
+        properties_soup = soup.find_all("div", xpath_property_card)
+        for prop in properties_soup:
+            target_div = list(prop.children)[1].contents[3].contents[7]
+            for descendant in target_div.descendants:
+                if isinstance(descendant, Tag):
+                    try:
+                        if rmv_constants.PROPERTY_RENT_SPAN_ID in descendant.get("class"):
+                            rent = int(str(descendant.next).strip('£').strip('pcm').replace(',', ''))
+                            added_or_reduced = prop.find("span", rmv_constants.PROPERTY_ADDED_REDUCED_FILTER)
+                            properties_summaries.append(rmv_constants.PropertySummary(
+                                prop.get('id'), rent,
+                                added_or_reduced.text.strip() if added_or_reduced is not None else None))
+                    except (TypeError, ValueError):
+                        pass
+                continue
+
+        return self._parse_total_results(soup), properties_summaries
+
+    @staticmethod
+    def _parse_map_search(text: str):
+        """
+        Summaries straight from the map search JSON, prices normalised to per calendar month (cards with a rent
+        period other than those of MONTHLY_RENT_FACTORS are skipped).
+        Returns (total results for the search, summaries on this page)
+        """
+        try:
+            results = json.loads(text)
+        except ValueError as e:
+            print("Could not read map search results: {}".format(e))
+            return 0, []
+
+        properties_summaries = []
+        for prop in results.get('properties', []):
+            try:
+                price = prop['price']
+                # a card priced per a period not in MONTHLY_RENT_FACTORS is skipped rather than given a wrong rent
+                rent = round(price['amount'] * rmv_constants.MONTHLY_RENT_FACTORS[price.get('frequency', 'monthly')])
+                location = prop.get('location') or {}
+                properties_summaries.append(rmv_constants.PropertySummary(
+                    'property-{}'.format(prop['id']), int(rent), prop.get('addedOrReduced') or None,
+                    prop.get('bedrooms'), location.get('latitude'), location.get('longitude')))
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        try:
+            total_count = int(str(results.get('resultCount', 0)).replace(',', ''))
+        except ValueError:
+            total_count = len(properties_summaries)
+        return total_count, properties_summaries
+
+    def _property_url(self, property_id: str):
+        return self.base_url + '/' + property_id + '.html'
+
+    def _get_property_details(self, property_summary: rmv_constants.PropertySummary):
+        """
+        Parsed listing, shared through listing_cache with any other search that comes across the same card, or
+        filters.Rejected if it fails this search's filter chain (None if it couldn't be fetched or parsed)
+        """
+        if not listing_cache.ttl:
+            return self._filtered(self._fetch_property_details(property_summary))
+        return self._own_copy(self._filtered(listing_cache.get_or_set(
+            self._listing_key(property_summary), partial(self._fetch_property_details, property_summary))))
+
+    def _get_property_details_in_pool(self, pool, job: DetailsJob, property_summary: rmv_constants.PropertySummary):
+        """
+        _get_property_details for search_parallel. listing_cache is looked up here and only misses go to a worker
+        (fetch_listing), which filters the listing before sending it back. So the cache only gets the listings
+        that passed, as fetched
+        """
+        if not listing_cache.ttl:
+            return pool.apply(fetch_listing, (job, property_summary))
+
+        fetched = []
+
+        def fetch():
+            fetched.append(pool.apply(fetch_listing, (job, property_summary)))
+            # a rejection is this search's verdict, not a listing other searches can use
+            return fetched[0] if isinstance(fetched[0], listing.Listing) else None
+
+        cached = listing_cache.get_or_set(self._listing_key(property_summary), fetch)
+        if fetched:
+            return self._own_copy(fetched[0])
+        if cached is None:
+            # the search this one waited on had nothing to share, e.g. its own filters rejected the listing
+            return pool.apply(fetch_listing, (job, property_summary))
+        return self._own_copy(self._filtered(cached))
+
+    async def _get_property_details_async(self, session: aiohttp.ClientSession,
+                                          property_summary: rmv_constants.PropertySummary):
+        if not listing_cache.ttl:
+            return self._filtered(await self._fetch_property_details_async(session, property_summary))
+        fetch = partial(self._fetch_property_details_async, session, property_summary)
+        return self._own_copy(self._filtered(
+            await listing_cache.get_or_set_async(self._listing_key(property_summary), fetch)))
+
+    def _filtered(self, property_profile: listing.Listing):
+        # listings in listing_cache are shared between searches with different criteria so stay unfiltered there
+        if self._filter_chain is None or property_profile is None:
+            return property_profile
+        return self._filter_chain.apply(property_profile)
+
+    def _keep(self, result):
+        """
+        Whether what _get_property_details returned is a listing to keep, counting rejections
+        """
+        if self._filter_chain is None:
+            return result is not None
+        return self._filter_chain.record(result)
 
-    def _get_property_details(self, property_id: str):
-        url = self.base_url + '/' + property_id + '.html'
+    def _listing_key(self, property_summary: rmv_constants.PropertySummary):
+        # a changed price or added/reduced marker on the card means the details may have changed too
+        return "{}|{}".format(self._website_unique_id(property_summary), self._fingerprint(property_summary))
+
+    @classmethod
+    def _own_copy(cls, property_profile: listing.Listing):
+        """
+        Copy of a shared listing with its own prop_uuid, so each search stores its own row. Anything else
+        (None, filters.Rejected) is passed through
+        """
+        if not isinstance(property_profile, listing.Listing):
+            return property_profile
+        property_profile = property_profile.copy()
+        cls._add_uuid_listing(property_profile)
+        return property_profile
+
+    def _fetch_property_details(self, property_summary: rmv_constants.PropertySummary):
+        url = self._property_url(property_summary.property_id)
         print("Getting details for property URL: {}".format(url))
         headers = {
             'User-Agent': util.gen_random_user_agent()
         }
 
+        try:
+            data = throttle.get(self._rmv_throttle(), url, retries=rmv_constants.MAX_RETRIES,
+                                backoff_factor=rmv_constants.RETRY_BACKOFF_FACTOR,
+                                timeout=rmv_constants.REQUEST_TIMEOUT, headers=headers)
+
+        except (TimeoutError, urllib3.exceptions.MaxRetryError, requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            print("An error occurred getting url {}: {}".format(url, e))
+            return None
+
+        if data.status_code == 200:
+            self._cache_page(page_cache.DETAIL, url, data.text)
+        return self._parse_property_details(data.text, url, property_summary)
+
+    async def _fetch_property_details_async(self, session: aiohttp.ClientSession,
+                                            property_summary: rmv_constants.PropertySummary):
+        url = self._property_url(property_summary.property_id)
+        print("Getting details for property URL: {}".format(url))
+
+        try:
+            status, text = await self._fetch_async(session, url)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print("An error occurred getting url {}: {}".format(url, e))
+            return None
+
+        if status == 200:
+            self._cache_page(page_cache.DETAIL, url, text)
+        return self._parse_property_details(text, url, property_summary)
+
+    def _cache_page(self, kind: str, url: str, html: str, params: dict = None):
+        if self._page_cache is None:
+            return
+        try:
+            self._page_cache.store(kind, page_cache.PageCache.cache_url(url, params), html)
+        except OSError as e:
+            print("Could not cache page {}: {}".format(url, e))
+
+    async def _fetch_async(self, session: aiohttp.ClientSession, url: str, params=None):
+        """
+        Fetches through the RMV throttle, retrying connection errors and throttle.BACKOFF_STATUSES
+        with exponential backoff, and returns (status, body)
+        """
+        headers = {
+            'User-Agent': util.gen_random_user_agent()
+        }
+
+        return await throttle.get_async(self._rmv_throttle(), session, url, retries=rmv_constants.MAX_RETRIES,
+                                        backoff_factor=rmv_constants.RETRY_BACKOFF_FACTOR, headers=headers,
+                                        params=params)
+
+    def _parse_property_details(self, html: str, url: str, property_summary: rmv_constants.PropertySummary = None):
         xpath_description = rmv_constants.PROPERTY_DESCRIPTION_FILTER
+        property_listing = {}
+        if property_summary is not None:
+            property_listing[rmv_constants.RmvPropDetails.summary_fingerprint.name] = \
+                self._fingerprint(property_summary)
 
         try:
-            data = requests.get(url, headers=headers)
-            soup = BeautifulSoup(data.text, "html.parser")
-            property_listing = {}
+            soup = rmv_extract.details_soup(html)
             description_text = soup.find("div", xpath_description).text
             property_listing[rmv_constants.RmvPropDetails.description.name] = description_text.strip().replace('\n',
                                                                                                                ' ')
 
-            scripts_soup = soup.find_all('script')
-            scripts_with_details = list(
-                filter(lambda x: True if x.find(rmv_constants.PROPERTY_DETAILS_FILTER) >= 0 else False,
-                       [str(scripts_soup[y].next).strip().replace('\r', '')
-                       .replace('\n', '')
-                       .replace('\t', '')
-                        for y in range(0, len(scripts_soup))]))
-
-            # the field we want is repeated many times in this script so we just pick one
-            # (use 6th element because it's first occurrence of clean JS code that doesn't cause the parser to break)
-            scripts_with_availability = \
-                list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_AVAILABILITY_FILTER) >= 0 else False,
-                            [str(scripts_soup[y].next).strip().replace('\r', '')
-                            .replace('\n', '')
-                            .replace('\t', '')
-                             for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')[6]
-
-            # hacks because there is a JS error in this script (missing semicolon) further down (around char 10710)
-            # that causes parser to break
-            try:
-                scripts_with_images = \
-                    list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_IMAGES_FILTER) >= 0 else False,
-                                [str(scripts_soup[y].next).strip().replace('\r', '')
-                                .replace('\n', '')
-                                .replace('\t', '')
-                                 for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')
-                scripts_with_images = list(
-                    filter(lambda x: True if x.find(rmv_constants.PROPERTY_IMAGES_FILTER) >= 0 else False,
-                           [y for y in scripts_with_images]))
-
-            except IndexError:
-                scripts_with_images = []
-
-            try:
-                scripts_with_floorplans = \
-                    list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_FLOORPLAN_FILTER) >= 0 else False,
-                                [str(scripts_soup[y].next).strip().replace('\r', '')
-                                .replace('\n', '')
-                                .replace('\t', '')
-                                 for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')
-                scripts_with_floorplans = list(
-                    filter(lambda x: True if x.find(rmv_constants.PROPERTY_FLOORPLAN_FILTER) >= 0 else False,
-                           [y for y in scripts_with_floorplans]))
-            except IndexError:
-                scripts_with_floorplans = []
-
-            # scripts_with_availability made list with [] because it is string above because of .split()[6] indexing
-            scripts_to_walk = scripts_with_details + [scripts_with_availability] + \
-                              scripts_with_images + scripts_with_floorplans
-
-            walker = Walker()
-            tree = [es5(script) for script in scripts_to_walk]
-
-            for tree_node in tree:
-                for node in walker.filter(tree_node, lambda x: isinstance(x, Assign)):
-                    for field in rmv_constants.RmvPropDetails:
-                        if field.value.rmv_field == node.left.value:
-                            if field.name == rmv_constants.RmvPropDetails.image_links.name:
-                                if field.name in property_listing:
-                                    (property_listing[field.name]).append(node.right.value.replace('"', ''))
-                                else:
-                                    property_listing[field.name] = [node.right.value.replace('"', '')]
-                            elif field.name == rmv_constants.RmvPropDetails.floorplan_links.name:
-                                property_listing[field.name] = [link.value.replace('"', '') for link in
-                                                                node.right.items]
-                            elif field.name == rmv_constants.RmvPropDetails.date_available.name:
-                                property_listing[field.name] = datetime.datetime.strftime(
-                                    datetime.datetime.strptime(str(node.right.value).replace('"', ''),
-                                                               "%Y-%m-%d-%H-%M-%S"), "%Y-%m-%d %H:%M:%S")
-                            else:
-                                if isinstance(node.right, UnaryExpr):
-                                    # node.right.value.value because float() only takes str or number
-                                    # but not type "Number" which is what UnaryExpr type contains for node.right.value
-                                    property_listing[field.name] = str(float(node.right.value.value) * -1) \
-                                        if node.right.op == '-' else str(node.right.value)
-                                else:
-                                    property_listing[field.name] = str(node.right.value).replace('"', '')
-                            break
+            scripts_to_walk = rmv_extract.scripts_to_extract(soup.find_all('script'))
+            property_listing.update(rmv_extract.extract_fields(scripts_to_walk))
 
             match = re.search(r'(\d+/\d+/\d+)', description_text)
             if match:
                 property_listing[rmv_constants.RmvPropDetails.date_available.name] = \
-                    datetime.datetime.strftime(parser.parse(match.group(1)), "%Y-%m-%d %H:%M:%S")
+                    parser.parse(match.group(1))
             print("Finished parsing property URL {}".format(url))
-            self._standardise_listing(property_listing)
-            return property_listing
+            return self._standardise_listing(property_listing)
 
             # if date_available_filter(property_listing, '2020-02-04-00-00-00', '2020-04-01-00-00-00'):
             #     if enough_images_filter(property_listing, 0):
             #         return property_listing
 
-        except (TimeoutError, urllib3.exceptions.MaxRetryError, requests.exceptions.ConnectionError) as e:
-            print("An error occurred getting url {}: {}".format(url, e))
-            pass
-
         except AttributeError as e:
             print("An error occurred parsing data from url {}: {}. CULPRIT: {}".format(url, e, property_listing))
             pass
@@ -346,12 +967,8 @@ class RmvScraper:
     def _standardise_listing(self, property_profile: dict):
         self._add_uuid_listing(property_profile)
         self._add_prop_url(property_profile)
-        desired_keys = set(map(lambda x: x.name, rmv_constants.RmvPropDetails))
-        existing_keys = set(property_profile.keys())
-        non_existing_keys = desired_keys - existing_keys
-        for key in non_existing_keys:
-            property_profile[key] = None
-        return property_profile
+        # fields missing from the page are left as None
+        return listing.Listing.from_dict(property_profile)
 
     @staticmethod
     def _add_uuid_listing(property_profile: dict):
@@ -360,41 +977,3 @@ class RmvScraper:
     @staticmethod
     def _add_prop_url(property_profile: dict):
         property_profile[rmv_constants.RmvPropDetails.url.name] = util.rmv_generate_url_from_id(property_profile)
-
-    def _insert_to_db(self, property_profile: dict):
-        insert_string = """
-        INSERT INTO property_listings
-        (prop_uuid, geo_lat, geo_long, postcode, rent_pcm,
-        beds, date_available, website_unique_id, image_links,
-        floorplan_links, estate_agent, estate_agent_address, description, url, date_written_to_db) 
-        VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
-        """
-
-        print("Storing property with UUID {} and RMV ID {} in DB now ...".
-              format(property_profile[rmv_constants.RmvPropDetails.prop_uuid.name],
-                     property_profile[rmv_constants.RmvPropDetails.rmv_unique_link.name]))
-
-        psycopg2.extras.register_uuid()
-        with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
-            with conn.cursor() as curs:
-                try:
-                    curs.execute(insert_string,
-                                 (property_profile[rmv_constants.RmvPropDetails.prop_uuid.name],
-                                  property_profile[rmv_constants.RmvPropDetails.geo_lat.name],
-                                  property_profile[rmv_constants.RmvPropDetails.geo_long.name],
-                                  property_profile[rmv_constants.RmvPropDetails.postcode.name],
-                                  property_profile[rmv_constants.RmvPropDetails.rent_pcm.name],
-                                  property_profile[rmv_constants.RmvPropDetails.beds.name],
-                                  property_profile[rmv_constants.RmvPropDetails.date_available.name],
-                                  property_profile[rmv_constants.RmvPropDetails.rmv_unique_link.name],
-                                  json.dumps(property_profile[rmv_constants.RmvPropDetails.image_links.name]),
-                                  json.dumps(property_profile[rmv_constants.RmvPropDetails.floorplan_links.name]),
-                                  property_profile[rmv_constants.RmvPropDetails.estate_agent.name],
-                                  property_profile[rmv_constants.RmvPropDetails.estate_agent_address.name],
-                                  property_profile[rmv_constants.RmvPropDetails.description.name],
-                                  property_profile[rmv_constants.RmvPropDetails.url.name],
-                                  datetime.datetime.strftime(datetime.datetime.now(), "%Y-%m-%d %H:%M:%S")
-                                  ))
-                except Exception as e:
-                    print("Error occurred storing property in DB: {}. CULPRIT OBJECT: {} ".
-                          format(e, property_profile))
@@ -0,0 +1,194 @@
+import json
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import cache, filters, listing, page_cache, rmv_constants, rmv_scraper, throttle
+from app.rmv_scraper import RmvScraper
+from benchmarks import rmv_stub_server
+
+CONFIG = {"destinations": [], "maxPrice": 2000, "minBedrooms": 1, "radius": 0}
+
+CARDS = [rmv_constants.PropertySummary('property-{}'.format(i), 1000 + i, "Added on 12/03/2020") for i in range(1, 4)]
+
+
+def _scraper(monkeypatch, tmp_path=None, incremental_ttl_hours=None):
+    monkeypatch.setenv('NUM_PROCS', '2')
+    if incremental_ttl_hours is not None:
+        monkeypatch.setenv('INCREMENTAL_TTL_HOURS', str(incremental_ttl_hours))
+    if tmp_path is not None:
+        monkeypatch.setenv('PAGE_CACHE_DIR', str(tmp_path))
+    return RmvScraper(CONFIG)
+
+
+def _stored(summary, fingerprint=None):
+    # a property_listings row as _load_listings hands it back
+    return listing.Listing.from_dict({
+        rmv_constants.RmvPropDetails.rmv_unique_link.name: RmvScraper._website_unique_id(summary),
+        rmv_constants.RmvPropDetails.summary_fingerprint.name: fingerprint or RmvScraper._fingerprint(summary)})
+
+
+def _load_listings_from(monkeypatch, rmv, stored_listings):
+    calls = []
+
+    def load_listings(query, params):
+        calls.append(params)
+        return {k: v for k, v in stored_listings.items() if k in params[0]}
+
+    monkeypatch.setattr(rmv, '_load_listings', load_listings)
+    return calls
+
+
+def test_fingerprint_changes_with_the_price_or_the_added_reduced_marker():
+    card = CARDS[0]
+
+    assert RmvScraper._fingerprint(card) == RmvScraper._fingerprint(card._replace(beds=2, geo_lat=51.5))
+    assert RmvScraper._fingerprint(card) != RmvScraper._fingerprint(card._replace(rent_pcm=card.rent_pcm - 50))
+    assert RmvScraper._fingerprint(card) != RmvScraper._fingerprint(
+        card._replace(added_or_reduced="Reduced on 14/03/2020"))
+
+
+def test_unchanged_cards_are_reused_and_the_rest_fetched(monkeypatch):
+    rmv = _scraper(monkeypatch, incremental_ttl_hours=6)
+    unchanged = _stored(CARDS[0])
+    # stored before the price changed
+    _load_listings_from(monkeypatch, rmv, {'1': unchanged, '2': _stored(CARDS[1], fingerprint='before')})
+
+    to_fetch, reused = rmv._split_reusable(CARDS)
+
+    assert to_fetch == CARDS[1:]
+    assert reused == [unchanged]
+
+
+def test_only_listings_stored_within_the_ttl_are_looked_up(monkeypatch):
+    rmv = _scraper(monkeypatch, incremental_ttl_hours=6)
+    calls = _load_listings_from(monkeypatch, rmv, {})
+
+    rmv._split_reusable(CARDS)
+
+    (website_unique_ids, oldest_allowed), = calls
+    assert website_unique_ids == ['1', '2', '3']
+    expected = datetime.datetime.now() - datetime.timedelta(hours=6)
+    assert abs((oldest_allowed - expected).total_seconds()) < 60
+
+    # not in incremental mode, so nothing is looked up at all
+    rmv = _scraper(monkeypatch, incremental_ttl_hours=0)
+    calls = _load_listings_from(monkeypatch, rmv, {'1': _stored(CARDS[0])})
+    assert rmv._split_reusable(CARDS) == (CARDS, [])
+    assert calls == []
+
+
+def test_resumed_run_listings_are_kept_alongside_reused_ones(monkeypatch):
+    rmv = _scraper(monkeypatch, incremental_ttl_hours=6)
+    resumed = _stored(CARDS[0], fingerprint='stored by the earlier attempt')
+    unchanged = _stored(CARDS[1])
+    rmv._resumed_listings = {'1': resumed}
+    calls = _load_listings_from(monkeypatch, rmv, {'1': _stored(CARDS[0]), '2': unchanged})
+
+    to_fetch, reused = rmv._split_reusable(CARDS)
+
+    assert to_fetch == CARDS[2:]
+    assert reused == [unchanged, resumed]
+    # whatever the resumed run already has is not looked up again
+    assert calls[0][0] == ['2', '3']
+
+
+def test_reparse_uses_the_latest_fetch_of_each_cached_page(monkeypatch, tmp_path):
+    rmv = _scraper(monkeypatch, tmp_path)
+    cache = page_cache.PageCache(str(tmp_path))
+    fetched_at = datetime.datetime(2020, 3, 12, 9, 0)
+    cache.store(page_cache.SUMMARY, rmv.find_url + '?index=0', rmv_stub_server.summary_page('OUTCODE^1'), fetched_at)
+    for property_id in [1000, 1001]:
+        url = rmv._property_url('property-{}'.format(property_id))
+        # a block page served earlier on, fetched again since
+        cache.store(page_cache.DETAIL, url, "<html><body>Access denied</body></html>", fetched_at)
+        cache.store(page_cache.DETAIL, url, rmv_stub_server.detail_page(property_id),
+                    fetched_at + datetime.timedelta(hours=1))
+
+    listings = sorted(rmv.reparse(), key=lambda x: x[rmv_constants.RmvPropDetails.rmv_unique_link.name])
+
+    assert [x[rmv_constants.RmvPropDetails.rmv_unique_link.name] for x in listings] == ['1000', '1001']
+    cards = {x.property_id: x for x in rmv._parse_properties_summary(rmv_stub_server.summary_page('OUTCODE^1'))[1]}
+    assert [x[rmv_constants.RmvPropDetails.summary_fingerprint.name] for x in listings] == \
+        [RmvScraper._fingerprint(cards['property-1000']), RmvScraper._fingerprint(cards['property-1001'])]
+
+
+def test_bounded_as_completed_waits_for_results_to_be_taken():
+    started = []
+    lock = threading.Lock()
+
+    def fetch(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.01 * (x % 3))
+        return x
+
+    results = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for result in RmvScraper._bounded_as_completed(executor, fetch, range(20), window=4):
+            time.sleep(0.02)  # a slow consumer, e.g. the writer waiting on the DB
+            # never more than the window handed out beyond what has been taken
+            assert len(started) <= len(results) + 4
+            results.append(result)
+
+    assert sorted(results) == list(range(20))
+
+
+def test_map_search_rents_are_converted_to_per_calendar_month():
+    def card(property_id, amount, frequency):
+        return {"id": property_id, "price": {"amount": amount, "frequency": frequency}}
+
+    text = json.dumps({"resultCount": "5", "properties": [
+        card(1, 1500, "monthly"), card(2, 300, "weekly"), card(3, 4500, "quarterly"), card(4, 18000, "yearly"),
+        card(5, 50, "fortnightly")]})
+
+    total, summaries = RmvScraper._parse_map_search(text)
+
+    assert total == 5
+    assert [(x.property_id, x.rent_pcm) for x in summaries] == [
+        ('property-1', 1500), ('property-2', 1300), ('property-3', 1500), ('property-4', 1500)]
+
+
+def _at_least_two_beds(property_listing):
+    return (property_listing[rmv_constants.RmvPropDetails.beds.name] or 0) >= 2
+
+
+class _InlinePool:
+    """
+    Stands in for the worker pool, running each job in the calling thread and keeping what it sent back
+    """
+
+    def __init__(self):
+        self.returned = []
+
+    def apply(self, fn, args):
+        self.returned.append(fn(*args))
+        return self.returned[-1]
+
+
+def test_rejected_listings_are_not_sent_back_from_the_pool_nor_cached(monkeypatch):
+    server, base_url = rmv_stub_server.start()
+    monkeypatch.setattr(rmv_scraper, 'listing_cache', cache.TtlCache('listings', ttl=60, persist=False))
+    # the stub gives property 1000 two beds, 1001 three and 1002 one
+    cards = [rmv_constants.PropertySummary('property-{}'.format(x), 1500, "Added on 12/03/2020")
+             for x in [1000, 1001, 1002]]
+    pool = _InlinePool()
+    try:
+        rmv = _scraper(monkeypatch)
+        rmv._filter_chain = filters.FilterChain([('beds', _at_least_two_beds)])
+        job = rmv_scraper.DetailsJob(base_url, throttle.AdaptiveThrottle('test'), None, rmv._filter_chain)
+        results = [rmv._get_property_details_in_pool(pool, job, x) for x in cards]
+
+        # a search without the filter finds the two listings that passed in the cache and fetches the third
+        unfiltered = _scraper(monkeypatch)
+        unfiltered_results = [unfiltered._get_property_details_in_pool(pool, job._replace(filter_chain=None), x)
+                              for x in cards]
+    finally:
+        server.shutdown()
+
+    assert [type(x) for x in pool.returned] == [listing.Listing, listing.Listing, filters.Rejected, listing.Listing]
+    assert results[2] == filters.Rejected('1002', 'beds')
+    assert [x[rmv_constants.RmvPropDetails.rmv_unique_link.name] for x in unfiltered_results] == \
+        ['1000', '1001', '1002']
+    assert rmv_scraper.listing_cache.stats()['hits'] == 2
@@ -0,0 +1,64 @@
+import datetime
+
+import numpy as np
+
+from app import filters
+
+MAX_IMAGES_THRESHOLD = 6
+MAX_MIN_RENT_FACTOR = 0.8
+MIN_RENT_FACTOR_STEP = 0.05
+
+
+def relaxation_schedule(images_threshold: int, min_rent_factor: float):
+    """
+    (images threshold, min rent factor) pairs in the order the filtering tries them, each stricter than the last:
+    both go up a step at a time until the images threshold passes MAX_IMAGES_THRESHOLD or the factor passes
+    MAX_MIN_RENT_FACTOR. The factor is stepped by repeated addition so it matches the thresholds used so far
+    """
+    while True:
+        yield images_threshold, min_rent_factor
+        if images_threshold < MAX_IMAGES_THRESHOLD:
+            images_threshold += 1
+        if min_rent_factor < MAX_MIN_RENT_FACTOR:
+            min_rent_factor += MIN_RENT_FACTOR_STEP
+        if images_threshold > MAX_IMAGES_THRESHOLD or min_rent_factor > MAX_MIN_RENT_FACTOR:
+            return
+
+
+class ThresholdSolver:
+    """
+    Picks the first thresholds of a schedule that leave at most max_results listings, without re-running the
+    filters for every step. Works on filters.to_columns of the listings: the date check is done once, then for
+    each images threshold the rents of the listings with more images than that are kept sorted, so counting the
+    survivors of a threshold pair is a binary search, as is finding the first pair with few enough of them.
+    Counts the same listings as filters.enough_images_filter, date_available_filter and min_rent_filter
+    """
+
+    def __init__(self, columns: filters.ListingColumns, lower_date: datetime.datetime, upper_date: datetime.datetime):
+        # anything the filters would reject whatever the thresholds never counts
+        in_dates = filters.date_available_mask(columns, lower_date, upper_date) & ~np.isnan(columns.rent)
+        self._images = columns.images[in_dates]
+        self._rents = columns.rent[in_dates]
+        self._sorted_rents = {}
+
+    def count(self, images_threshold: int, min_rent: float):
+        rents = self._sorted_rents.get(images_threshold)
+        if rents is None:
+            rents = self._sorted_rents[images_threshold] = np.sort(self._rents[self._images > images_threshold])
+        return len(rents) - int(np.searchsorted(rents, min_rent, side='right'))
+
+    def solve(self, schedule, max_results: int, max_price: float):
+        """
+        First (images threshold, min rent factor) of schedule leaving at most max_results listings, or its last
+        pair if none does
+        """
+        schedule = list(schedule)
+        # each pair is stricter than the one before, so the counts only go down along the schedule
+        low, high = 0, len(schedule) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.count(schedule[middle][0], schedule[middle][1] * max_price) <= max_results:
+                high = middle
+            else:
+                low = middle + 1
+        return schedule[low]
@@ -0,0 +1,61 @@
+import random
+import datetime
+from functools import partial
+
+from app import filters, listing, thresholds
+
+LOWER_DATE = datetime.datetime(2020, 3, 1)
+UPPER_DATE = datetime.datetime(2020, 4, 1)
+MAX_PRICE = 2000
+
+
+def _listings(n: int):
+    rng = random.Random(7)
+    return [listing.Listing(
+        rmv_unique_link=str(i),
+        image_links=None if rng.random() < 0.05 else ['x.jpg'] * rng.randint(0, 12),
+        rent_pcm=None if rng.random() < 0.05 else rng.uniform(800, 2000),
+        date_available=None if rng.random() < 0.05 else LOWER_DATE + datetime.timedelta(days=rng.randint(-10, 40)))
+        for i in range(n)]
+
+
+def _relax_one_step_at_a_time(properties: list, max_results: int):
+    """
+    Re-filters everything for each pair of the schedule in turn, as main used to
+    """
+    for images_threshold, min_rent_factor in thresholds.relaxation_schedule(4, 0.55):
+        removed = []
+        filtered_properties = properties
+        for f in [partial(filters.enough_images_filter, threshold=images_threshold),
+                  partial(filters.date_available_filter, lower_threshold=LOWER_DATE, upper_threshold=UPPER_DATE),
+                  partial(filters.min_rent_filter, threshold=min_rent_factor * MAX_PRICE)]:
+            kept = [x for x in filtered_properties if f(x)]
+            removed.append(len(filtered_properties) - len(kept))
+            filtered_properties = kept
+        if len(filtered_properties) <= max_results:
+            break
+    return images_threshold, min_rent_factor, filtered_properties, removed
+
+
+def test_schedule_matches_the_old_loop():
+    assert list(thresholds.relaxation_schedule(4, 0.55)) == [
+        (4, 0.55), (5, 0.6000000000000001), (6, 0.6500000000000001), (6, 0.7000000000000002),
+        (6, 0.7500000000000002)]
+
+
+def test_solver_and_batch_filter_match_filtering_one_step_at_a_time():
+    properties = _listings(2000)
+    columns = filters.to_columns(properties)
+    solver = thresholds.ThresholdSolver(columns, LOWER_DATE, UPPER_DATE)
+
+    for max_results in [0, 100, 205, 243, 250, 281, 300, 400, 474, 2000]:
+        images_threshold, min_rent_factor = solver.solve(thresholds.relaxation_schedule(4, 0.55), max_results,
+                                                         MAX_PRICE)
+        result = filters.batch_filter(columns, [
+            ('images', partial(filters.enough_images_mask, threshold=images_threshold)),
+            ('date_available', partial(filters.date_available_mask, lower_threshold=LOWER_DATE,
+                                       upper_threshold=UPPER_DATE)),
+            ('min_rent', partial(filters.min_rent_mask, threshold=min_rent_factor * MAX_PRICE))])
+        retained = [properties[i] for i in result.indices]
+        assert (images_threshold, min_rent_factor, retained, list(result.removed.values())) == \
+            _relax_one_step_at_a_time(properties, max_results)
@@ -0,0 +1,367 @@
+import time
+import asyncio
+import itertools
+import threading
+import collections
+import multiprocessing as mp
+from urllib.parse import urlparse
+from multiprocessing.managers import BaseManager, BaseProxy
+
+import aiohttp
+import requests
+
+# statuses that mean the host wants us to slow down, as opposed to the request simply being bad
+BACKOFF_STATUSES = (429, 500, 502, 503, 504)
+# seconds a sync request may take, so a hung connection fails (and backs off) rather than holding its slot for good
+DEFAULT_TIMEOUT = 60
+# seconds a slot of a shared throttle stays taken if the process holding it never gives it back, e.g. it was killed
+LEASE_TIMEOUT = 2 * DEFAULT_TIMEOUT
+
+
+class AdaptiveThrottle:
+    """
+    AIMD concurrency limiter for one host. Every request holds a slot while in flight; the limit grows by one slot
+    per fast successful response until the first back-off (slow start, doubling every round trip), then by one slot
+    per limit's worth of them. It is cut by backoff_ratio on 429/5xx, timeouts and connection errors (at most once
+    per cooldown so a burst of failures from the same window only counts once).
+    A Retry-After pauses all new requests until it has passed. Usable from threads and from coroutines.
+    Slots taken from other processes through an AdaptiveThrottleProxy are leases, freed again after lease_timeout
+    seconds if their process dies before giving them back
+    """
+
+    def __init__(self, name: str, min_limit=1, max_limit=16, initial_limit=4, target_latency=2.0,
+                 backoff_ratio=0.5, cooldown=1.0, lease_timeout=LEASE_TIMEOUT):
+        self.name = name
+        self.lease_timeout = lease_timeout
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff_ratio = backoff_ratio
+        self.cooldown = cooldown
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        # most requests in flight at once since the last back-off, to tell whether the limit is being used
+        self._peak_in_flight = 0
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._last_backoff = 0.0
+        self._slow_start = True
+        self._counts = collections.Counter()
+        self._leases = {}  # lease id -> when its slot is taken back
+        self._lease_ids = itertools.count()
+
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._async_waiters = collections.deque()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, limit=int(self._limit), in_flight=self._in_flight, queue_depth=self._waiting)
+
+    def slot(self):
+        return _Slot(self)
+
+    def async_slot(self):
+        return _AsyncSlot(self)
+
+    def back_off(self, retry_after: float = None):
+        """
+        Signal that the host is struggling without going through a slot, e.g. a 200 that turned out to be a
+        block page. retry_after (seconds) pauses all new requests
+        """
+        with self._lock:
+            self._back_off(retry_after)
+
+    def _acquire_wait(self):
+        """
+        Takes a slot and returns 0 if one is free, otherwise returns how long to wait before trying again
+        (None meaning until a slot is released). Caller holds the lock
+        """
+        now = time.monotonic()
+        self._take_back_expired_leases(now)
+        pause = self._paused_until - now
+        if pause > 0:
+            return pause
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            return 0
+        # a lease running out frees a slot without anyone releasing it
+        return min(self._leases.values()) - now if self._leases else None
+
+    def _acquire(self):
+        with self._lock:
+            self._waiting += 1
+            try:
+                wait = self._acquire_wait()
+                while wait != 0:
+                    self._slot_freed.wait(wait)
+                    wait = self._acquire_wait()
+            finally:
+                self._waiting -= 1
+
+    async def _acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            wait = self._acquire_wait()
+            if wait == 0:
+                return
+            self._waiting += 1
+        slot_freed = None
+        try:
+            while True:
+                slot_freed = loop.create_future()
+                with self._lock:
+                    wait = self._acquire_wait()
+                    if wait == 0:
+                        return
+                    self._async_waiters.append(slot_freed)
+                await asyncio.wait([slot_freed], timeout=wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                # still queued after a timeout, or if this task was cancelled while waiting
+                if slot_freed in self._async_waiters:
+                    self._async_waiters.remove(slot_freed)
+
+    def _acquire_lease(self):
+        """
+        _acquire for a slot held by another process, returning the lease id to give to _release_lease
+        """
+        self._acquire()
+        with self._lock:
+            lease = next(self._lease_ids)
+            self._leases[lease] = time.monotonic() + self.lease_timeout
+            return lease
+
+    def _release_lease(self, lease: int, latency: float, status: int = None, failed=False,
+                       retry_after: float = None):
+        with self._lock:
+            if self._leases.pop(lease, None) is None:
+                return  # already taken back, the slot has gone to someone else since
+        self._release(latency, status, failed, retry_after)
+
+    def _take_back_expired_leases(self, now: float):
+        # caller holds the lock
+        expired = [lease for lease, expires_at in self._leases.items() if expires_at <= now]
+        for lease in expired:
+            del self._leases[lease]
+            self._in_flight -= 1
+            self._counts['expired_leases'] += 1
+        if expired:
+            print("Throttle for {}: took back {} slots never released".format(self.name, len(expired)))
+
+    def _release(self, latency: float, status: int = None, failed=False, retry_after: float = None):
+        with self._lock:
+            self._in_flight -= 1
+            if failed or status in BACKOFF_STATUSES:
+                self._counts['backoffs'] += 1
+                self._back_off(retry_after)
+            else:
+                self._counts['ok'] += 1
+                # only grow when at least half the current limit is actually being used
+                if latency <= self.target_latency and self._peak_in_flight * 2 >= int(self._limit):
+                    step = 1 if self._slow_start else 1 / self._limit
+                    self._limit = min(self.max_limit, self._limit + step)
+            self._wake_all()
+
+    def _back_off(self, retry_after: float = None):
+        now = time.monotonic()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        self._slow_start = False
+        if now - self._last_backoff >= self.cooldown:
+            self._last_backoff = now
+            previous = int(self._limit)
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+            self._peak_in_flight = self._in_flight
+            print("Throttle for {}: backing off from {} to {} concurrent requests"
+                  .format(self.name, previous, int(self._limit)))
+        self._wake_all()
+
+    def _wake_all(self):
+        # caller holds the lock
+        self._slot_freed.notify_all()
+        while self._async_waiters:
+            slot_freed = self._async_waiters.popleft()
+            loop = slot_freed.get_loop()
+            # the waiter's event loop may have finished since, nobody is left to wake
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, slot_freed)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Slot:
+    """
+    Held for the duration of one request. Set status (and retry_after if the response carried one) before the
+    block ends; an exception escaping the block counts as a failure
+    """
+
+    def __init__(self, throttle: AdaptiveThrottle):
+        self._throttle = throttle
+        self.status = None
+        self.retry_after = None
+
+    def __enter__(self):
+        self._throttle._acquire()
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._throttle._release(time.monotonic() - self._start, self.status, failed=exc_type is not None,
+                                retry_after=self.retry_after)
+
+
+class _AsyncSlot(_Slot):
+    async def __aenter__(self):
+        await self._throttle._acquire_async()
+        self._start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.__exit__(exc_type, exc, tb)
+
+
+class AdaptiveThrottleProxy(BaseProxy):
+    """
+    Handle on an AdaptiveThrottle living in a ThrottleManager process. It can be pickled into other processes
+    (e.g. pool workers), and every process holding it shares the one limit. Thread slots only, not async ones.
+    Slots are leased, so those of a process killed mid-request come back after the throttle's lease_timeout
+    """
+    _exposed_ = ('_acquire_lease', '_release_lease', 'back_off', 'stats')
+
+    def slot(self):
+        return _LeasedSlot(self)
+
+    def back_off(self, retry_after: float = None):
+        self._callmethod('back_off', (retry_after,))
+
+    def stats(self):
+        return self._callmethod('stats')
+
+
+class _LeasedSlot(_Slot):
+    def __enter__(self):
+        # blocks in the manager process until a slot is free
+        self._lease = self._throttle._callmethod('_acquire_lease')
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._throttle._callmethod('_release_lease', (self._lease, time.monotonic() - self._start, self.status,
+                                                      exc_type is not None, self.retry_after))
+
+
+class ThrottleManager(BaseManager):
+    pass
+
+
+ThrottleManager.register('AdaptiveThrottle', AdaptiveThrottle, proxytype=AdaptiveThrottleProxy)
+
+_throttles = {}
+_shared_throttles = {}
+_manager = None
+_throttles_lock = threading.Lock()
+
+
+def for_host(url: str, **settings) -> AdaptiveThrottle:
+    """
+    The throttle shared by everything in this process talking to url's host. settings only apply when the
+    throttle is first created
+    """
+    host = urlparse(url).netloc
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = AdaptiveThrottle(host, **settings)
+        return _throttles[host]
+
+
+def shared_for_host(url: str, **settings) -> AdaptiveThrottleProxy:
+    """
+    for_host for several processes: the throttle lives in a ThrottleManager process, started on first use, and
+    every process given the returned proxy shares its limit
+    """
+    global _manager
+    host = urlparse(url).netloc
+    with _throttles_lock:
+        if _manager is None:
+            _manager = ThrottleManager(ctx=mp.get_context("spawn"))
+            _manager.start()
+        if host not in _shared_throttles:
+            _shared_throttles[host] = _manager.AdaptiveThrottle(host, **settings)
+        return _shared_throttles[host]
+
+
+def reset():
+    """
+    Forgets every host's throttle so the next for_host / shared_for_host starts from scratch
+    """
+    with _throttles_lock:
+        _throttles.clear()
+        _shared_throttles.clear()
+
+
+def retry_after_seconds(headers):
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None  # missing, or given as an HTTP date which RMV does not send
+
+
+def get(throttle: AdaptiveThrottle, url: str, retries=6, backoff_factor=0.6, session=None, timeout=DEFAULT_TIMEOUT,
+        **kwargs):
+    """
+    requests.get through the throttle, retrying BACKOFF_STATUSES, connection errors and timeouts with exponential
+    backoff. Every attempt takes its own slot so the throttle sees each failure
+    """
+    session = session or requests
+    for attempt in range(retries + 1):
+        try:
+            with throttle.slot() as slot:
+                r = session.get(url, timeout=timeout, **kwargs)
+                slot.status = r.status_code
+                slot.retry_after = retry_after_seconds(r.headers)
+            if r.status_code not in BACKOFF_STATUSES or attempt == retries:
+                return r
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(backoff_factor * (2 ** attempt))
+
+
+async def get_async(throttle: AdaptiveThrottle, session: aiohttp.ClientSession, url: str, retries=6,
+                    backoff_factor=0.6, **kwargs):
+    """
+    Async counterpart of get, returns (status, body)
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with throttle.async_slot() as slot:
+                async with session.get(url, **kwargs) as r:
+                    slot.status = r.status
+                    slot.retry_after = retry_after_seconds(r.headers)
+                    if r.status not in BACKOFF_STATUSES or attempt == retries:
+                        return r.status, await r.text()
+
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff_factor * (2 ** attempt))
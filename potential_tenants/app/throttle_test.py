@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing as mp
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from app import throttle
+
+
+def _full_round(rmv_throttle, status=200):
+    # one request per slot, all in flight at once so the limit counts as used
+    slots = [rmv_throttle.slot() for _ in range(rmv_throttle.limit)]
+    [x.__enter__() for x in slots]
+    for slot in slots:
+        slot.status = status
+        slot.__exit__(None, None, None)
+
+
+def test_slow_start_then_additive_increase():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=2, max_limit=64, cooldown=0)
+
+    # slow start: doubles every round
+    _full_round(rmv_throttle)
+    assert rmv_throttle.limit == 4
+    _full_round(rmv_throttle)
+    assert rmv_throttle.limit == 8
+
+    with rmv_throttle.slot() as slot:
+        slot.status = 429
+    assert rmv_throttle.limit == 4
+
+    # then about one slot per round
+    _full_round(rmv_throttle)
+    _full_round(rmv_throttle)
+    assert rmv_throttle.limit == 5
+
+
+def test_limit_only_grows_when_used():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=4)
+
+    for _ in range(10):
+        with rmv_throttle.slot() as slot:
+            slot.status = 200
+    assert rmv_throttle.limit == 4
+
+
+def test_slow_responses_and_failures_do_not_raise_the_limit():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=4, target_latency=0, cooldown=0)
+
+    with rmv_throttle.slot() as slot:
+        time.sleep(0.01)
+        slot.status = 200
+    assert rmv_throttle.limit == 4
+
+    try:
+        with rmv_throttle.slot():
+            raise ConnectionError
+    except ConnectionError:
+        pass
+    assert rmv_throttle.limit == 2
+    assert rmv_throttle.stats()['backoffs'] == 1
+
+
+def test_burst_of_failures_backs_off_once_per_cooldown():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=16, max_limit=16, cooldown=60)
+
+    for _ in range(5):
+        with rmv_throttle.slot() as slot:
+            slot.status = 503
+    assert rmv_throttle.limit == 8
+
+
+def test_limit_caps_requests_in_flight():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=2, max_limit=2)
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with rmv_throttle.slot() as slot:
+            with lock:
+                peak.append(rmv_throttle.in_flight)
+            time.sleep(0.02)
+            slot.status = 200
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    [x.start() for x in threads]
+    [x.join() for x in threads]
+
+    assert max(peak) == 2
+    assert rmv_throttle.in_flight == 0 and rmv_throttle.queue_depth == 0
+
+
+def _request_through(shared_throttle):
+    with shared_throttle.slot() as slot:
+        in_flight = shared_throttle.stats()['in_flight']
+        time.sleep(0.05)
+        slot.status = 200
+    return in_flight
+
+
+def test_shared_throttle_limits_requests_across_processes():
+    shared_throttle = throttle.shared_for_host('http://shared.test', initial_limit=2, max_limit=2)
+    try:
+        with mp.get_context("spawn").Pool(processes=4) as pool:
+            peak = pool.map(_request_through, [shared_throttle] * 12, chunksize=1)
+        stats = shared_throttle.stats()
+    finally:
+        throttle.reset()
+
+    assert max(peak) == 2
+    assert stats['ok'] == 12 and stats['in_flight'] == 0 and stats['queue_depth'] == 0
+
+
+def _die_holding_a_slot(shared_throttle):
+    with shared_throttle.slot():
+        os._exit(1)
+
+
+def test_slot_of_a_killed_process_is_taken_back_after_its_lease():
+    shared_throttle = throttle.shared_for_host('http://leases.test', initial_limit=1, max_limit=1, lease_timeout=0.5)
+    try:
+        worker = mp.get_context("spawn").Process(target=_die_holding_a_slot, args=(shared_throttle,))
+        worker.start()
+        worker.join()
+        assert shared_throttle.stats()['in_flight'] == 1
+
+        start = time.monotonic()
+        with shared_throttle.slot() as slot:
+            waited = time.monotonic() - start
+            slot.status = 200
+        stats = shared_throttle.stats()
+    finally:
+        throttle.reset()
+
+    assert 0 < waited < 5
+    assert stats['expired_leases'] == 1 and stats['in_flight'] == 0
+
+
+def test_lease_released_late_does_not_free_a_second_slot():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=1, max_limit=1, lease_timeout=0.05)
+    late = rmv_throttle._acquire_lease()
+    time.sleep(0.1)
+    on_time = rmv_throttle._acquire_lease()
+
+    rmv_throttle._release_lease(late, 0.1, 200)
+    assert rmv_throttle.in_flight == 1
+    rmv_throttle._release_lease(on_time, 0.01, 200)
+    assert rmv_throttle.in_flight == 0
+
+
+def test_async_slots_share_the_limit_and_honour_retry_after():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=2, max_limit=2, cooldown=0)
+    peak = []
+
+    async def request(status, retry_after=None):
+        async with rmv_throttle.async_slot() as slot:
+            peak.append(rmv_throttle.in_flight)
+            await asyncio.sleep(0.01)
+            slot.status = status
+            slot.retry_after = retry_after
+
+    async def run():
+        await asyncio.gather(*[request(200) for _ in range(6)])
+        await request(429, retry_after=0.2)
+        start = time.monotonic()
+        await request(200)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.2
+    assert max(peak) == 2
+    assert rmv_throttle.stats()['backoffs'] == 1
+
+
+def test_cancelled_waiters_are_not_woken_after_their_loop_closes():
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=1, max_limit=1)
+    held = rmv_throttle.slot()
+    held.__enter__()
+
+    async def wait_for_slot():
+        async with rmv_throttle.async_slot():
+            pass
+
+    async def run():
+        waiter = asyncio.ensure_future(wait_for_slot())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(run())
+    assert not rmv_throttle._async_waiters and rmv_throttle.queue_depth == 0
+
+    # a waiter left over from a loop that has since closed is skipped rather than raising
+    rmv_throttle._async_waiters.append(asyncio.new_event_loop().create_future())
+    rmv_throttle._async_waiters[0].get_loop().close()
+    held.__exit__(None, None, None)
+    assert rmv_throttle.in_flight == 0
+
+
+class _HangingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_hung_requests_time_out_and_back_off():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _HangingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rmv_throttle = throttle.AdaptiveThrottle('test', initial_limit=4, cooldown=0)
+    try:
+        with pytest.raises(requests.exceptions.Timeout):
+            throttle.get(rmv_throttle, "http://127.0.0.1:{}/".format(server.server_address[1]), retries=1,
+                         backoff_factor=0, timeout=0.1)
+    finally:
+        server.shutdown()
+
+    assert rmv_throttle.stats()['backoffs'] == 2 and rmv_throttle.in_flight == 0
+    assert rmv_throttle.limit == 1
@@ -8,10 +8,21 @@ from urllib3.util.retry import Retry
 import random
 
 import googlemaps
-from app import rmv_constants
+from app import rmv_constants, cache
 
 gmaps_key = os.environ['GMAPS_KEY']
-gmaps = googlemaps.Client(key=gmaps_key)
+# created on first use rather than at import, as every scraping worker process imports this module
+_gmaps = None
+
+
+geocode_cache = cache.TtlCache('geocode', ttl=rmv_constants.GEOCODE_CACHE_TTL_HOURS * 3600)
+
+
+def gmaps_client():
+    global _gmaps
+    if _gmaps is None:
+        _gmaps = googlemaps.Client(key=gmaps_key)
+    return _gmaps
 
 
 def gen_uuid():
@@ -145,5 +156,10 @@ def chunks(lst, n):
 
 
 def geocode_address(location: str):
-    r = gmaps.geocode(location, region='uk')
-    return tuple((r[0]['geometry']['location']).values())
+    def geocode():
+        r = gmaps_client().geocode(location, region='uk')
+        return list((r[0]['geometry']['location']).values())
+
+    # the same destination is typed with all sorts of spacing and capitalisation
+    key = cache.make_key(' '.join(location.lower().split()))
+    return tuple(geocode_cache.get_or_set(key, geocode))
@@ -1,18 +1,22 @@
+import os
 import json
 import datetime
-import psycopg2
 from dateutil import parser
 from flask import Flask, request, Response
 from flask_cors import cross_origin
 from flask_executor import Executor
 
-from app import main, general_constants, rmv_constants
+from app import main, db, general_constants, rmv_constants, worker_pool
 
 app = Flask(__name__)
 app.config['EXECUTOR_PROPAGATE_EXCEPTIONS'] = True  # To get errors from threads to surface up to console
 
 executor = Executor(app)
 
+# searches reuse one warm pool of scraping processes instead of spawning a fresh one each time
+if main.SEARCH_MODE == 'parallel':
+    worker_pool.start_in_background(int(os.getenv("NUM_PROCS")))
+
 
 @app.route('/', methods=['GET'])
 def hello():
@@ -56,7 +60,7 @@ def generate_user_config(criteria):
         SELECT email from users
         WHERE webflow_form_number = %s
         """
-        with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+        with db.connection() as conn:
             with conn.cursor() as curs:
                 curs.execute(find_user_email_query, (webflow_form_number,))
                 data = curs.fetchone()
@@ -0,0 +1,208 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app import cache
+
+API_URL = os.getenv("WEBFLOW_API_URL", "https://api.webflow.com")
+PROPERTIES_COLLECTION_ID = "5e62aadc51beef34cfbc64d8"
+USERS_COLLECTION_ID = "5e9cb6cb572a494febd4efb3"
+TUBE_STOPS_COLLECTION_ID = "5eaf0803a0d3e484ca69b0db"
+
+ITEMS_PER_PAGE = 100
+# Webflow allows 60 requests a minute per API key until the rate limit headers say otherwise
+RATE_LIMIT = 60
+RATE_LIMIT_WINDOW = 60
+MAX_CONCURRENT_REQUESTS = int(os.getenv("WEBFLOW_MAX_CONCURRENT_REQUESTS", 4))
+MAX_RETRIES = 4
+BACKOFF = 1  # seconds before the first retry, doubling after each one
+REQUEST_TIMEOUT = 30
+# how long the users and tube stop collections are reused before being fetched again
+USERS_CACHE_TTL_MINUTES = float(os.getenv("WEBFLOW_USERS_CACHE_TTL_MINUTES", 10))
+TUBE_STOPS_CACHE_TTL_HOURS = float(os.getenv("WEBFLOW_TUBE_STOPS_CACHE_TTL_HOURS", 24))
+
+
+class TokenBucket:
+    """
+    Request budget of capacity requests per window seconds, refilled continuously. take() blocks until a request
+    may be made. The budget follows what the API reports: update() with the rate limit headers of each response,
+    pause() when it answers 429
+    """
+
+    def __init__(self, capacity: int = RATE_LIMIT, window: float = RATE_LIMIT_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def take(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.window / self.capacity
+                self.waited += wait
+            time.sleep(wait)
+
+    def update(self, limit: int, remaining: int):
+        with self._lock:
+            self._refill()
+            self.capacity = limit or self.capacity
+            # the requests still in flight are already spent here but not yet counted in remaining
+            self._tokens = min(self._tokens, remaining)
+
+    def pause(self, seconds: float):
+        """
+        No requests for the next seconds
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 1 - seconds * self.capacity / self.window)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.capacity / self.window)
+        self._updated = now
+
+
+# one budget per process, as the limit is per API key
+limiter = TokenBucket()
+
+
+class WebflowClient:
+    """
+    Webflow CMS API calls made within the rate limit. 429s, 5xx and connection errors are retried with
+    exponential backoff (429s after their Retry-After), up to MAX_RETRIES times
+    """
+
+    def __init__(self, api_key: str = None, api_url: str = None, bucket: TokenBucket = None,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF):
+        self.api_url = api_url or API_URL
+        self.bucket = bucket or limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests_made = 0
+        self._count_lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Authorization": "Bearer {}".format(api_key or os.environ['WEBFLOW_API_KEY']),
+            "accept-version": "1.0.0",
+            "Content-Type": "application/json"
+        })
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Response to the last attempt, successful or not. Raises the connection error if the last attempt had one
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.take()
+            with self._count_lock:
+                self.requests_made += 1
+            try:
+                r = self._session.request(method, self.api_url + path, timeout=REQUEST_TIMEOUT, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if attempt == self.max_retries:
+                    raise
+                print("Webflow {} {} failed ({}), retrying ...".format(method, path, e))
+                self._back_off(attempt)
+                continue
+
+            self._update_rate_limit(r)
+            if r.status_code == 429 and attempt < self.max_retries:
+                retry_after = float(r.headers.get('Retry-After', self.backoff * 2 ** attempt))
+                print("Webflow rate limit hit, retrying in {}s ...".format(retry_after))
+                self.bucket.pause(retry_after)
+            elif r.status_code >= 500 and attempt < self.max_retries:
+                print("Webflow {} {} answered {}, retrying ...".format(method, path, r.status_code))
+                self._back_off(attempt)
+            else:
+                return r
+
+    def list_items(self, collection_id: str) -> list:
+        """
+        Every item of the collection, paging through it ITEMS_PER_PAGE at a time
+        """
+        items = []
+        while True:
+            r = self.request('GET', "/collections/{}/items".format(collection_id),
+                             params={"offset": len(items), "limit": ITEMS_PER_PAGE})
+            r.raise_for_status()
+            data = r.json()
+            items.extend(data['items'])
+            if not data['items'] or len(items) >= data['total']:
+                return items
+
+    def create_item(self, collection_id: str, fields: dict, live=True) -> requests.Response:
+        return self.request('POST', "/collections/{}/items".format(collection_id),
+                            params={"live": str(live).lower()}, json={"fields": fields})
+
+    def update_item(self, collection_id: str, item_id: str, fields: dict, live=True) -> requests.Response:
+        return self.request('PATCH', "/collections/{}/items/{}".format(collection_id, item_id),
+                            params={"live": str(live).lower()}, json={"fields": fields})
+
+    def create_items(self, collection_id: str, fields: [dict], live=True) -> [requests.Response]:
+        """
+        create_item for each of fields, MAX_CONCURRENT_REQUESTS at a time. Responses in the order of fields, None
+        where the request itself failed
+        """
+        def create(item_fields):
+            try:
+                return self.create_item(collection_id, item_fields, live)
+            except requests.exceptions.RequestException as e:
+                print("Could not create Webflow item {}: {}".format(item_fields.get('name'), e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            return list(executor.map(create, fields))
+
+    def _update_rate_limit(self, r: requests.Response):
+        try:
+            # 1 short of what is reported because of a bug in the Webflow API
+            self.bucket.update(int(r.headers['X-RateLimit-Limit']), int(r.headers['X-RateLimit-Remaining']) - 1)
+        except (KeyError, ValueError):
+            pass
+
+    def _back_off(self, attempt: int):
+        time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# name -> item id of the reference collections, kept in memory for every run in the process
+users_cache = cache.TtlCache('webflow_users', ttl=USERS_CACHE_TTL_MINUTES * 60, max_entries=1, persist=False)
+tube_stops_cache = cache.TtlCache('webflow_tube_stops', ttl=TUBE_STOPS_CACHE_TTL_HOURS * 3600, max_entries=1,
+                                  persist=False)
+
+
+def users(client: WebflowClient = None, refresh=False) -> dict:
+    """
+    Webflow form number -> user item id. refresh=True fetches the collection again, for users who signed up since
+    """
+    if refresh:
+        users_cache.invalidate(USERS_COLLECTION_ID)
+    return users_cache.get_or_set(USERS_COLLECTION_ID, lambda: {
+        int(x["name"]): x["_id"] for x in (client or WebflowClient()).list_items(USERS_COLLECTION_ID)})
+
+
+def tube_stops(client: WebflowClient = None, refresh=False) -> dict:
+    """
+    Tube stop name -> tube stop item id
+    """
+    if refresh:
+        tube_stops_cache.invalidate(TUBE_STOPS_COLLECTION_ID)
+    return tube_stops_cache.get_or_set(TUBE_STOPS_COLLECTION_ID, lambda: {
+        x['name']: x['_id'] for x in (client or WebflowClient()).list_items(TUBE_STOPS_COLLECTION_ID)})
+
+
+def invalidate():
+    """
+    Drops the cached reference collections, fetched again the next time they are needed
+    """
+    users_cache.invalidate()
+    tube_stops_cache.invalidate()
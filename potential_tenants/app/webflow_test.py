@@ -0,0 +1,74 @@
+import timeit
+
+import pytest
+
+from app import webflow
+from benchmarks import webflow_stub_server
+
+
+@pytest.fixture(scope='module')
+def api_url():
+    server, url = webflow_stub_server.start()
+    yield url
+    server.shutdown()
+
+
+def _client(api_url, rate_limit, rate_limit_window=1.0):
+    webflow_stub_server.reset(rate_limit, rate_limit_window)
+    return webflow.WebflowClient(api_key='test', api_url=api_url, backoff=0.05,
+                                 bucket=webflow.TokenBucket(rate_limit, rate_limit_window))
+
+
+def test_list_items_pages_through_the_collection(api_url):
+    client = _client(api_url, rate_limit=60)
+    webflow_stub_server.add_items('stops', ["Stop {}".format(i) for i in range(250)])
+
+    items = client.list_items('stops')
+
+    assert [x['name'] for x in items] == ["Stop {}".format(i) for i in range(250)]
+    assert client.requests_made == 3
+
+
+def test_items_are_created_as_fast_as_the_rate_limit_allows(api_url):
+    client = _client(api_url, rate_limit=10)
+
+    start = timeit.default_timer()
+    responses = client.create_items('properties', [{"name": str(i)} for i in range(25)])
+    elapsed = timeit.default_timer() - start
+
+    assert [x.json()['name'] for x in responses] == [str(i) for i in range(25)]
+    assert webflow_stub_server.rate_limited == 0
+    # 10 straight away, then the other 15 at 10 a second
+    assert 1.2 < elapsed < 4
+
+
+def test_rate_limited_and_failed_requests_are_retried(api_url, monkeypatch):
+    client = _client(api_url, rate_limit=5)
+    # the client starts off thinking it has more quota than it has, and sends more than that at once
+    client.bucket = webflow.TokenBucket(50, 1.0)
+    monkeypatch.setattr(webflow, 'MAX_CONCURRENT_REQUESTS', 8)
+    webflow_stub_server.FAILING_CREATES = 2
+
+    responses = client.create_items('properties', [{"name": str(i)} for i in range(12)])
+
+    assert all(x.status_code == 200 for x in responses)
+    assert len(webflow_stub_server.collections_items['properties']) == 12
+    assert webflow_stub_server.rate_limited > 0
+
+
+def test_reference_collections_are_fetched_once_until_invalidated(api_url):
+    client = _client(api_url, rate_limit=60)
+    webflow_stub_server.add_items(webflow.TUBE_STOPS_COLLECTION_ID, ["Stop {}".format(i) for i in range(150)])
+    webflow_stub_server.add_items(webflow.USERS_COLLECTION_ID, ["1", "2"])
+    webflow.invalidate()
+
+    for _ in range(10):
+        assert len(webflow.tube_stops(client)) == 150
+        assert set(webflow.users(client)) == {1, 2}
+    assert client.requests_made == 3
+
+    webflow_stub_server.add_items(webflow.USERS_COLLECTION_ID, ["3"])
+    assert set(webflow.users(client, refresh=True)) == {1, 2, 3}
+    webflow.invalidate()
+    webflow.tube_stops(client)
+    assert client.requests_made == 6
@@ -0,0 +1,62 @@
+import os
+import time
+import atexit
+import timeit
+import threading
+import multiprocessing as mp
+
+_pool = None
+_pool_lock = threading.Lock()
+
+READY_TIMEOUT = 120  # seconds to wait for every worker to finish importing
+
+
+def _warm_up():
+    # pay for the heavy imports (bs4, lxml, calmjs, psycopg2, aiohttp...) once per worker, not once per search
+    import app.rmv_scraper  # noqa: F401
+
+
+def _ready(_):
+    time.sleep(0.01)  # long enough that one warm worker can't take every probe
+    return os.getpid()
+
+
+def get_pool(processes: int):
+    """
+    The long-lived spawn pool shared by every search in this process, started (and warmed up) on first use.
+    Worker processes that die are replaced by the pool itself
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            start = timeit.default_timer()
+            pool = mp.get_context("spawn").Pool(processes=processes, initializer=_warm_up)
+            ready = set()
+            while len(ready) < processes and timeit.default_timer() - start < READY_TIMEOUT:
+                ready.update(pool.map(_ready, range(processes), chunksize=1))
+            print("Worker pool of {} processes ready in {:.2f} seconds".format(processes,
+                                                                              timeit.default_timer() - start))
+            _pool = pool
+        return _pool
+
+
+def start_in_background(processes: int):
+    """
+    Starts the pool without holding up the caller, e.g. while the web app boots. Does nothing inside a worker
+    process, which re-imports the parent's main module under spawn
+    """
+    if mp.current_process().name != 'MainProcess':
+        return
+    threading.Thread(target=get_pool, args=(processes,), name='worker-pool-start', daemon=True).start()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool.join()
+            _pool = None
+
+
+atexit.register(shutdown)
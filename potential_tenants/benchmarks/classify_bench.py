@@ -0,0 +1,93 @@
+"""
+Time and peak memory of picking the field-bearing scripts out of a details page: the single classification pass
+in rmv_extract.scripts_to_extract against the previous four separate normalise-and-filter passes.
+
+Uses recorded detail pages from PAGE_CACHE_DIR when it is set, otherwise stub pages:
+    python -m benchmarks.classify_bench
+"""
+import timeit
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from app import rmv_extract, rmv_constants
+from benchmarks import extract_bench
+
+ROUNDS = 5
+
+
+def scripts_to_extract_multipass(scripts_soup: list):
+    # previous implementation, kept here as the baseline
+    scripts_with_details = list(
+        filter(lambda x: True if x.find(rmv_constants.PROPERTY_DETAILS_FILTER) >= 0 else False,
+               [str(scripts_soup[y].next).strip().replace('\r', '').replace('\n', '').replace('\t', '')
+                for y in range(0, len(scripts_soup))]))
+    scripts_with_availability = \
+        list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_AVAILABILITY_FILTER) >= 0 else False,
+                    [str(scripts_soup[y].next).strip().replace('\r', '').replace('\n', '').replace('\t', '')
+                     for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')[6]
+    try:
+        scripts_with_images = \
+            list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_IMAGES_FILTER) >= 0 else False,
+                        [str(scripts_soup[y].next).strip().replace('\r', '').replace('\n', '').replace('\t', '')
+                         for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')
+        scripts_with_images = [y for y in scripts_with_images if y.find(rmv_constants.PROPERTY_IMAGES_FILTER) >= 0]
+    except IndexError:
+        scripts_with_images = []
+    try:
+        scripts_with_floorplans = \
+            list(filter(lambda x: True if x.find(rmv_constants.PROPERTY_FLOORPLAN_FILTER) >= 0 else False,
+                        [str(scripts_soup[y].next).strip().replace('\r', '').replace('\n', '').replace('\t', '')
+                         for y in range(0, len(scripts_soup))]))[0].split('(jQuery);')
+        scripts_with_floorplans = [y for y in scripts_with_floorplans
+                                   if y.find(rmv_constants.PROPERTY_FLOORPLAN_FILTER) >= 0]
+    except IndexError:
+        scripts_with_floorplans = []
+    return scripts_with_details + [scripts_with_availability] + scripts_with_images + scripts_with_floorplans
+
+
+def classify_all(classify, pages_scripts_soup):
+    results = []
+    for scripts_soup in pages_scripts_soup:
+        try:
+            results.append(classify(scripts_soup))
+        except IndexError:
+            results.append(None)
+    return results
+
+
+def measure(classify, pages_scripts_soup):
+    # best of a few rounds as a single pass over the pages is short enough to be noisy
+    elapsed = min(timeit.repeat(lambda: classify_all(classify, pages_scripts_soup), number=1, repeat=ROUNDS))
+
+    # peak transient allocation while classifying one page (results are not kept so they don't count)
+    tracemalloc.start()
+    for scripts_soup in pages_scripts_soup:
+        try:
+            classify(scripts_soup)
+        except IndexError:
+            pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    pages_scripts_soup = [BeautifulSoup(x, "html.parser").find_all('script') for x in extract_bench.load_pages()]
+    print("Classifying scripts of {} pages".format(len(pages_scripts_soup)))
+
+    assert classify_all(scripts_to_extract_multipass, pages_scripts_soup) == \
+        classify_all(rmv_extract.scripts_to_extract, pages_scripts_soup), \
+        "single pass classification does not match the previous output"
+
+    baseline_time, baseline_peak = measure(scripts_to_extract_multipass, pages_scripts_soup)
+    single_time, single_peak = measure(rmv_extract.scripts_to_extract, pages_scripts_soup)
+
+    for name, elapsed, peak in [("four passes", baseline_time, baseline_peak),
+                                ("single pass", single_time, single_peak)]:
+        print("{:<12} {:>8.3f}s {:>10.1f} pages/s   peak {:>8.1f} KiB".format(
+            name, elapsed, len(pages_scripts_soup) / elapsed, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
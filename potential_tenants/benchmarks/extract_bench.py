@@ -0,0 +1,46 @@
+"""
+Throughput of the targeted JS field extractor against the original calmjs ES5 AST walk, in listings/second.
+
+Uses recorded detail pages from PAGE_CACHE_DIR when it is set, otherwise stub pages:
+    python -m benchmarks.extract_bench
+"""
+import os
+import timeit
+
+from bs4 import BeautifulSoup
+
+from app import rmv_extract, page_cache
+from benchmarks import rmv_stub_server
+
+NUM_STUB_PAGES = 200
+
+
+def load_pages():
+    if os.getenv('PAGE_CACHE_DIR'):
+        return [html for _, _, html in page_cache.PageCache(os.environ['PAGE_CACHE_DIR']).latest(page_cache.DETAIL)]
+    return [rmv_stub_server.detail_page(1000 + i) for i in range(NUM_STUB_PAGES)]
+
+
+def main():
+    pages_scripts = []
+    for html in load_pages():
+        try:
+            pages_scripts.append(rmv_extract.scripts_to_extract(BeautifulSoup(html, "html.parser").find_all('script')))
+        except IndexError:
+            continue
+
+    print("Extracting fields from {} pages".format(len(pages_scripts)))
+    for name, extract in [("es5 AST walk", rmv_extract.extract_fields_ast),
+                          ("targeted scan", rmv_extract.extract_fields)]:
+        start = timeit.default_timer()
+        for scripts in pages_scripts:
+            try:
+                extract(scripts)
+            except Exception:
+                pass
+        elapsed = timeit.default_timer() - start
+        print("{:<15} {:>8.3f}s {:>10.1f} listings/s".format(name, elapsed, len(pages_scripts) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+The images, date and min rent filters run one listing at a time (filters.*_filter) against the same steps as
+masks over filters.to_columns (filters.batch_filter), on synthetic listings:
+    python -m benchmarks.filter_bench
+Batch times are given with and without building the columns, which is paid once however many rounds of
+filtering follow.
+"""
+import random
+import timeit
+import datetime
+from functools import partial
+
+from app import filters, listing
+
+SIZES = [10000, 100000, 1000000]
+ROUNDS = 3
+
+LOWER_DATE = datetime.datetime(2020, 3, 1)
+UPPER_DATE = datetime.datetime(2020, 4, 1)
+IMAGES_THRESHOLD = 4
+MIN_RENT = 1100
+
+
+def make_listings(n: int):
+    # no missing values: the per-listing filters print a line for each of those
+    rng = random.Random(0)
+    images = [['x.jpg'] * i for i in range(13)]
+    return [listing.Listing(
+        rmv_unique_link=str(i),
+        image_links=images[rng.randint(0, 12)],
+        rent_pcm=rng.uniform(800, 2000),
+        beds=rng.randint(1, 4),
+        date_available=LOWER_DATE + datetime.timedelta(days=rng.randint(-10, 40)))
+        for i in range(n)]
+
+
+def per_listing(properties):
+    removed = []
+    for f in [partial(filters.enough_images_filter, threshold=IMAGES_THRESHOLD),
+              partial(filters.date_available_filter, lower_threshold=LOWER_DATE, upper_threshold=UPPER_DATE),
+              partial(filters.min_rent_filter, threshold=MIN_RENT)]:
+        kept = [x for x in properties if f(x)]
+        removed.append(len(properties) - len(kept))
+        properties = kept
+    return properties, removed
+
+
+def batch(columns):
+    return filters.batch_filter(columns, [
+        ('images', partial(filters.enough_images_mask, threshold=IMAGES_THRESHOLD)),
+        ('date_available', partial(filters.date_available_mask, lower_threshold=LOWER_DATE,
+                                   upper_threshold=UPPER_DATE)),
+        ('min_rent', partial(filters.min_rent_mask, threshold=MIN_RENT))])
+
+
+def main():
+    print("\n{:>9} {:>14} {:>14} {:>14} {:>10}".format("listings", "per listing", "columns", "batch", "speedup"))
+    for n in SIZES:
+        properties = make_listings(n)
+        columns = filters.to_columns(properties)
+
+        kept, removed = per_listing(properties)
+        result = batch(columns)
+        assert [properties[i] for i in result.indices] == kept and list(result.removed.values()) == removed
+
+        looped = min(timeit.repeat(lambda: per_listing(properties), number=1, repeat=ROUNDS))
+        building = min(timeit.repeat(lambda: filters.to_columns(properties), number=1, repeat=ROUNDS))
+        masked = min(timeit.repeat(lambda: batch(columns), number=1, repeat=ROUNDS))
+        print("{:>9} {:>13.3f}s {:>13.3f}s {:>13.4f}s {:>9.0f}x".format(n, looped, building, masked,
+                                                                       looped / masked))
+
+
+if __name__ == '__main__':
+    main()
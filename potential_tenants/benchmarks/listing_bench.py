@@ -0,0 +1,99 @@
+"""
+Memory, pickling (what pool workers send back) and filtering cost of listings held as the per-listing dicts of
+strings the scraper used to produce against listing.Listing records.
+
+Listings are parsed from stub details pages:
+    python -m benchmarks.listing_bench
+"""
+import pickle
+import timeit
+import datetime
+import tracemalloc
+
+from app import listing
+from app.rmv_scraper import RmvScraper
+from benchmarks import rmv_stub_server
+
+NUM_LISTINGS = 50000
+NUM_DISTINCT_PAGES = 200  # parsed once each and then copied, parsing isn't what's measured here
+ROUNDS = 3
+
+CONFIG = {
+    "destinations": [],
+    "maxPrice": 2000,
+    "minBedrooms": 1,
+    "radius": 0
+}
+
+
+def as_strings(property_listing: listing.Listing):
+    """
+    The listing as the scraper used to hand it around: numbers as strings and the date formatted
+    """
+    property_profile = property_listing.to_dict()
+    for field in ['geo_lat', 'geo_long', 'rent_pcm', 'beds']:
+        if property_profile[field] is not None:
+            property_profile[field] = str(property_profile[field])
+    return property_profile
+
+
+def make_listings(rmv: RmvScraper):
+    parsed = []
+    for i in range(NUM_DISTINCT_PAGES):
+        property_id = 1000 + i
+        parsed.append(rmv._parse_property_details(rmv_stub_server.detail_page(property_id),
+                                                  'property-{}'.format(property_id)))
+    # fresh objects per listing, as they would be coming back from the workers
+    return [pickle.loads(pickle.dumps(parsed[i % NUM_DISTINCT_PAGES])) for i in range(NUM_LISTINGS)]
+
+
+def held_memory(build):
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, size
+
+
+def filter_strings(properties, low, high, min_rent):
+    return [x for x in properties
+            if low <= datetime.datetime.strptime(x['date_available'], "%Y-%m-%d %H:%M:%S") <= high
+            and float(x['rent_pcm']) > min_rent]
+
+
+def filter_typed(properties, low, high, min_rent):
+    return [x for x in properties if low <= x['date_available'] <= high and x['rent_pcm'] > min_rent]
+
+
+def measure(name, properties, filter_properties):
+    pickled = [pickle.dumps(x) for x in properties]
+    dump = min(timeit.repeat(lambda: [pickle.dumps(x) for x in properties], number=1, repeat=ROUNDS))
+    load = min(timeit.repeat(lambda: [pickle.loads(x) for x in pickled], number=1, repeat=ROUNDS))
+    low, high = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 12, 31)
+    kept = filter_properties(properties, low, high, 1200)
+    filtering = min(timeit.repeat(lambda: filter_properties(properties, low, high, 1200), number=1, repeat=ROUNDS))
+    return name, sum(len(x) for x in pickled), dump, load, filtering, len(kept)
+
+
+def main():
+    rmv = RmvScraper(CONFIG)
+    listings = make_listings(rmv)
+    as_dicts = [pickle.loads(pickle.dumps(as_strings(x))) for x in listings[:NUM_DISTINCT_PAGES]]
+
+    _, dict_memory = held_memory(lambda: [pickle.loads(pickle.dumps(as_dicts[i % NUM_DISTINCT_PAGES]))
+                                          for i in range(NUM_LISTINGS)])
+    _, listing_memory = held_memory(lambda: [pickle.loads(pickle.dumps(listings[i % NUM_DISTINCT_PAGES]))
+                                             for i in range(NUM_LISTINGS)])
+    dicts = [pickle.loads(pickle.dumps(as_dicts[i % NUM_DISTINCT_PAGES])) for i in range(NUM_LISTINGS)]
+
+    results = [measure("dict of strings", dicts, filter_strings), measure("Listing", listings, filter_typed)]
+
+    print("\n{} listings".format(NUM_LISTINGS))
+    for (name, pickled, dump, load, filtering, kept), memory in zip(results, [dict_memory, listing_memory]):
+        print("{:<16} held {:>7.1f} MB  pickled {:>7.1f} MB  dump {:>6.2f}s  load {:>6.2f}s  "
+              "date+rent filter {:>6.3f}s ({} kept)".format(name, memory / 2 ** 20, pickled / 2 ** 20, dump, load,
+                                                          filtering, kept))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Parse time and peak memory of building the soups the scraper reads: a full html.parser tree against the
+strained lxml trees from rmv_extract.summary_soup / details_soup.
+
+Uses recorded pages from PAGE_CACHE_DIR when it is set, otherwise stub pages:
+    python -m benchmarks.parse_bench
+"""
+import os
+import timeit
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from app import rmv_extract, page_cache
+from benchmarks import rmv_stub_server, extract_bench
+
+NUM_STUB_SUMMARY_PAGES = 20
+ROUNDS = 3
+
+
+def load_summary_pages():
+    if os.getenv('PAGE_CACHE_DIR'):
+        return [html for _, _, html in page_cache.PageCache(os.environ['PAGE_CACHE_DIR']).latest(page_cache.SUMMARY)]
+    return [rmv_stub_server.summary_page('OUTCODE^{}'.format(i)) for i in range(NUM_STUB_SUMMARY_PAGES)]
+
+
+def full_parse(html: str):
+    return BeautifulSoup(html, "html.parser")
+
+
+def measure(parse, pages):
+    elapsed = min(timeit.repeat(lambda: [parse(html) for html in pages], number=1, repeat=ROUNDS))
+
+    # peak while one page's tree is alive, which is what a worker holds at a time
+    peak = 0
+    for html in pages:
+        tracemalloc.start()
+        parse(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    for kind, pages, strained_parse in [("summary", load_summary_pages(), rmv_extract.summary_soup),
+                                        ("detail", extract_bench.load_pages(), rmv_extract.details_soup)]:
+        if not pages:
+            continue
+        print("Parsing {} {} pages".format(len(pages), kind))
+        for name, parse in [("html.parser", full_parse), ("strained lxml", strained_parse)]:
+            elapsed, peak = measure(parse, pages)
+            print("{:<14} {:>8.3f}s {:>10.1f} pages/s   peak {:>8.1f} KiB".format(
+                name, elapsed, len(pages) / elapsed, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
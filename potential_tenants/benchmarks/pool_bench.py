@@ -0,0 +1,46 @@
+"""
+Back-to-back search_parallel scrapes against the local stub server, with a fresh spawn pool for every search
+(as before app.worker_pool) and with the long-lived warm pool.
+
+Run from potential_tenants/ with the usual app environment (NUM_PROCS, DATABASE_URL, GMAPS_KEY) set:
+    python -m benchmarks.pool_bench
+"""
+import timeit
+
+from app import worker_pool
+from benchmarks import rmv_stub_server, scraper_bench
+
+SEARCHES = 3
+
+
+def timed_searches(base_url: str, fresh_pool: bool):
+    times = []
+    for _ in range(SEARCHES):
+        if fresh_pool:
+            worker_pool.shutdown()
+        start = timeit.default_timer()
+        scraper_bench.make_scraper(base_url)._scrape_parallel()
+        times.append(timeit.default_timer() - start)
+    return times
+
+
+def main():
+    server, base_url = rmv_stub_server.start()
+    try:
+        fresh = timed_searches(base_url, fresh_pool=True)
+        worker_pool.shutdown()
+        start = timeit.default_timer()
+        worker_pool.get_pool(scraper_bench.make_scraper(base_url)._num_procs)
+        warm_up = timeit.default_timer() - start
+        warm = timed_searches(base_url, fresh_pool=False)
+    finally:
+        worker_pool.shutdown()
+        server.shutdown()
+
+    print("\nPool start-up (spawn + imports in every worker): {:.2f}s".format(warm_up))
+    for name, times in [("fresh pool per search", fresh), ("warm shared pool", warm)]:
+        print("{:<22} {}".format(name, "  ".join("{:>6.2f}s".format(x) for x in times)))
+
+
+if __name__ == '__main__':
+    main()
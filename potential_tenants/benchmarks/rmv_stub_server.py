@@ -0,0 +1,212 @@
+"""
+Local stand-in for the Rightmove search and property pages so that the scraping engines can be
+benchmarked (and their parsers exercised) without going anywhere near the real site.
+
+Pages mirror the structure RmvScraper navigates: result cards nested so that
+children[1].contents[3].contents[7] holds the price, and detail pages carrying the four script
+kinds (analytics data layer, availability, image gallery, floorplans) split by '(jQuery);'.
+The map search JSON has the same properties as the result pages
+"""
+import re
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from app import rmv_constants
+
+RESULTS_PER_OUTCODE = 60
+# unrelated analytics/ads scripts on each details page, as on the real one
+NOISE_SCRIPTS = 25
+LATENCY = 0.05  # seconds added to every response to stand in for the network round-trip
+# summary pages for these outcode numbers are much slower, as some large areas are on the real site
+SLOW_OUTCODES = {1}
+SLOW_OUTCODE_LATENCY = 1.0
+# when set, requests beyond this many in flight get a 429 like a rate-limiting site (None to accept everything)
+TOLERATED_IN_FLIGHT = None
+RETRY_AFTER = 1  # seconds, sent with each 429
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+requests_served = 0  # every GET answered, 429s included
+
+SUMMARY_CARD = """
+<div class="l-searchResult is-list" id="property-{property_id}">
+<div class="propertyCard">
+<div class="propertyCard-moreInfo"></div>
+<div class="propertyCard-wrapper">
+<div class="propertyCard-images"></div>
+<div class="propertyCard-section"></div>
+<div class="propertyCard-contacts"></div>
+<div class="propertyCard-header">
+<div class="propertyCard-price"><span class="propertyCard-priceValue">£{price:,} pcm</span></div>
+<div class="propertyCard-branchSummary"><span class="propertyCard-branchSummary-addedOrReduced">{marker}</span></div>
+</div>
+</div>
+</div>
+</div>
+"""
+
+SUMMARY_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Property to rent</title></head>
+<body>
+<div class="searchHeader"><span class="searchHeader-resultCount">{total}</span> results</div>
+<div id="l-searchResults">
+{cards}
+</div>
+</body>
+</html>
+"""
+
+DETAIL_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Property {property_id}</title></head>
+<body>
+<script>
+(function(k,v){{RIGHTMOVE.ANALYTICS.DataLayer.pushKV(k,v);}})("property", {{"propertyId":"{property_id}",
+"price":{price},"beds":{beds},"postcode":"SE17 1AF","latitude":{lat},"longitude":{lng},
+"brandName":"Agent {agent}","displayAddress":"{agent} High Street, London, SE1 6EB"}});
+</script>
+<script>
+{availability}
+</script>
+<script>
+(function($){{var imageGallery = [{images}];}})(jQuery);
+(function($){{var broken = 1 var missing = "semicolon";}})(jQuery);
+</script>
+<script>
+(function($){{RIGHTMOVE.PROPERTYDETAILS.FloorplanViewer.init({{zoomUrls: [{floorplans}]}});}})(jQuery);
+</script>
+{noise}
+<div class="left overflow-hidden agent-content">
+Letting information:
+Furnishing: Furnished   Added on Rightmove:  {added} (3 days ago)
+Full description
+A bright {beds} bedroom flat with a garden and wooden floors, moments from the tube.
+</div>
+</body>
+</html>
+"""
+
+
+def property_ids(outcode: str, index: int = 0, per_page: int = rmv_constants.MAX_RESULTS_PER_PAGE):
+    outcode_number = int(outcode.split('^')[-1])
+    last = min(index + per_page, RESULTS_PER_OUTCODE)
+    return [outcode_number * 1000 + i for i in range(index, last)]
+
+
+def property_price(property_id: int):
+    return 1000 + (property_id % 97) * 15
+
+
+def summary_page(outcode: str, index: int = 0):
+    cards = [SUMMARY_CARD.format(property_id=x, price=property_price(x), marker="Added on 12/03/2020")
+             for x in property_ids(outcode, index)]
+    return SUMMARY_PAGE.format(total=RESULTS_PER_OUTCODE, cards=''.join(cards))
+
+
+def map_search(outcode: str, index: int = 0, per_page: int = rmv_constants.MAP_RESULTS_PER_PAGE):
+    properties = [{
+        "id": x,
+        "bedrooms": 1 + x % 3,
+        "summary": "A bright flat with a garden and wooden floors, moments from the tube.",
+        "displayAddress": "{} High Street, London".format(x % 17),
+        "location": {"latitude": 51.49 + (x % 100) / 1000, "longitude": -(0.08 + (x % 100) / 1000)},
+        "propertyImages": {"mainImageSrc": "https://media.rightmove.co.uk/dir/{0}/{0}_IMG_01_max_476x317.jpg"
+                           .format(x)},
+        "price": {"amount": property_price(x), "frequency": "monthly", "currencyCode": "GBP"},
+        "addedOrReduced": "Added on 12/03/2020",
+        "propertyUrl": "/properties/{}".format(x)
+    } for x in property_ids(outcode, index, per_page)]
+    return json.dumps({"properties": properties, "resultCount": "{:,}".format(RESULTS_PER_OUTCODE)})
+
+
+def detail_page(property_id: int):
+    # first six segments are noise, availability is picked from the 7th (index 6) as in the real page
+    availability = ''.join(['(function($){{var tracker{} = {{"page": "details"}};}})(jQuery);'.format(i)
+                            for i in range(6)])
+    availability += "(function($){RIGHTMOVE.ANALYTICS.PageViewTracker.trackOnClick('#facebook', " \
+                    "{\"aed\":\"2020-03-13-12-57-10\"});})(jQuery);"
+    images = ','.join(['{{"masterUrl":"https://media.rightmove.co.uk/dir/{0}/{0}_IMG_{1:02d}_max_656x437.jpg",'
+                       '"caption":"Picture No. {1}"}}'.format(property_id, i) for i in range(1, 9)])
+    floorplans = ','.join(['"https://media.rightmove.co.uk/dir/{0}/{0}_FLP_01_max_{1}x{1}.jpg"'.format(property_id, x)
+                           for x in (600, 900, 1350)])
+    return DETAIL_PAGE.format(property_id=property_id, price=property_price(property_id) + 0.6666666666666666,
+                              beds=1 + property_id % 3, lat=51.49 + (property_id % 100) / 1000,
+                              lng=-(0.08 + (property_id % 100) / 1000), agent=property_id % 17,
+                              availability=availability, images=images, floorplans=floorplans,
+                              added="12 March 2020", noise=noise_scripts(property_id))
+
+
+def noise_scripts(seed: int):
+    return '\n'.join(['<script>\n(function(w){{w.adSlot{0} = {{"slot": "{0}", "targeting": [{1}]}};}})(window);\n'
+                      '</script>'.format(i, ','.join(['"kw{}_{}"'.format(seed, j) for j in range(60)]))
+                      for i in range(NOISE_SCRIPTS)])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        global _in_flight, requests_served
+        with _in_flight_lock:
+            _in_flight += 1
+            requests_served += 1
+            rejected = TOLERATED_IN_FLIGHT is not None and _in_flight > TOLERATED_IN_FLIGHT
+        try:
+            if rejected:
+                self.send_response(429)
+                self.send_header('Retry-After', str(RETRY_AFTER))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                self._respond()
+        finally:
+            with _in_flight_lock:
+                _in_flight -= 1
+
+    def _respond(self):
+        time.sleep(LATENCY)
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        detail_match = re.search(r'/property-(\d+)\.html$', url.path)
+        content_type = 'text/html; charset=utf-8'
+
+        if url.path.endswith(rmv_constants.FIND_URI):
+            outcode = params['locationIdentifier'][0]
+            if int(outcode.split('^')[-1]) in SLOW_OUTCODES:
+                time.sleep(SLOW_OUTCODE_LATENCY)
+            body = summary_page(outcode, int(params.get('index', ['0'])[0]))
+        elif url.path.endswith(rmv_constants.MAP_SEARCH_URI):
+            outcode = params['locationIdentifier'][0]
+            if int(outcode.split('^')[-1]) in SLOW_OUTCODES:
+                time.sleep(SLOW_OUTCODE_LATENCY)
+            body = map_search(outcode, int(params.get('index', ['0'])[0]),
+                              int(params.get('numberOfPropertiesPerPage', [rmv_constants.MAP_RESULTS_PER_PAGE])[0]))
+            content_type = 'application/json'
+        elif detail_match:
+            body = detail_page(int(detail_match.group(1)))
+        else:
+            self.send_error(404)
+            return
+
+        content = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0):
+    """
+    Starts the stub in a daemon thread and returns (server, base_url) where base_url stands in
+    for rmv_constants.BASE_URL (and base_url without /property-to-rent for rmv_constants.ROOT_URL)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}/property-to-rent".format(server.server_address[1])
@@ -0,0 +1,74 @@
+"""
+Side-by-side benchmark of the RmvScraper engines against the local stub server.
+
+Run from potential_tenants/ with the usual app environment (NUM_PROCS, DATABASE_URL, GMAPS_KEY) set:
+    python -m benchmarks.scraper_bench
+Set STUB_TOLERATED_IN_FLIGHT to have the stub answer 429 beyond that many concurrent requests.
+Nothing is written to the DB and no Google/Rightmove calls are made.
+"""
+import os
+import timeit
+import asyncio
+
+# engines are compared on their own scraping, not on the shared outcode/listing caches (see shared_cache_bench).
+# Set before the app is imported, and inherited by the spawned workers
+os.environ['OUTCODE_CACHE_TTL_MINUTES'] = '0'
+
+from app import rmv_constants, throttle
+from app.rmv_scraper import RmvScraper
+from benchmarks import rmv_stub_server
+
+NUM_OUTCODES = 12
+
+CONFIG = {
+    "destinations": [],
+    "maxPrice": 2000,
+    "minBedrooms": 1,
+    "radius": 0
+}
+
+
+def make_scraper(base_url: str):
+    rmv = RmvScraper(CONFIG)
+    rmv.base_url = base_url
+    rmv.find_url = base_url + rmv_constants.FIND_URI
+    rmv.outcode_list = ["OUTCODE^{}".format(x) for x in range(1, NUM_OUTCODES + 1)]
+    return rmv
+
+
+def run(name: str, engine, base_url: str):
+    throttle.reset()
+    rmv = make_scraper(base_url)
+    start = timeit.default_timer()
+    listings, _ = engine(rmv)
+    end = timeit.default_timer()
+    return name, len(listings), end - start, rmv._rmv_throttle().stats()
+
+
+def main():
+    if os.getenv('STUB_TOLERATED_IN_FLIGHT'):
+        rmv_stub_server.TOLERATED_IN_FLIGHT = int(os.environ['STUB_TOLERATED_IN_FLIGHT'])
+    server, base_url = rmv_stub_server.start()
+    engines = [
+        ("search_parallel", lambda rmv: rmv._scrape_parallel()),
+        ("search_async", lambda rmv: asyncio.run(rmv._scrape_async())),
+        ("search_pipelined", lambda rmv: asyncio.run(rmv._scrape_pipelined())),
+    ]
+
+    try:
+        results = [run(name, engine, base_url) for name, engine in engines]
+    finally:
+        server.shutdown()
+
+    print("\n{} outcodes x {} results, {}s simulated latency per request ({}s extra for slow outcodes {})".format(
+        NUM_OUTCODES, rmv_stub_server.RESULTS_PER_OUTCODE, rmv_stub_server.LATENCY,
+        rmv_stub_server.SLOW_OUTCODE_LATENCY, sorted(rmv_stub_server.SLOW_OUTCODES)))
+    if rmv_stub_server.TOLERATED_IN_FLIGHT is not None:
+        print("Stub answers 429 beyond {} concurrent requests".format(rmv_stub_server.TOLERATED_IN_FLIGHT))
+    for name, count, elapsed, stats in results:
+        print("{:<20} {:>6} listings {:>8.2f}s {:>8.1f} listings/s   throttle {}".format(
+            name, count, elapsed, count / elapsed, stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Several users searching overlapping areas at the same time, with and without the shared outcode/listing caches,
+against the local stub server, with both the async and the parallel (worker process) engines.
+
+Run from potential_tenants/ with the usual app environment (NUM_PROCS, DATABASE_URL, GMAPS_KEY) set:
+    python -m benchmarks.shared_cache_bench
+Caches are kept in memory only and nothing is written to the DB.
+"""
+import timeit
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app import rmv_constants, throttle, rmv_scraper
+from app.rmv_scraper import RmvScraper
+from benchmarks import rmv_stub_server
+
+NUM_USERS = 6
+OUTCODES_PER_USER = 8
+# user i searches outcodes i+1 .. i+OUTCODES_PER_USER, so neighbouring users overlap on most of them
+MAX_PRICES = [1800, 1850, 1900, 1950, 2000, 2050]
+
+CACHE_TTL = rmv_constants.OUTCODE_CACHE_TTL_MINUTES * 60
+
+
+def make_scraper(base_url: str, user: int):
+    rmv = RmvScraper({"destinations": [], "maxPrice": MAX_PRICES[user % len(MAX_PRICES)], "minBedrooms": 1,
+                      "radius": 0})
+    rmv.base_url = base_url
+    rmv.find_url = base_url + rmv_constants.FIND_URI
+    rmv.outcode_list = ["OUTCODE^{}".format(x) for x in range(user + 1, user + OUTCODES_PER_USER + 1)]
+    return rmv
+
+
+ENGINES = [
+    ("async", lambda rmv: asyncio.run(rmv._scrape_async())),
+    ("parallel", lambda rmv: rmv._scrape_parallel()),
+]
+
+
+def run(base_url: str, cache_ttl: float, scrape):
+    throttle.reset()
+    for shared in [rmv_scraper.outcode_cache, rmv_scraper.listing_cache]:
+        shared.persist = False
+        shared.ttl = cache_ttl
+        shared.invalidate()
+    served_before = rmv_stub_server.requests_served
+
+    start = timeit.default_timer()
+    with ThreadPoolExecutor(max_workers=NUM_USERS) as executor:
+        results = list(executor.map(lambda x: scrape(make_scraper(base_url, x)), range(NUM_USERS)))
+    elapsed = timeit.default_timer() - start
+    return sum(len(x[0]) for x in results), elapsed, rmv_stub_server.requests_served - served_before
+
+
+def main():
+    server, base_url = rmv_stub_server.start()
+    results = []
+    try:
+        for engine, scrape in ENGINES:
+            results.append(("{}, no shared cache".format(engine), run(base_url, 0, scrape)))
+            results.append(("{}, shared cache".format(engine), run(base_url, CACHE_TTL, scrape)))
+    finally:
+        server.shutdown()
+
+    unique_outcodes = NUM_USERS + OUTCODES_PER_USER - 1
+    print("\n{} users searching {} outcodes each ({} unique), {} results per outcode".format(
+        NUM_USERS, OUTCODES_PER_USER, unique_outcodes, rmv_stub_server.RESULTS_PER_OUTCODE))
+    for name, (count, elapsed, served) in results:
+        print("{:<26} {:>6} listings {:>8.2f}s {:>6} requests to RMV".format(name, count, elapsed, served))
+    print("Outcode cache: {}. Listing cache: {}".format(rmv_scraper.outcode_cache.stats(),
+                                                       rmv_scraper.listing_cache.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Summary acquisition from the HTML result pages against the map search JSON, on the local stub server.
+Only the summary phase is timed, detail pages are fetched the same way whichever the source.
+
+Run from potential_tenants/ with the usual app environment (NUM_PROCS, DATABASE_URL, GMAPS_KEY) set:
+    python -m benchmarks.summary_source_bench
+Nothing is written to the DB and no Google/Rightmove calls are made.
+"""
+import os
+import timeit
+import asyncio
+
+# each source has to do its own fetching rather than pick up the other's summaries from the shared cache
+os.environ['OUTCODE_CACHE_TTL_MINUTES'] = '0'
+
+import aiohttp  # noqa: E402
+
+from app import rmv_constants, throttle  # noqa: E402
+from app.rmv_scraper import RmvScraper  # noqa: E402
+from benchmarks import rmv_stub_server  # noqa: E402
+
+NUM_OUTCODES = 12
+RESULTS_PER_OUTCODE = 240  # 10 result pages per outcode
+
+CONFIG = {
+    "destinations": [],
+    "maxPrice": 2000,
+    "minBedrooms": 1,
+    "radius": 0
+}
+
+
+def make_scraper(base_url: str, source: str):
+    os.environ['RMV_SUMMARY_SOURCE'] = source
+    rmv = RmvScraper(CONFIG)
+    rmv.base_url = base_url
+    rmv.find_url = base_url + rmv_constants.FIND_URI
+    rmv.map_search_url = base_url.rsplit('/', 1)[0] + rmv_constants.MAP_SEARCH_URI
+    rmv.outcode_list = ["OUTCODE^{}".format(x) for x in range(1, NUM_OUTCODES + 1)]
+    return rmv
+
+
+async def summaries(rmv: RmvScraper):
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=rmv_constants.MAX_CONCURRENT_REQUESTS)) \
+            as session:
+        return await asyncio.gather(*[rmv._search_summary_async(session, x) for x in rmv.outcode_list])
+
+
+def run(base_url: str, source: str):
+    throttle.reset()
+    rmv = make_scraper(base_url, source)
+    served_before = rmv_stub_server.requests_served
+    start = timeit.default_timer()
+    found = asyncio.run(summaries(rmv))
+    elapsed = timeit.default_timer() - start
+    found = sorted(x for outcode in found for x in outcode)
+    return found, elapsed, rmv_stub_server.requests_served - served_before
+
+
+def main():
+    rmv_stub_server.RESULTS_PER_OUTCODE = RESULTS_PER_OUTCODE
+    server, base_url = rmv_stub_server.start()
+    try:
+        results = [(x, run(base_url, x)) for x in (rmv_constants.SUMMARY_SOURCE_HTML,
+                                                    rmv_constants.SUMMARY_SOURCE_MAP)]
+    finally:
+        server.shutdown()
+
+    print("\n{} outcodes x {} results, {}s simulated latency per request ({}s extra for slow outcodes {})".format(
+        NUM_OUTCODES, RESULTS_PER_OUTCODE, rmv_stub_server.LATENCY, rmv_stub_server.SLOW_OUTCODE_LATENCY,
+        sorted(rmv_stub_server.SLOW_OUTCODES)))
+    for source, (found, elapsed, served) in results:
+        print("{:<6} {:>6} summaries {:>8.2f}s {:>6} requests".format(source, len(found), elapsed, served))
+    html_ids = [(x.property_id, x.rent_pcm) for x in results[0][1][0]]
+    map_ids = [(x.property_id, x.rent_pcm) for x in results[1][1][0]]
+    print("Same properties and rents from both sources: {}".format(html_ids == map_ids))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Publishing a run's results to the Webflow CMS against the local stub, one POST at a time sleeping for the rest of
+the window whenever X-RateLimit-Remaining gets to 1 (as main used to) against webflow.WebflowClient.create_items.
+The quota is scaled down so the benchmark runs in seconds rather than minutes:
+    python -m benchmarks.webflow_bench
+"""
+import time
+import timeit
+
+import requests
+
+from app import webflow
+from benchmarks import webflow_stub_server
+
+NUM_ITEMS = 50
+RATE_LIMIT = 20
+RATE_LIMIT_WINDOW = 6.0
+# main slept 70s on Webflow's 60s window
+SLEEP_WHEN_EXHAUSTED = RATE_LIMIT_WINDOW * 70 / 60
+
+
+def fields(i: int):
+    return {"name": str(i), "slug": "property-{}".format(i), "rent-pcm": 1500.0}
+
+
+def one_at_a_time(api_url: str):
+    url = api_url + "/collections/{}/items?live=true".format(webflow.PROPERTIES_COLLECTION_ID)
+    created = 0
+    for i in range(NUM_ITEMS):
+        r = requests.post(url, headers={"Authorization": "Bearer test"}, json={"fields": fields(i)})
+        created += r.status_code == 200
+        if int(r.headers['X-RateLimit-Remaining']) <= 1:
+            time.sleep(SLEEP_WHEN_EXHAUSTED)
+    return created
+
+
+def concurrent(api_url: str):
+    client = webflow.WebflowClient(api_key='test', api_url=api_url,
+                                   bucket=webflow.TokenBucket(RATE_LIMIT, RATE_LIMIT_WINDOW))
+    return sum(x is not None and x.status_code == 200
+               for x in client.create_items(webflow.PROPERTIES_COLLECTION_ID, [fields(i) for i in range(NUM_ITEMS)]))
+
+
+def main():
+    server, api_url = webflow_stub_server.start()
+    results = []
+    try:
+        for name, publish in [("one at a time", one_at_a_time), ("create_items", concurrent)]:
+            webflow_stub_server.reset(RATE_LIMIT, RATE_LIMIT_WINDOW)
+            start = timeit.default_timer()
+            created = publish(api_url)
+            results.append((name, created, timeit.default_timer() - start, webflow_stub_server.requests_served,
+                            webflow_stub_server.rate_limited))
+    finally:
+        server.shutdown()
+
+    print("\n{} items, quota {} requests per {}s: at best {:.1f}s".format(
+        NUM_ITEMS, RATE_LIMIT, RATE_LIMIT_WINDOW, (NUM_ITEMS - RATE_LIMIT) * RATE_LIMIT_WINDOW / RATE_LIMIT))
+    for name, created, elapsed, served, rate_limited in results:
+        print("{:<14} {:>3} created {:>7.2f}s {:>4} requests ({} rate limited)".format(
+            name, created, elapsed, served, rate_limited))
+
+
+if __name__ == '__main__':
+    main()
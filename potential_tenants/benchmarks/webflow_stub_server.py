@@ -0,0 +1,123 @@
+"""
+Local stand-in for the Webflow CMS API (v1 items endpoints) so that publishing can be tested and benchmarked
+without touching the real collections or the real quota.
+
+Collections are created on first use and held in memory. Requests are rate limited to RATE_LIMIT per
+RATE_LIMIT_WINDOW seconds, a budget of RATE_LIMIT refilled continuously, reported in X-RateLimit-Limit /
+X-RateLimit-Remaining as Webflow does; requests over it get a 429 with Retry-After
+"""
+import re
+import json
+import time
+import uuid
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+LATENCY = 0.05  # seconds added to every response to stand in for the network round-trip
+RATE_LIMIT = 60
+RATE_LIMIT_WINDOW = 60.0
+# the next this many item creations answer 500
+FAILING_CREATES = 0
+
+collections_items = collections.defaultdict(list)  # collection id -> items
+requests_served = 0  # every request answered, 429s included
+rate_limited = 0  # 429s sent
+_budget = [float(RATE_LIMIT), time.monotonic()]  # requests left, when last refilled
+_lock = threading.Lock()
+
+
+def reset(rate_limit=60, rate_limit_window=60.0):
+    global RATE_LIMIT, RATE_LIMIT_WINDOW, FAILING_CREATES, requests_served, rate_limited
+    with _lock:
+        RATE_LIMIT, RATE_LIMIT_WINDOW, FAILING_CREATES = rate_limit, rate_limit_window, 0
+        requests_served = rate_limited = 0
+        collections_items.clear()
+        _budget[:] = [float(rate_limit), time.monotonic()]
+
+
+def add_items(collection_id: str, names: [str]):
+    with _lock:
+        collections_items[collection_id].extend({"_id": uuid.uuid4().hex, "name": x} for x in names)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def _handle(self):
+        global requests_served, rate_limited, FAILING_CREATES
+        url = urlparse(self.path)
+        match = re.match(r'/collections/([^/]+)/items(?:/([^/]+))?$', url.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        with _lock:
+            requests_served += 1
+            now = time.monotonic()
+            _budget[:] = [min(RATE_LIMIT, _budget[0] + (now - _budget[1]) * RATE_LIMIT / RATE_LIMIT_WINDOW), now]
+            retry_after = (1 - _budget[0]) * RATE_LIMIT_WINDOW / RATE_LIMIT if _budget[0] < 1 else None
+            rate_limited += retry_after is not None
+            _budget[0] -= retry_after is None
+            remaining = int(_budget[0])
+            failing = retry_after is None and self.command == 'POST' and FAILING_CREATES > 0
+            FAILING_CREATES -= failing
+
+        time.sleep(LATENCY)
+        if retry_after is not None:
+            self._send(429, {"msg": "Too many requests"}, 0, retry_after=retry_after)
+        elif match is None:
+            self._send(404, {"msg": "Not found"}, remaining)
+        elif failing:
+            self._send(500, {"msg": "Internal error"}, remaining)
+        elif self.command == 'GET':
+            params = parse_qs(url.query)
+            offset, limit = int(params.get('offset', ['0'])[0]), int(params.get('limit', ['100'])[0])
+            with _lock:
+                items = list(collections_items[match.group(1)])
+            page = items[offset:offset + limit]
+            self._send(200, {"items": page, "count": len(page), "limit": limit, "offset": offset,
+                             "total": len(items)}, remaining)
+        elif self.command == 'POST':
+            item = dict(body['fields'], _id=uuid.uuid4().hex)
+            with _lock:
+                collections_items[match.group(1)].append(item)
+            self._send(200, item, remaining)
+        else:
+            with _lock:
+                item = next((x for x in collections_items[match.group(1)] if x['_id'] == match.group(2)), None)
+                if item is not None:
+                    item.update(body['fields'])
+            self._send(200 if item is not None else 404, item or {"msg": "Item not found"}, remaining)
+
+    def _send(self, status: int, payload: dict, remaining: int, retry_after: float = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('X-RateLimit-Limit', str(RATE_LIMIT))
+        self.send_header('X-RateLimit-Remaining', str(remaining))
+        if retry_after is not None:
+            self.send_header('Retry-After', "{:.2f}".format(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0):
+    """
+    Starts the stub in a daemon thread and returns (server, api_url) where api_url stands in for webflow.API_URL
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}".format(server.server_address[1])
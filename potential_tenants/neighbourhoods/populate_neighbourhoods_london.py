@@ -12,7 +12,7 @@ from bs4 import BeautifulSoup
 import psycopg2
 import psycopg2.extras
 
-from app import general_constants
+from app import db, general_constants
 
 psycopg2.extras.register_uuid()
 
@@ -85,7 +85,7 @@ def write_db_london_nhoods_cats(file):
             london_nhoods_cat.append(row)
 
     london_nhoods_id = {}
-    with psycopg2.connect(general_constants.DB_URL, sslmode="allow") as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(get_london_nhood_id_query)
             for x in curs.fetchall():
@@ -107,7 +107,7 @@ def write_db_london_nhoods_cats(file):
 
     [london_nhoods_cat.remove(each) for each in remove_list]
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode="allow") as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             template = "(%(Best)s, %(Beautiful)s, %(Luxurious)s, %(Nightlife)s, %(Eating)s, %(Restaurants)s, " \
                        "%(Shopping)s, %(Walk)s, %(Green)s, %(Village)s, %(Young professional)s, %(Students)s, " \
@@ -158,7 +158,7 @@ def clean_data():
 
     greater_london_polygon = geometry.Polygon(polyline.decode(greater_london_polyline))
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(get_existing_london_areas_query)
             data = curs.fetchall()
@@ -176,7 +176,7 @@ def clean_data():
             pass
         continue
 
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             curs.execute(update_area_status_query, (tuple(not_in_london),))
 
@@ -296,7 +296,7 @@ def write_webflow_london_nhoods(prioritised_only=True):
 
 
     print("Getting all neighbourhoods in London from DB ...")
-    with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+    with db.connection() as conn:
         with conn.cursor() as curs:
             if prioritised_only:
                 curs.execute(london_nhood_query, (nhoods_list,))
@@ -378,7 +378,7 @@ if __name__ == '__main__':
 
         print("Writing data to DB ...")
         db_timer_start = timeit.default_timer()
-        with psycopg2.connect(general_constants.DB_URL, sslmode='allow') as conn:
+        with db.connection() as conn:
             with conn.cursor() as curs:
                 psycopg2.extras.execute_values(curs, nhoods_populate_query_many,
                                                [tuple(x.values()) for x in standardised_nhoods])
@@ -1,14 +1,12 @@
 import os
 import json
 import traceback
-import multiprocessing as mp
-from time import sleep
+from multiprocessing.pool import ThreadPool
 import csv
 import timeit
-import random
 from bs4 import BeautifulSoup
 
-from app import util, rmv_constants
+from app import util, rmv_constants, throttle
 
 POLYLINE = os.environ.get('POLYLINE')
 
@@ -18,6 +16,11 @@ potential_codes = [i for i in range(0, 100000)]
 
 xpath = {"class": "input input--full"}
 
+# every lookup goes through the one throttle, which is why the pools below are threads rather than processes
+rmv_throttle = throttle.for_host(rmv_constants.ROOT_URL, max_limit=rmv_constants.MAX_CONCURRENT_REQUESTS,
+                                 initial_limit=rmv_constants.INITIAL_CONCURRENT_REQUESTS,
+                                 target_latency=rmv_constants.TARGET_LATENCY)
+
 
 def read_mapped_codes(file):
     mapped_codes = {}
@@ -32,7 +35,6 @@ def read_mapped_codes(file):
 def generate_codes(code: int):
     url = rmv_constants.BASE_URL + rmv_constants.FIND_URI
     lap_timer_start = timeit.default_timer()
-    sleep(random.uniform(2, 8))
     mapping = {}
     try:
         headers = {
@@ -44,7 +46,7 @@ def generate_codes(code: int):
         }
 
         print("Trying region code {}".format(code))
-        r = util.requests_retry_session().get(url, headers=headers, params=params)
+        r = throttle.get(rmv_throttle, url, timeout=rmv_constants.REQUEST_TIMEOUT, headers=headers, params=params)
 
         if r.status_code == 200:
             soup = BeautifulSoup(r.text, "html.parser")
@@ -64,7 +66,7 @@ def generate_codes(code: int):
 
     except AttributeError as e:
         print("Could not parse soup: {}. CULPRIT: {}".format(e, soup))
-        sleep(3*60)
+        rmv_throttle.back_off(retry_after=rmv_constants.BLOCKED_PAUSE)
 
     except TypeError as e:
         print("The code passed was not in list format: {}. CULPRIT: {}".format(e, code))
@@ -79,7 +81,6 @@ def get_polyline(region_code: int):
     print("Trying region code {}".format(region_code))
     mapping_polyline = {}
     url = rmv_constants.ROOT_URL + '/api' + '/_mapSearch'
-    sleep(random.uniform(2, 7))
 
     try:
         headers = {
@@ -100,7 +101,7 @@ def get_polyline(region_code: int):
             "viewport": "-0.272832,0.0550416,51.4883,51.6052"
         }
 
-        r = util.requests_retry_session().get(url, headers=headers, params=params)
+        r = throttle.get(rmv_throttle, url, timeout=rmv_constants.REQUEST_TIMEOUT, headers=headers, params=params)
 
         if r.status_code == 200:
             mapping_polyline[region_code] = json.loads(r.content, encoding='utf-8')['locationPolygon']
@@ -113,7 +114,7 @@ def get_polyline(region_code: int):
 
     except Exception as e:
         print("An exception occurred ...: {}".format(e))
-        sleep(3*60)
+        rmv_throttle.back_off(retry_after=rmv_constants.BLOCKED_PAUSE)
 
     return mapping_polyline
 
@@ -137,7 +138,7 @@ if __name__ == '__main__':
 
             non_mapped_polyline_codes = set(non_null_codes) - set(polyline_mapped_codes)
 
-            pool = mp.Pool(processes=10)
+            pool = ThreadPool(processes=10)
             for result in pool.imap_unordered(get_polyline, non_mapped_polyline_codes, chunksize=20):
                 polyline_mapping.append({
                     "region_code": list(result.keys())[0],
@@ -176,7 +177,7 @@ if __name__ == '__main__':
             remaining_codes = list(set(potential_codes) - set(mapped_codes))
             print("Need to go through {} codes".format(len(remaining_codes)))
 
-            pool = mp.Pool(processes=25)
+            pool = ThreadPool(processes=25)
             for each in pool.imap_unordered(generate_codes, list(remaining_codes), chunksize=100):
                 consolidate_mapping.update(each)
 